@@ -1,10 +1,363 @@
 '''
 author: Guangli Dai @RTLab @UH
 '''
+import sys
+import os
+import abc
+import csv
+import json
 import math
 import copy
+import argparse
+import shutil
+import pickle
+import time
+import hashlib
+import zlib
+import tempfile
+import concurrent.futures
+import functools
+import itertools
+import contextlib
+import logging
+from fractions import Fraction
+import bisect
+from array import array
 import xml.etree.ElementTree as ET
-from xml.dom import minidom
+from xml.parsers import expat
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+#status messages and launch tables of RRP go through this logger
+logger = logging.getLogger('RRP')
+#the stage of an RRP instance that is not instrumented, see RRP.stage
+NO_STAGE = contextlib.nullcontext()
+
+#maximum number of (availability factor, factor) approximations kept by approx_factor
+APPROX_CACHE_SIZE = 4096
+#largest denominator used when a float availability factor is turned into a Fraction
+FRACTION_LIMIT = 10**6
+#maximum number of offsets kept by a PatternIndex, patterns beyond it only go through the regular_pattern cache
+PATTERN_INDEX_SLOTS = 2**22
+#maximum number of (period, WCET) slot patterns kept by regular_pattern
+PATTERN_CACHE_SIZE = 4096
+#a new on-disk PatternIndex is filled with the Magic7/MulZ patterns of periods up to this value
+PATTERN_PRECOMPUTE_PERIOD = 8192
+#where the command line keeps its PatternIndex between runs
+PATTERN_INDEX_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'rrp', 'patterns.bin')
+#first line of a PatternIndex file, followed by the byte order, the size of an offset, the number of patterns, of offsets and the crc32 of the data
+PATTERN_INDEX_MAGIC = b'RRP-PATTERNS 1'
+#time slices (summed over the pcpus) below which MulZ does not use its process pool: starting a pool costs about 25ms,
+#scheduling costs about 1.3us per time slice
+PARALLEL_MIN_SLICES = 32768
+#SupplyProfile queries of a partition with at least that many runs are vectorized with numpy, when it is installed
+SUPPLY_NUMPY_RUNS = 64
+#default directory and size bound (in bytes) of the schedule cache of the command line
+SCHEDULE_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'rrp', 'schedules')
+SCHEDULE_CACHE_SIZE = 256*1024*1024
+#part of every schedule cache key, to be bumped by any change to the schedules or the xml generated for the same inputs
+SCHEDULE_CACHE_VERSION = 2
+#seconds after which a temporary file of the schedule cache is taken for the leftover of a crashed build and removed
+SCHEDULE_CACHE_TEMP_AGE = 3600
+
+
+def to_fraction(value):
+    '''
+    This function turns an availability factor, WCET or period into a Fraction. Floats are read as the closest fraction
+    with a denominator up to FRACTION_LIMIT, so that e.g. 3/7 computed in floating point is 3/7 exactly.
+    '''
+    if isinstance(value, Fraction):
+        return value
+    if isinstance(value, float):
+        return Fraction(value).limit_denominator(FRACTION_LIMIT)
+    return Fraction(value)
+
+
+def slot_pattern(p, q):
+    '''
+    Regular slot pattern of q time slices in a period of p, shared by the delta search and the allocators through PATTERNS.
+    Args:
+        p:                      type: int; The period.
+        q:                      type: int; The number of time slices per period, no pattern when it is not positive.
+    Returns:
+        A tuple (offsets, mask). offsets is the array of the slices floor(k*p/q) for k in range(q), computed with integer
+        division, and mask the p-bit mask with these bits set. Both are shared, they must not be modified.
+    '''
+    return PATTERNS.get(p, q)
+
+
+@functools.lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def regular_pattern(p, q):
+    '''
+    This function computes the slot pattern of slot_pattern, the recent ones are cached whether PATTERNS keeps them or not.
+    '''
+    offsets = array('i', [k*p//q for k in range(q)])
+    return (offsets, pattern_mask(p, offsets))
+
+
+def pattern_mask(p, offsets):
+    '''
+    This function returns the p-bit mask with the bits of offsets set, built as bytes instead of one big int operation per offset.
+    '''
+    bits = bytearray((p + 7) // 8)
+    for t in offsets:
+        bits[t >> 3] |= 1 << (t & 7)
+    return int.from_bytes(bits, 'little')
+
+
+class PatternIndex:
+    def __init__(self, file_name=None, max_slots=PATTERN_INDEX_SLOTS):
+        '''
+        Index of the regular slot patterns per (p, q). It is loaded lazily from file_name on the first lookup and written back by save,
+        so that the patterns of the few (WCET, period) pairs produced by Magic7/MulZ are computed once across runs.
+        The file holds flat arrays (see save) checked against a header, whatever it contains is never executed.
+        Args:
+            file_name:              type: string; Where the index is kept, None for an in-memory index.
+            max_slots:              type: int; The maximum number of offsets kept, see PATTERN_INDEX_SLOTS.
+            patterns:               type: dict; (p, q) to (offsets, mask), offsets being an array('i').
+        '''
+        self.file_name = file_name
+        self.max_slots = max_slots
+        self.patterns = {}
+        self.slots = 0
+        self.loaded = file_name is None
+        self.dirty = False
+
+    def attach(self, file_name):
+        '''
+        This function makes the index persistent: file_name is loaded on the next lookup and written by save.
+        '''
+        self.file_name = file_name
+        self.loaded = False
+
+    def get(self, p, q):
+        pattern = self.patterns.get((p, q))
+        if pattern is not None:
+            return pattern
+        if not self.loaded:
+            self.load()
+            return self.get(p, q)
+        pattern = regular_pattern(p, q)
+        (offsets, mask) = pattern
+        if q > 0 and self.slots + len(offsets) <= self.max_slots:
+            self.patterns[(p, q)] = pattern
+            self.slots += len(offsets)
+            self.dirty = True
+        return pattern
+
+    def precompute(self, max_period=PATTERN_PRECOMPUTE_PERIOD):
+        '''
+        This function adds the patterns approx_factor can produce with a period up to max_period: 1 and f*2^n - 1 slices in f*2^n, and w slices in f.
+        '''
+        for f in [3, 4, 5, 7]:
+            for w in range(1, f):
+                self.get(f, w)
+            p = f
+            while p <= max_period:
+                self.get(p, 1)
+                self.get(p, p - 1)
+                p *= 2
+
+    def load(self):
+        '''
+        This function reads the index from file_name. A new index is precomputed when the file is missing, does not match its header
+        (other version, byte order or offset size, wrong length or crc32) or holds an inconsistent pattern.
+        '''
+        self.loaded = True
+        try:
+            with open(self.file_name, 'rb') as f:
+                header = f.readline().split()
+                data = f.read()
+            if b' '.join(header[:2]) != PATTERN_INDEX_MAGIC or header[2:4] != [sys.byteorder.encode(), str(array('i').itemsize).encode()]:
+                raise ValueError('not a pattern index of this version')
+            (count, total, crc) = [int(value) for value in header[4:]]
+            if zlib.crc32(data) != crc:
+                raise ValueError('corrupt pattern index')
+            keys = array('i', data[:count*2*array('i').itemsize])
+            offsets = array('i', data[len(keys)*keys.itemsize:len(keys)*keys.itemsize + total*keys.itemsize])
+            masks = data[(len(keys) + len(offsets))*keys.itemsize:]
+        except (OSError, ValueError):
+            self.precompute()
+            return
+        patterns = {}
+        (position, mask_position) = (0, 0)
+        for k in range(0, len(keys), 2):
+            (p, q) = (keys[k], keys[k + 1])
+            if p <= 0 or q <= 0 or q > p or position + q > len(offsets) or mask_position + (p + 7)//8 > len(masks):
+                self.precompute()
+                return
+            patterns[(p, q)] = (offsets[position:position + q], int.from_bytes(masks[mask_position:mask_position + (p + 7)//8], 'little'))
+            position += q
+            mask_position += (p + 7)//8
+        for (key, pattern) in patterns.items():
+            if key not in self.patterns and self.slots + len(pattern[0]) <= self.max_slots:
+                self.patterns[key] = pattern
+                self.slots += len(pattern[0])
+
+    def save(self):
+        '''
+        This function writes the index to file_name when patterns were added since it was loaded: a header line (PATTERN_INDEX_MAGIC,
+        byte order, offset size, number of patterns and offsets, crc32 of the rest), the (p, q) of every pattern and their offsets as
+        flat array('i'), then their masks as p-bit little-endian bytes.
+        The file is replaced atomically, so concurrent runs never read a partial index, and no temporary file is left on a failure.
+        Returns:
+            returns a boolean value to indicate whether the file was written.
+        '''
+        if self.file_name is None or not self.dirty:
+            return False
+        directory = os.path.dirname(self.file_name)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        keys = array('i')
+        offsets = array('i')
+        masks = bytearray()
+        for ((p, q), (pattern_offsets, mask)) in self.patterns.items():
+            keys.extend((p, q))
+            offsets.extend(pattern_offsets)
+            masks += mask.to_bytes((p + 7)//8, 'little')
+        data = keys.tobytes() + offsets.tobytes() + bytes(masks)
+        header = [PATTERN_INDEX_MAGIC, sys.byteorder.encode(), str(keys.itemsize).encode(), str(len(self.patterns)).encode(), str(len(offsets)).encode(), str(zlib.crc32(data)).encode()]
+        temp_file_name = self.file_name+'.'+str(os.getpid())+'.tmp'
+        try:
+            with open(temp_file_name, 'wb') as f:
+                f.write(b' '.join(header)+b'\n')
+                f.write(data)
+            os.replace(temp_file_name, self.file_name)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(temp_file_name)
+            raise
+        self.dirty = False
+        return True
+
+
+#pattern index used by slot_pattern, in memory unless the command line gives it a file
+PATTERNS = PatternIndex()
+
+
+class ScheduleCache:
+    def __init__(self, directory=SCHEDULE_CACHE_DIR, max_bytes=SCHEDULE_CACHE_SIZE):
+        '''
+        On-disk cache of generated schedules and their xml, content-addressed by RRP.cache_key and RRP.xml_cache_key: each entry is a
+        JSON file named after its key, holding plain data only (see RRP.cached_schedule).
+        Entries are written to a temporary file and moved in place with os.replace, so parallel builds sharing the directory never read
+        a partial entry and the last writer of a key wins. Once the files take more than max_bytes, the least recently used entries
+        (by mtime, which every hit refreshes) are removed. Temporary files count towards max_bytes, and are removed once older than
+        SCHEDULE_CACHE_TEMP_AGE seconds.
+        Args:
+            directory:              type: string; The directory holding the entries, created on the first store.
+            max_bytes:              type: int; The size the entries are brought back under after each store.
+        '''
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, key):
+        return os.path.join(self.directory, key+'.json')
+
+    def get(self, key):
+        '''
+        This function returns the entry stored under key, None when there is none or it cannot be read.
+        '''
+        try:
+            with open(self.path(key), 'rb') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(self.path(key))
+        except OSError:
+            #evicted meanwhile by another build, the entry read is still good
+            pass
+        return entry if isinstance(entry, dict) else None
+
+    def put(self, key, entry):
+        '''
+        This function stores entry under key, then evicts the least recently used entries. OSError is raised when the directory is not writable.
+        '''
+        os.makedirs(self.directory, exist_ok=True)
+        (handle, temp_file_name) = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'w') as f:
+                json.dump(entry, f, separators=(',', ':'))
+            os.replace(temp_file_name, self.path(key))
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(temp_file_name)
+            raise
+        self.evict()
+
+    def evict(self):
+        '''
+        This function removes the temporary files older than SCHEDULE_CACHE_TEMP_AGE, then the oldest entries until all the files
+        (the temporary files of the builds running included) take at most max_bytes. Files of other cache versions are entries too.
+        Returns:
+            The number of files removed.
+        '''
+        entries = []
+        total = 0
+        removed = 0
+        stale = time.time_ns() - SCHEDULE_CACHE_TEMP_AGE*10**9
+        for item in os.scandir(self.directory):
+            try:
+                if not item.is_file():
+                    continue
+                stat = item.stat()
+            except OSError:
+                continue
+            if item.name.endswith('.tmp'):
+                if stat.st_mtime_ns < stale:
+                    with contextlib.suppress(OSError):
+                        os.remove(item.path)
+                        removed += 1
+                    continue
+                #being written by a build, counted but left alone
+                total += stat.st_size
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, item.path))
+            total += stat.st_size
+        entries.sort()
+        for (mtime, size, path) in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                #another build removed it first
+                pass
+            total -= size
+        return removed
+
+
+@functools.lru_cache(maxsize=APPROX_CACHE_SIZE)
+def approx_factor(availability_factor, factor):
+    '''
+    Exact approximation of an availability factor by the regular partitions of base factor, shared by RRP.z_approx and RRP.magic7.
+    Args:
+        availability_factor:    type: Fraction; The availability factor, WCET/period.
+        factor:                 type: int; The base factor, 3, 4, 5 or 7.
+    Returns:
+        A tuple (aaf, w, p). aaf is the approximate availability factor as a Fraction, w/p the WCET and period realizing it.
+    '''
+    if availability_factor == 0:
+        return (Fraction(1), 1, 1)
+    elif availability_factor > 0 and availability_factor < Fraction(1, factor):
+        #the largest n with factor*2^n <= 1/availability_factor
+        x = 1/(factor*availability_factor)
+        n = (x.numerator // x.denominator).bit_length() - 1
+        return (Fraction(1, factor*(2**n)), 1, factor*(2**n))
+    elif availability_factor >= Fraction(1, factor) and availability_factor <= Fraction(factor - 1, factor):
+        w = math.ceil(factor*availability_factor)
+        return (Fraction(w, factor), w, factor)
+    elif availability_factor > Fraction(factor - 1, factor) and availability_factor < 1:
+        #the smallest n with factor*2^n >= 1/(factor*(1-availability_factor))
+        n = (math.ceil(1/(factor*(1-availability_factor))) - 1).bit_length()
+        return (1 - Fraction(1, factor*(2**n)), factor*(2**n) - 1, factor*(2**n))
+    else:
+        return (Fraction(1), 1, 1)
+
 
 class Partition:
     def __init__(self, wcet, period, partition_id):
@@ -12,107 +365,1407 @@ class Partition:
         Args:
             wcet:            type: int; Worst case execution time in each period of the partition.
             period:            type: int; The length of a period of the partition. availability factor is WCET/period.
-            aaf:            type: double; Approximate availability factor.
+            aaf:            type: Fraction; Approximate availability factor.
             partition_id:           type: int; The id of the partition.
         '''
         self.wcet = wcet
         self.period = period
-        self.aaf = float(wcet)/period #the approximate availability factor is set as availability factor initially.
+        self.aaf = to_fraction(wcet)/to_fraction(period) #the approximate availability factor is set as availability factor initially.
         self.partition_id = partition_id
 
 
-class sched_entry:
-        def __init__(self, start_time, end_time, partition_id):
+class sched_entry:
+        def __init__(self, start_time, end_time, partition_id):
+                '''
+                Args:
+                        start_time:             type: int; Start time of the sched entry, given in time slices.
+                        end_time:               type: int; End time of the sched entry (exclusive), given in time slices.
+                        partition_id:           type: int; The id of the partition in the sched entry.
+                '''
+                self.start_time = start_time
+                self.end_time = end_time
+                self.partition_id = partition_id
+
+
+class Schedule:
+    def __init__(self, hyperperiod):
+        '''
+        Args:
+            hyperperiod:            type: int; The number of time slices covered by the schedule.
+            entries:                type: list; The sched_entry runs of the schedule sorted by start_time. Idle time slices are not stored.
+            starts:                 type: list; The start_time of each entry, kept for bisect lookups.
+        '''
+        self.hyperperiod = hyperperiod
+        self.entries = []
+        self.starts = []
+
+    @classmethod
+    def from_runs(cls, hyperperiod, runs):
+        '''
+        This function builds a schedule out of (start_time, end_time, partition_id) tuples given in any order, in one pass once they are sorted.
+        Adjacent runs of the same partition are merged, a ValueError is raised like in add when a run is out of range or overlaps another.
+        '''
+        schedule = cls(hyperperiod)
+        #the run being extended, written out once the next one does not continue it
+        (run_start, run_end, run_id) = (None, None, None)
+        for (start_time, end_time, partition_id) in sorted(runs):
+            if start_time >= end_time:
+                continue
+            if start_time < 0 or end_time > hyperperiod:
+                raise ValueError('Run ['+str(start_time)+', '+str(end_time)+') is out of the hyperperiod.')
+            if run_end is not None:
+                if run_end > start_time:
+                    raise ValueError('Run ['+str(start_time)+', '+str(end_time)+') overlaps the schedule.')
+                if run_end == start_time and run_id == partition_id:
+                    run_end = end_time
+                    continue
+                schedule.entries.append(sched_entry(run_start, run_end, run_id))
+                schedule.starts.append(run_start)
+            (run_start, run_end, run_id) = (start_time, end_time, partition_id)
+        if run_end is not None:
+            schedule.entries.append(sched_entry(run_start, run_end, run_id))
+            schedule.starts.append(run_start)
+        return schedule
+
+    @classmethod
+    def from_slices(cls, launch_table):
+        '''
+        This function compresses a per-time-slice launch table (-1 for idle) into a schedule.
+        '''
+        schedule = cls(len(launch_table))
+        start_time = 0
+        last_id = -1
+        time_now = 0
+        for entry in launch_table:
+            if entry != last_id:
+                if last_id != -1:
+                    schedule.add(start_time, time_now, last_id)
+                start_time = time_now
+                last_id = entry
+            time_now += 1
+        if last_id != -1:
+            schedule.add(start_time, time_now, last_id)
+        return schedule
+
+    def add(self, start_time, end_time, partition_id):
+        '''
+        This function inserts the run [start_time, end_time) of a partition, merging it with adjacent runs of the same partition.
+        A ValueError is raised when the run is out of range or overlaps an existing one.
+        '''
+        if start_time >= end_time:
+            return
+        if start_time < 0 or end_time > self.hyperperiod:
+            raise ValueError('Run ['+str(start_time)+', '+str(end_time)+') is out of the hyperperiod.')
+        i = bisect.bisect_right(self.starts, start_time)
+        if (i > 0 and self.entries[i-1].end_time > start_time) or (i < len(self.entries) and self.entries[i].start_time < end_time):
+            raise ValueError('Run ['+str(start_time)+', '+str(end_time)+') overlaps the schedule.')
+        if i > 0 and self.entries[i-1].end_time == start_time and self.entries[i-1].partition_id == partition_id:
+            i -= 1
+            entry = self.entries[i]
+            entry.end_time = end_time
+        else:
+            entry = sched_entry(start_time, end_time, partition_id)
+            self.entries.insert(i, entry)
+            self.starts.insert(i, start_time)
+        if i+1 < len(self.entries) and self.entries[i+1].start_time == end_time and self.entries[i+1].partition_id == partition_id:
+            entry.end_time = self.entries[i+1].end_time
+            del self.entries[i+1]
+            del self.starts[i+1]
+
+    def merge(self, other):
+        '''
+        This function returns a new schedule holding the runs of both schedules, which must not overlap.
+        '''
+        runs = [(e.start_time, e.end_time, e.partition_id) for e in self.entries]
+        runs += [(e.start_time, e.end_time, e.partition_id) for e in other.entries]
+        return Schedule.from_runs(max(self.hyperperiod, other.hyperperiod), runs)
+
+    def lookup(self, time_slice):
+        '''
+        This function returns the id of the partition running in the time slice, -1 if it is idle.
+        '''
+        i = bisect.bisect_right(self.starts, time_slice) - 1
+        if i >= 0 and self.entries[i].end_time > time_slice:
+            return self.entries[i].partition_id
+        return -1
+
+    def slices(self):
+        '''
+        This function expands the schedule into the id of the partition in each time slice.
+        '''
+        time_now = 0
+        for entry in self.entries:
+            for t in range(time_now, entry.start_time):
+                yield -1
+            for t in range(entry.start_time, entry.end_time):
+                yield entry.partition_id
+            time_now = entry.end_time
+        for t in range(time_now, self.hyperperiod):
+            yield -1
+
+    def slot_count(self):
+        '''
+        This function returns the number of runs, i.e. the number of Slot elements of the plan.
+        '''
+        return len(self.entries)
+
+    def __len__(self):
+        #the number of time slices, like LaunchTable and FoldedSchedule
+        return self.hyperperiod
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __getstate__(self):
+        #pickle the runs as flat arrays, schedules are shipped back from the MulZ process pool
+        return (self.hyperperiod, array('q', self.starts), array('q', [e.end_time for e in self.entries]), array('q', [e.partition_id for e in self.entries]))
+
+    def __setstate__(self, state):
+        (self.hyperperiod, starts, end_times, partition_ids) = state
+        self.starts = list(starts)
+        self.entries = [sched_entry(self.starts[i], end_times[i], partition_ids[i]) for i in range(len(self.starts))]
+
+
+class FoldedSchedule:
+    def __init__(self, hyperperiod):
+        '''
+        Args:
+            hyperperiod:            type: int; The number of time slices the schedule expands to.
+            entries:                type: list; One (partition_id, period, offsets) tuple per partition. The partition runs in time slice t iff t%period is in offsets.
+        '''
+        self.hyperperiod = hyperperiod
+        self.entries = []
+
+    def add(self, partition_id, period, offsets):
+        '''
+        This function records the per-period pattern of a partition.
+        '''
+        self.entries.append((partition_id, period, frozenset(offsets)))
+
+    def __len__(self):
+        return self.hyperperiod
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.hyperperiod
+        if index < 0 or index >= self.hyperperiod:
+            raise IndexError('time slice out of range')
+        for (partition_id, period, offsets) in self.entries:
+            if index % period in offsets:
+                return partition_id
+        return -1
+
+    def __iter__(self):
+        #expand lazily, one time slice at a time
+        for t in range(self.hyperperiod):
+            yield self[t]
+
+    def to_schedule(self):
+        '''
+        This function returns the run-length Schedule directly from the per-period patterns, without expanding time slices.
+        The runs of the partitions never overlap, so they are ordered by sorting integer keys start_time*len(lengths) + k, k indexing
+        the length and partition of the run in one period, and adjacent runs of the same partition are merged in one pass.
+        '''
+        lengths = []
+        partition_ids = []
+        keys = []
+        for (partition_id, period, offsets) in self.entries:
+            #group the offsets into contiguous runs inside one period
+            period_runs = []
+            for t in sorted(offsets):
+                if period_runs and period_runs[-1][1] == t:
+                    period_runs[-1][1] = t + 1
+                else:
+                    period_runs.append([t, t + 1])
+            for (start_time, end_time) in period_runs:
+                keys.append((start_time, period, len(lengths)))
+                lengths.append(end_time - start_time)
+                partition_ids.append(partition_id)
+        n = len(lengths)
+        sorted_keys = []
+        for (start_time, period, k) in keys:
+            sorted_keys.extend(range(start_time*n + k, self.hyperperiod*n, period*n))
+        sorted_keys.sort()
+        schedule = Schedule(self.hyperperiod)
+        entries = schedule.entries
+        starts = schedule.starts
+        last = None
+        for key in sorted_keys:
+            (start_time, k) = divmod(key, n)
+            if last is not None and last.end_time == start_time and last.partition_id == partition_ids[k]:
+                last.end_time += lengths[k]
+            else:
+                last = sched_entry(start_time, start_time + lengths[k], partition_ids[k])
+                entries.append(last)
+                starts.append(start_time)
+        return schedule
+
+
+class LaunchTable(FoldedSchedule):
+    def __init__(self, hyperperiod):
+        '''
+        The launch table built by partition_single: the per-period patterns of FoldedSchedule, plus the bitmap of the idle time slices
+        the delta search works on. No per-time-slice table is kept, to_schedule turns the patterns into runs directly.
+        Args:
+            hyperperiod:            type: int; The number of time slices in the launch table.
+            free:                   type: int; Bitmap of the idle time slices, bit t is set when time slice t is idle.
+            first_free:             type: int; The first idle time slice, -1 when the table is full.
+        '''
+        FoldedSchedule.__init__(self, hyperperiod)
+        self.free = (1 << hyperperiod) - 1
+        self.first_free = 0 if hyperperiod > 0 else -1
+
+    def free_count(self):
+        '''
+        This function returns the number of idle time slices.
+        '''
+        return bin(self.free).count('1')
+
+    def period_mask(self, period):
+        '''
+        This function returns the bitmap of the idle time slices in [0, period).
+        '''
+        return self.free & ((1 << period) - 1)
+
+    def occupy(self, partition_id, period, offsets):
+        '''
+        This function assigns the time slices offsets + l*period (for every period in the hyperperiod) to the partition.
+        Returns:
+            -1 if every time slice was idle, otherwise the first time slice that was already taken (nothing is modified then).
+        '''
+        pattern = 0
+        for t in offsets:
+            pattern |= 1 << t
+        #repeat the pattern over the hyperperiod, (2^H-1)/(2^p-1) has one bit set at the start of each period
+        tiled = pattern * (((1 << self.hyperperiod) - 1) // ((1 << period) - 1))
+        taken = tiled & ~self.free
+        if taken:
+            return (taken & -taken).bit_length() - 1
+        self.free &= ~tiled
+        self.add(partition_id, period, offsets)
+        if self.first_free != -1 and not (self.free >> self.first_free) & 1:
+            self.first_free = (self.free & -self.free).bit_length() - 1
+        return -1
+
+
+class SupplyProfile:
+    def __init__(self, hyperperiod, runs):
+        '''
+        Cumulative supply of one partition in a Schedule, repeated every hyperperiod. Only the runs of the partition are kept,
+        with their prefix sums, so every query costs O(log n) for n runs whatever the hyperperiod.
+        The queries over all the runs (min_window, max_blackout, regularity) run on numpy arrays for the partitions with SUPPLY_NUMPY_RUNS
+        runs or more, and in plain Python without numpy or when the hyperperiod is too long for exact int64 products.
+        Args:
+            runs:                   type: list; The sched_entry runs of the partition sorted by start_time.
+            hyperperiod:            type: int; The length of the schedule.
+            starts:                 type: list; Start of each run of the partition.
+            ends:                   type: list; End of each run of the partition (exclusive).
+            before:                 type: list; Supply received before each run, before[-1] being the supply per hyperperiod.
+            arrays:                 type: tuple; starts, ends and before as int64 numpy arrays, None when the queries run in plain Python.
+        '''
+        self.hyperperiod = hyperperiod
+        self.starts = [entry.start_time for entry in runs]
+        self.ends = [entry.end_time for entry in runs]
+        self.before = list(itertools.accumulate((entry.end_time - entry.start_time for entry in runs), initial=0))
+        self.total = self.before[-1]
+        self.arrays = None
+        #before*hyperperiod must fit in an int64
+        if np is not None and len(runs) >= SUPPLY_NUMPY_RUNS and hyperperiod < 2**31:
+            self.arrays = (np.array(self.starts, dtype=np.int64), np.array(self.ends, dtype=np.int64), np.array(self.before, dtype=np.int64))
+
+    @classmethod
+    def of_schedule(cls, schedule):
+        '''
+        This function returns the SupplyProfile of every partition of the schedule in a dict by partition id, in one pass over the runs.
+        '''
+        runs = {}
+        for entry in schedule:
+            runs.setdefault(entry.partition_id, []).append(entry)
+        return dict((partition_id, cls(schedule.hyperperiod, runs[partition_id])) for partition_id in runs)
+
+    def supply(self, t):
+        '''
+        This function returns the supply in [0, t) for any t >= 0.
+        '''
+        (cycles, t) = divmod(t, self.hyperperiod)
+        i = bisect.bisect_right(self.starts, t) - 1
+        if i < 0:
+            return cycles*self.total
+        return cycles*self.total + self.before[i] + min(t, self.ends[i]) - self.starts[i]
+
+    def min_window(self, length):
+        '''
+        This function returns the smallest supply in a window of length time slices, over every start in the hyperperiod.
+        The supply of a window is piecewise linear in its start and only turns from decreasing to increasing when the window
+        starts at the end of a run or ends at the start of one, so these windows are the only ones evaluated.
+        '''
+        if not self.starts:
+            return 0
+        if self.arrays is not None:
+            return self.min_window_numpy(length)
+        hyperperiod = self.hyperperiod
+        supply = self.supply
+        #windows starting at the end of run i, the supply before them is before[i + 1]
+        result = min(supply(t + length) - before for (t, before) in zip(self.ends, self.before[1:]))
+        #windows ending at the start of run j, shifted by whole hyperperiods so that they start at 0 or later
+        for (t, before) in zip(self.starts, self.before):
+            cycles = max(0, -((t - length) // hyperperiod))
+            result = min(result, cycles*self.total + before - supply(t + cycles*hyperperiod - length))
+        return result
+
+    def supply_numpy(self, t):
+        '''
+        This function is supply for an array of times t >= 0.
+        '''
+        (starts, ends, before) = self.arrays
+        (cycles, t) = np.divmod(t, self.hyperperiod)
+        i = np.searchsorted(starts, t, side='right') - 1
+        inside = np.maximum(i, 0)
+        return cycles*self.total + np.where(i < 0, 0, before[inside] + np.minimum(t, ends[inside]) - starts[inside])
+
+    def min_window_numpy(self, length):
+        '''
+        This function is min_window on the arrays.
+        '''
+        (starts, ends, before) = self.arrays
+        result = np.min(self.supply_numpy(ends + length) - before[1:])
+        cycles = np.maximum(0, -((starts - length) // self.hyperperiod))
+        result = min(result, np.min(cycles*self.total + before[:-1] - self.supply_numpy(starts + cycles*self.hyperperiod - length)))
+        return int(result)
+
+    def max_blackout(self):
+        '''
+        This function returns the longest interval without supply, the wrap-around from the last run to the first included.
+        '''
+        if not self.starts:
+            return self.hyperperiod
+        if self.arrays is not None:
+            (starts, ends, before) = self.arrays
+            return max(int(np.max(starts[1:] - ends[:-1], initial=0)), self.starts[0] + self.hyperperiod - self.ends[-1])
+        gaps = [self.starts[i + 1] - self.ends[i] for i in range(len(self.starts) - 1)]
+        gaps.append(self.starts[0] + self.hyperperiod - self.ends[-1])
+        return max(gaps)
+
+    def regularity(self):
+        '''
+        This function returns max(I) - min(I) as a Fraction, I(t) = S(t) - aaf*t being the deviation of the supply S from the rate aaf
+        the partition gets over the hyperperiod. A regular partition stays below 1.
+        The deviation is linear between run boundaries, so it is evaluated there only, scaled by the hyperperiod to stay in integers.
+        '''
+        if not self.starts:
+            return Fraction(0)
+        if self.arrays is not None:
+            (starts, ends, before) = self.arrays
+            deviations = np.concatenate((before[:-1]*self.hyperperiod - self.total*starts, before[1:]*self.hyperperiod - self.total*ends, [0]))
+            return Fraction(int(deviations.max() - deviations.min()), self.hyperperiod)
+        deviations = [self.before[i]*self.hyperperiod - self.total*self.starts[i] for i in range(len(self.starts))]
+        deviations += [self.before[i + 1]*self.hyperperiod - self.total*self.ends[i] for i in range(len(self.ends))]
+        #I(0) = I(hyperperiod) = 0
+        deviations.append(0)
+        return Fraction(max(deviations) - min(deviations), self.hyperperiod)
+
+
+class AllocationStrategy(abc.ABC):
+    #name used by RRP(alloc_strategy=...) and the command line
+    name = None
+    #whether packing on a list of pcpus that grows only when a partition fits nowhere gives the same CPUs as a fixed list (see RRP.min_cpu)
+    open_ended = True
+
+    def __init__(self, rrp, pcpu_factors, pcpu_rests):
+        '''
+        Base class of the MulZ allocation strategies. A strategy is created for one packing and updates the lists it is given.
+        Subclasses implement candidate, and may override allocate to pack a whole set at once.
+        Args:
+            rrp:                    type: RRP; The instance whose z_approx is used.
+            pcpu_factors:           type: list; The factor of each pcpu, 0 for an empty one.
+            pcpu_rests:             type: list; The space left on each pcpu.
+        '''
+        self.rrp = rrp
+        self.factors = pcpu_factors
+        self.rests = pcpu_rests
+
+    def own_factor(self, par):
+        '''
+        This function returns the factor in [3,4,5,7] approximating the partition best, with the approximation (aaf, w, p).
+        The first factor wins ties, like in the original MulZ_alloc.
+        '''
+        best = None
+        for f in [3,4,5,7]:
+            approx = self.rrp.z_approx(par.aaf, f)
+            if best is None or approx[0] < best[1][0]:
+                best = (f, approx)
+        return best
+
+    @abc.abstractmethod
+    def candidate(self, par):
+        '''
+        Returns:
+            A tuple (pcpu_id, factor, (aaf, w, p)) for the pcpu the partition goes to, None if it fits nowhere.
+        '''
+
+    def place(self, par):
+        '''
+        This function assigns the partition to the pcpu chosen by candidate and sets its aaf, WCET and period.
+        Returns:
+            pcpu_id: int. None if the partition fits nowhere, nothing is changed then.
+        '''
+        chosen = self.candidate(par)
+        if chosen is None:
+            return None
+        (i, f, approx) = chosen
+        self.assign(i, f, approx)
+        (par.aaf, par.wcet, par.period) = approx
+        return i
+
+    def assign(self, i, f, approx):
+        if self.factors[i] == 0:
+            self.factors[i] = f
+            self.rests[i] = 1 - approx[0]
+        else:
+            self.rests[i] -= approx[0]
+
+    def add_pcpu(self):
+        '''
+        This function appends an empty pcpu.
+        '''
+        self.factors.append(0)
+        self.rests.append(1)
+
+    def allocate(self, partition_list):
+        '''
+        This function places the partitions in order.
+        Returns:
+            A tuple. The first element is the list of the pcpu_id of each partition placed, the second one the partition
+            that could not be placed (None when all of them were).
+        '''
+        assignment = []
+        for par in partition_list:
+            i = self.place(par)
+            if i is None:
+                return (assignment, par)
+            assignment.append(i)
+        return (assignment, None)
+
+
+class FirstFit(AllocationStrategy):
+    '''
+    The original MulZ_alloc: the first pcpu in order that is empty or can take the partition under its factor.
+    '''
+    name = 'first-fit'
+
+    def candidate(self, par):
+        for i in range(len(self.factors)):
+            #if a cpu is empty, put the partition there
+            if self.factors[i] == 0:
+                (f, approx) = self.own_factor(par)
+                return (i, f, approx)
+            #if a non-empty pcpu can fit it under its factor, put it in.
+            approx = self.rrp.z_approx(par.aaf, self.factors[i])
+            if self.rests[i] >= approx[0]:
+                return (i, self.factors[i], approx)
+        return None
+
+
+class IndexedStrategy(AllocationStrategy):
+    def __init__(self, rrp, pcpu_factors, pcpu_rests):
+        '''
+        Base class of the strategies that search the pcpus through an index instead of scanning them.
+        Args:
+            groups:                 type: dict; Factor to the sorted list of (rest, pcpu_id) of the non-empty pcpus with that factor.
+            empty:                  type: list; The sorted ids of the empty pcpus.
+        '''
+        AllocationStrategy.__init__(self, rrp, pcpu_factors, pcpu_rests)
+        self.reindex()
+
+    def reindex(self):
+        self.groups = dict((f, []) for f in [3,4,5,7])
+        self.empty = []
+        for i in range(len(self.factors)):
+            if self.factors[i] == 0:
+                self.empty.append(i)
+            else:
+                self.groups.setdefault(self.factors[i], []).append((self.rests[i], i))
+        for group in self.groups.values():
+            group.sort()
+
+    def assign(self, i, f, approx):
+        if self.factors[i] == 0:
+            del self.empty[bisect.bisect_left(self.empty, i)]
+        else:
+            group = self.groups[f]
+            del group[bisect.bisect_left(group, (self.rests[i], i))]
+        AllocationStrategy.assign(self, i, f, approx)
+        bisect.insort(self.groups[f], (self.rests[i], i))
+
+    def add_pcpu(self):
+        AllocationStrategy.add_pcpu(self)
+        self.empty.append(len(self.factors) - 1)
+
+    def fitting(self, group, need):
+        '''
+        This function returns the position of the first pcpu of a group with at least need left, len(group) if there is none.
+        '''
+        return bisect.bisect_left(group, (need, -1))
+
+
+class BestFit(IndexedStrategy):
+    '''
+    The non-empty pcpu left with the least space after taking the partition, an empty pcpu only when none fits.
+    Each factor group is searched by bisection, O(log m) per partition.
+    '''
+    name = 'best-fit'
+
+    def candidate(self, par):
+        best = None
+        for (f, group) in self.groups.items():
+            approx = self.rrp.z_approx(par.aaf, f)
+            j = self.fitting(group, approx[0])
+            if j < len(group):
+                (rest, i) = group[j]
+                if best is None or (rest - approx[0], i) < best[0]:
+                    best = ((rest - approx[0], i), i, f, approx)
+        if best is not None:
+            return best[1:]
+        if self.empty:
+            (f, approx) = self.own_factor(par)
+            return (self.empty[0], f, approx)
+        return None
+
+
+class WorstFit(IndexedStrategy):
+    '''
+    The pcpu left with the most space after taking the partition, empty pcpus included, which spreads the load over all the CPUs.
+    '''
+    name = 'worst-fit'
+    open_ended = False
+
+    def candidate(self, par):
+        best = None
+        for (f, group) in self.groups.items():
+            if not group:
+                continue
+            approx = self.rrp.z_approx(par.aaf, f)
+            #the lowest id among the pcpus with the most space left
+            (rest, i) = group[self.fitting(group, group[-1][0])]
+            if rest >= approx[0] and (best is None or (approx[0] - rest, i) < best[0]):
+                best = ((approx[0] - rest, i), i, f, approx)
+        if self.empty:
+            (f, approx) = self.own_factor(par)
+            i = self.empty[0]
+            if best is None or (approx[0] - 1, i) < best[0]:
+                best = ((approx[0] - 1, i), i, f, approx)
+        if best is not None:
+            return best[1:]
+        return None
+
+
+class RestTree:
+    def __init__(self, size):
+        '''
+        Max segment tree over pcpu ids: the pcpu with the lowest id among those with at least some space left is found in O(log m).
+        Args:
+            size:                   type: int; The number of leaves, a power of two, grown as needed.
+            tree:                   type: list; tree[1] is the root, the children of node k are 2k and 2k+1. A leaf holds the rest of its pcpu, -1 when the pcpu is not in the tree.
+        '''
+        self.size = 1
+        while self.size < size:
+            self.size *= 2
+        self.tree = [-1]*(2*self.size)
+
+    def set(self, i, rest):
+        if i >= self.size:
+            #more pcpus (see add_pcpu), double the leaves and rebuild the inner nodes
+            leaves = self.tree[self.size:]
+            while self.size <= i:
+                self.size *= 2
+            self.tree = [-1]*self.size + leaves + [-1]*(self.size - len(leaves))
+            for k in range(self.size - 1, 0, -1):
+                self.tree[k] = max(self.tree[2*k], self.tree[2*k + 1])
+        k = self.size + i
+        self.tree[k] = rest
+        k //= 2
+        while k:
+            value = max(self.tree[2*k], self.tree[2*k + 1])
+            if value == self.tree[k]:
+                #the nodes above are unchanged
+                break
+            self.tree[k] = value
+            k //= 2
+
+    def leftmost(self, need):
+        '''
+        This function returns the lowest pcpu id with at least need left, None if there is none.
+        '''
+        if self.tree[1] < need:
+            return None
+        k = 1
+        while k < self.size:
+            k = 2*k if self.tree[2*k] >= need else 2*k + 1
+        return k - self.size
+
+
+class FactorGrouped(IndexedStrategy):
+    '''
+    The first pcpu whose factor is the one approximating the partition best, then the first non-empty pcpu of another factor,
+    then an empty pcpu. Partitions sharing a factor end up together, with the least approximation loss.
+    The first fitting pcpu of a factor is found with a RestTree per factor (trees, instead of the groups), O(log m) per partition.
+    '''
+    name = 'factor-grouped'
+
+    def reindex(self):
+        self.trees = {}
+        self.empty = []
+        for i in range(len(self.factors)):
+            if self.factors[i] == 0:
+                self.empty.append(i)
+            else:
+                self.trees.setdefault(self.factors[i], RestTree(len(self.factors))).set(i, self.rests[i])
+
+    def assign(self, i, f, approx):
+        if self.factors[i] == 0:
+            del self.empty[bisect.bisect_left(self.empty, i)]
+        AllocationStrategy.assign(self, i, f, approx)
+        self.trees.setdefault(f, RestTree(len(self.factors))).set(i, self.rests[i])
+
+    def candidate(self, par):
+        (own, own_approx) = self.own_factor(par)
+        if own in self.trees:
+            i = self.trees[own].leftmost(own_approx[0])
+            if i is not None:
+                return (i, own, own_approx)
+        best = None
+        for (f, tree) in self.trees.items():
+            if f == own:
+                continue
+            approx = self.rrp.z_approx(par.aaf, f)
+            i = tree.leftmost(approx[0])
+            if i is not None and (best is None or i < best[0]):
+                best = (i, f, approx)
+        if best is not None:
+            return best
+        if self.empty:
+            return (self.empty[0], own, own_approx)
+        return None
+
+
+class BranchAndBound(BestFit):
+    '''
+    Backtracking search over the pcpu of every partition, best-fit order first, so the first packing tried is the best-fit one.
+    A branch is cut when the space left on all the pcpus is below the sum of the smallest approximations of the partitions still to place.
+    The search gives up (the set is reported unschedulable) after alloc_budget seconds of the RRP instance.
+    Single partitions (add_partition) are placed with best-fit.
+    '''
+    name = 'branch-and-bound'
+    open_ended = False
+
+    def options(self, par):
+        '''
+        This function lists the (pcpu_id, factor, approximation) the partition can go to: the non-empty pcpus it fits on,
+        least space left first, then the first empty pcpu (the empty pcpus are interchangeable).
+        '''
+        result = []
+        for i in range(len(self.factors)):
+            if self.factors[i] != 0:
+                approx = self.rrp.z_approx(par.aaf, self.factors[i])
+                if self.rests[i] >= approx[0]:
+                    result.append((self.rests[i] - approx[0], i, self.factors[i], approx))
+        result.sort()
+        result = [option[1:] for option in result]
+        if 0 in self.factors:
+            (f, approx) = self.own_factor(par)
+            result.append((self.factors.index(0), f, approx))
+        return result
+
+    def allocate(self, partition_list):
+        deadline = time.perf_counter() + self.rrp.alloc_budget
+        n = len(partition_list)
+        #smallest total space the partitions from position k on need
+        needed = [0]*(n + 1)
+        for k in range(n - 1, -1, -1):
+            needed[k] = needed[k + 1] + self.own_factor(partition_list[k])[1][0]
+        space = sum(self.rests)
+        options = [None]*n
+        positions = [0]*n
+        saved = [None]*n
+        deepest = 0
+        depth = 0
+        if n:
+            options[0] = self.options(partition_list[0])
+        while 0 <= depth < n:
+            if positions[depth] >= len(options[depth]) or time.perf_counter() > deadline:
+                #backtrack
+                depth -= 1
+                if depth >= 0:
+                    (i, factor, rest) = saved[depth]
+                    space += rest - self.rests[i]
+                    (self.factors[i], self.rests[i]) = (factor, rest)
+                    positions[depth] += 1
+                continue
+            (i, f, approx) = options[depth][positions[depth]]
+            if space - approx[0] < needed[depth + 1]:
+                positions[depth] += 1
+                continue
+            saved[depth] = (i, self.factors[i], self.rests[i])
+            AllocationStrategy.assign(self, i, f, approx)
+            space -= approx[0]
+            depth += 1
+            deepest = max(deepest, depth)
+            if depth < n:
+                options[depth] = self.options(partition_list[depth])
+                positions[depth] = 0
+        self.reindex()
+        if depth < 0:
+            return ([], partition_list[min(deepest, n - 1)])
+        assignment = []
+        for k in range(n):
+            (i, f, approx) = options[k][positions[k]]
+            (partition_list[k].aaf, partition_list[k].wcet, partition_list[k].period) = approx
+            assignment.append(i)
+        return (assignment, None)
+
+
+#allocation strategies by name, see RRP(alloc_strategy=...)
+ALLOCATION_STRATEGIES = dict((strategy.name, strategy) for strategy in [FirstFit, BestFit, WorstFit, FactorGrouped, BranchAndBound])
+
+
+#namespace of the XtratuM configuration files
+XM_NAMESPACE = 'http://www.xtratum.org/xm-arm-2.x'
+#configuration files larger than this (in bytes) get their ProcessorTable spliced in streaming mode
+STREAMING_CONFIG_SIZE = 64*1024*1024
+
+
+class XMConfig:
+    def __init__(self, xml_file_name):
+        '''
+        Args:
+            xml_file_name:          type: string; The XtratuM configuration file.
+            tree:                   type: ElementTree; The parsed document.
+            namespace:              type: string; The namespace of the root element, '' when it has none.
+            hw_description:         type: Element; The HwDescription element.
+            processor_table:        type: Element; The ProcessorTable element of HwDescription, created when missing.
+        Raises ET.ParseError when the file is not well formed and ValueError when it has no HwDescription.
+        '''
+        self.tree = ET.parse(xml_file_name)
+        root = self.tree.getroot()
+        self.namespace = root.tag[1:root.tag.index('}')] if root.tag.startswith('{') else ''
+        if self.namespace:
+            #write the document back with its namespace as the default one
+            ET.register_namespace('', self.namespace)
+        self.hw_description = root.find(self.qname('HwDescription'))
+        if self.hw_description is None:
+            raise ValueError('No HwDescription in '+xml_file_name+'.')
+        self.processor_table = self.hw_description.find(self.qname('ProcessorTable'))
+        if self.processor_table is None:
+            self.processor_table = ET.SubElement(self.hw_description, self.qname('ProcessorTable'))
+
+    def qname(self, tag):
+        '''
+        This function returns the tag in the namespace of the document.
+        '''
+        if self.namespace:
+            return '{'+self.namespace+'}'+tag
+        return tag
+
+    def replace_processors(self, processors):
+        '''
+        This function removes every Processor of the ProcessorTable, whatever its namespace, and appends the given ones in the namespace of the document.
+        '''
+        for node in list(self.processor_table):
+            if node.tag.rpartition('}')[2] == 'Processor':
+                self.processor_table.remove(node)
+        for processor in processors:
+            for node in processor.iter():
+                if not node.tag.startswith('{'):
+                    node.tag = self.qname(node.tag)
+            self.processor_table.append(processor)
+
+    @staticmethod
+    def splice_processors(xml_file_name, output_file_name, processors):
+        '''
+        This function replaces the ProcessorTable of a configuration without loading the document: a streaming expat pass finds the
+        byte range of HwDescription/ProcessorTable, then the file is copied around the new table. The table keeps its prefix and attributes.
+        The copy goes through a temporary file replacing output_file_name at the end, it is removed when the copy fails.
+        Raises expat.ExpatError when the file is not well formed and ValueError when it has no HwDescription.
+        '''
+        parser = expat.ParserCreate()
+        state = {'depth': 0, 'hw_depth': None, 'prefix': '', 'hw_end': None, 'table_depth': None, 'start': None, 'end': None, 'name': None, 'attrs': None}
+        def start_element(name, attrs):
+            local = name.rpartition(':')[2]
+            if local == 'HwDescription' and state['depth'] == 1 and state['hw_depth'] is None:
+                state['hw_depth'] = state['depth']
+                state['prefix'] = name[:-len(local)]
+            elif local == 'ProcessorTable' and state['hw_depth'] is not None and state['hw_end'] is None and state['depth'] == state['hw_depth'] + 1 and state['start'] is None:
+                state['start'] = parser.CurrentByteIndex
+                state['name'] = name
+                state['attrs'] = attrs
+                state['table_depth'] = state['depth']
+            state['depth'] += 1
+        def end_element(name):
+            state['depth'] -= 1
+            if state['start'] is not None and state['end'] is None and state['depth'] == state['table_depth']:
+                state['end'] = parser.CurrentByteIndex
+            elif state['depth'] == state['hw_depth'] and state['hw_end'] is None:
+                state['hw_end'] = parser.CurrentByteIndex
+        parser.StartElementHandler = start_element
+        parser.EndElementHandler = end_element
+        with open(xml_file_name, 'rb') as f:
+            parser.ParseFile(f)
+        if state['hw_end'] is None:
+            raise ValueError('No HwDescription in '+xml_file_name+'.')
+        temp_file_name = output_file_name+'.'+str(os.getpid())+'.tmp'
+        try:
+            with open(xml_file_name, 'rb') as f:
+                if state['start'] is None:
+                    #no ProcessorTable, insert one before </HwDescription>
+                    start = end = state['hw_end']
+                    name = state['prefix']+'ProcessorTable'
+                    attrs = {}
+                else:
+                    start = state['start']
+                    f.seek(state['end'])
+                    end = state['end'] + f.read(64*1024).index(b'>') + 1
+                    name = state['name']
+                    attrs = state['attrs']
+                prefix = name[:-len('ProcessorTable')]
+                table = ET.Element(name, attrs)
+                for processor in processors:
+                    for node in processor.iter():
+                        node.tag = prefix+node.tag.rpartition('}')[2]
+                    table.append(processor)
+                ET.indent(table, space='   ', level=state['hw_depth'] + 1)
+                table.tail = None
+                with open(temp_file_name, 'wb') as out:
+                    f.seek(0)
+                    remaining = start
+                    while remaining > 0:
+                        chunk = f.read(min(remaining, 1024*1024))
+                        if not chunk:
+                            break
+                        out.write(chunk)
+                        remaining -= len(chunk)
+                    out.write(ET.tostring(table, encoding='unicode').encode('utf-8'))
+                    f.seek(end)
+                    shutil.copyfileobj(f, out)
+            os.replace(temp_file_name, output_file_name)
+        except BaseException:
+            #no temporary file is left behind, the output is untouched
+            with contextlib.suppress(OSError):
+                os.remove(temp_file_name)
+            raise
+
+
+class Instrumentation:
+    def __init__(self):
+        '''
+        Counters and per-stage wall time of an RRP instance created with instrument=True.
+        Args:
+            counters:               type: dict; Counter name to value, e.g. find_delta_calls, deltas_tried, check_delta_calls, launch_table_updates.
+                                    check_delta_calls counts the shift checks, one per shift in find_delta_reference, one per pattern
+                                    (all the shifts at once) in find_delta_mask.
+            stages:                 type: dict; Stage name to [number of runs, total seconds].
+            hooks:                  type: list; Callbacks called as hook(event, stage, seconds) when a stage starts ('start', seconds None) and stops ('stop').
+        '''
+        self.counters = {}
+        self.stages = {}
+        self.hooks = []
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def start(self, stage):
+        '''
+        This function marks the start of a stage and returns the time to pass to stop.
+        '''
+        for hook in self.hooks:
+            hook('start', stage, None)
+        return time.perf_counter()
+
+    def stop(self, stage, start):
+        seconds = time.perf_counter() - start
+        record = self.stages.setdefault(stage, [0, 0.0])
+        record[0] += 1
+        record[1] += seconds
+        for hook in self.hooks:
+            hook('stop', stage, seconds)
+
+    @contextlib.contextmanager
+    def stage(self, stage):
+        '''
+        This function times the body of a with statement as one run of the stage, which is stopped even when the body returns or raises.
+        '''
+        start = self.start(stage)
+        try:
+            yield
+        finally:
+            self.stop(stage, start)
+
+    def merge(self, other):
+        '''
+        This function adds the counters and stages of other, a dict from to_dict (e.g. collected in a process pool worker), to these.
+        '''
+        for (name, n) in other['counters'].items():
+            self.count(name, n)
+        for (stage, record) in other['stages'].items():
+            total = self.stages.setdefault(stage, [0, 0.0])
+            total[0] += record['runs']
+            total[1] += record['seconds']
+
+    def reset(self):
+        self.counters = {}
+        self.stages = {}
+
+    def to_dict(self):
+        return {'counters': dict(self.counters), 'stages': dict((stage, {'runs': record[0], 'seconds': record[1]}) for (stage, record) in self.stages.items())}
+
+    def write(self, file_name):
+        with open(file_name, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+            f.write('\n')
+
+
+class RRP:
+    def __init__(self, simplified=False, folded=False, verbose=True, workers=1, log_level=None, dump_file=None, instrument=False, alloc_strategy='first-fit', alloc_budget=1.0, schedule_cache=None):
+                '''
+                Args:
+                        simplified:             type: bool; Whether only the ProcessorTable is written (to RRPOutput.xml) instead of updating an XtratuM configuration.
+                        folded:                 type: bool; Whether partitions are placed on their per-period residue classes (partition_folded) instead of a full-length launch table.
+                        verbose:                type: bool; Shorthand for log_level, logging.INFO when True and logging.WARNING when False.
+                        workers:                type: int; The number of processes used to schedule the CPUs of MulZ, 1 runs serially. The pool is only used when
+                                                the CPUs have PARALLEL_MIN_SLICES time slices in all, and has no more processes than os.cpu_count().
+                        log_level:              type: int; The lowest logging level this instance emits on the 'RRP' logger. Status messages and run-length
+                                                launch tables are INFO, per-time-slice launch tables DEBUG. Messages below it are not even formatted.
+                        dump_file:              type: string; When given, set_partitions writes the launch tables there in one write.
+                        instrument:             type: bool; Whether counters and stage timings are collected in self.stats (an Instrumentation, None otherwise).
+                                                set_partitions then writes them next to the xml file, as <xml file>.stats.json.
+                                                The counters and stages of the process pool workers (workers > 1) are added to those of the instance.
+                        alloc_strategy:         type: string; How MulZ assigns partitions to CPUs, a name of ALLOCATION_STRATEGIES (first-fit, best-fit,
+                                                worst-fit, factor-grouped or branch-and-bound) or an AllocationStrategy subclass.
+                        alloc_budget:           type: float; Seconds the branch-and-bound strategy may search before giving up on a set.
+                        schedule_cache:         type: ScheduleCache; When given, set_partitions and generate_batch look the schedules up there before computing them, see cached_schedule.
+                Raises ValueError for an unknown alloc_strategy.
+                '''
+                if isinstance(alloc_strategy, str):
+                    if alloc_strategy not in ALLOCATION_STRATEGIES:
+                        raise ValueError('Unknown allocation strategy '+alloc_strategy+'.')
+                    alloc_strategy = ALLOCATION_STRATEGIES[alloc_strategy]
+                self.alloc_strategy = alloc_strategy
+                self.alloc_budget = alloc_budget
+                self.simplified = simplified
+                self.folded = folded
+                if log_level is None:
+                    log_level = logging.INFO if verbose else logging.WARNING
+                self.log_level = log_level
+                self.workers = workers
+                self.dump_file = dump_file
+                self.stats = Instrumentation() if instrument else None
+                self.schedule_cache = schedule_cache
+                #the current schedule and its allocation state, set by generate_schedule (see add_partition)
+                self.schedules = None
+                #the allocation strategy of the last MulZ_alloc call
+                self.placement = None
+
+    def set_partitions(self, par_list, CPU_num, time_slice_len=100, xml_file_name='xm_cf.arm.xml', processor_freq=400):
+                '''
+                Args:
+                        par_list:               type: list; A list of partitions to be scheduled.
+                        CPU_num:                type: int; The number of CPU to be scheduled on.
+                        time_slice_len:         type: int; The length of each time slice, given in milliseconds.
+                        xml_file_name:          type: string; The name of the xml file
+                        processor_freq:         type: int; The frequency of processors, given in MHz.
+                Returns:
+                        returns a boolean value to indicate whether the partitions are schedulable or now. True for schedulable, False for non-schedulable.
+                '''
+                if self.stats is not None:
+                    self.stats.reset()
+                if CPU_num>1:
+                    self.report("Executing mulZ.\n")
+                else:
+                    self.report("Executing Magic7.\n")
+                if self.schedule_cache is not None:
+                    (schedules, processors) = self.cached_schedule(par_list, CPU_num, time_slice_len, processor_freq)
+                else:
+                    (schedules, processors) = (self.generate_schedule(par_list, CPU_num), None)
+                if schedules is None:
+                    self.report("Unschedulable!")
+                    return False
+                self.log_launch_tables(schedules)
+                if self.dump_file is not None:
+                    self.dump_launch_tables(schedules, self.dump_file)
+                if processors is None:
+                    written = self.write_schedules(schedules, time_slice_len, xml_file_name, processor_freq)
+                else:
+                    with self.stage('xml_write'):
+                        written = self.write_processors(processors, xml_file_name, None)
+                if written and self.stats is not None:
+                    self.stats.write(('RRPOutput.xml' if self.simplified else xml_file_name)+'.stats.json')
+                return written
+
+    def generate_schedule(self, par_list, CPU_num):
+                '''
+                This function computes the schedule without printing or writing anything. The partitions passed in are left untouched.
+                The allocation state is kept on the instance (see add_partition) when the partitions are schedulable.
+                Args:
+                        par_list:               type: list; A list of partitions to be scheduled.
+                        CPU_num:                type: int; The number of CPU to be scheduled on.
+                Returns:
+                        schedules:              type: list; The Schedule of each CPU. None if the partitions are not schedulable.
+                '''
+                originals = [copy.copy(par) for par in par_list]
+                par_list = [copy.copy(par) for par in par_list]
+                if CPU_num>1:
+                    #execute mulZ here
+                    result = self.MulZ(par_list, CPU_num)
+                    if result is None:
+                        return None
+                    (schedules, allocation) = result
+                else:
+                    #execute Magic7 here
+                    with self.stage('approximation'):
+                        for par in par_list:
+                            self.magic7(par)
+                    with self.stage('partition_single'):
+                        launch_table = self.partition_single(par_list)
+                    if launch_table is None:
+                        return None
+                    schedules = [self.to_schedule(launch_table)]
+                    allocation = ([par_list], [7], [1 - sum(par.aaf for par in par_list)])
+                #the state only changes once the partitions are known to be schedulable
+                (self.pcpu_partitions_dict, self.pcpu_factors, self.pcpu_rests) = allocation
+                self.CPU_num = CPU_num
+                self.originals = dict((par.partition_id, par) for par in originals)
+                self.schedules = schedules
+                return schedules
+
+    def cached_schedule(self, par_list, CPU_num, time_slice_len=100, processor_freq=None):
+                '''
+                This function is generate_schedule going through self.schedule_cache. The schedules are stored under cache_key, as JSON
+                (see schedule_entry): a hit restores them and the allocation state (see add_partition) without running Magic7/MulZ or the
+                delta search, unschedulable sets are cached as well. The Processor elements are stored as xml text under xml_cache_key.
+                A failure to store an entry is only reported, the schedule computed is returned anyway.
+                Args:
+                        par_list:               type: list; A list of partitions to be scheduled.
+                        CPU_num:                type: int; The number of CPU to be scheduled on.
+                        time_slice_len:         type: int; The length of each time slice, given in milliseconds.
+                        processor_freq:         type: int; The frequency of processors in MHz. When given, the Processor elements are cached too.
+                Returns:
+                        A tuple. The first element is the Schedule of each CPU, None if the partitions are not schedulable. The second one is the
+                        Processor element of each CPU (see processor_node), None when processor_freq is None or the partitions are not schedulable.
+                '''
+                key = self.cache_key(par_list, CPU_num)
+                restored = self.restore_entry(self.schedule_cache.get(key))
+                if restored is not None:
+                    if self.stats is not None:
+                        self.stats.count('cache_hits')
+                    (schedules, allocation) = restored
+                    if schedules is not None:
+                        (self.pcpu_partitions_dict, self.pcpu_factors, self.pcpu_rests) = allocation
+                        self.CPU_num = CPU_num
+                        self.originals = dict((par.partition_id, copy.copy(par)) for par in par_list)
+                        self.schedules = schedules
+                else:
+                    if self.stats is not None:
+                        self.stats.count('cache_misses')
+                    schedules = self.generate_schedule(par_list, CPU_num)
+                    self.store_entry(key, self.schedule_entry(schedules))
+                if schedules is None or processor_freq is None:
+                    return (schedules, None)
+                xml_key = self.xml_cache_key(key, time_slice_len, processor_freq)
+                entry = self.schedule_cache.get(xml_key)
+                try:
+                    processors = [ET.fromstring(processor) for processor in entry['processors']]
+                    if self.stats is not None:
+                        self.stats.count('xml_cache_hits')
+                except (TypeError, KeyError, ET.ParseError):
+                    if self.stats is not None:
+                        self.stats.count('xml_cache_misses')
+                    processors = self.build_processors(schedules, time_slice_len, processor_freq)
+                    self.store_entry(xml_key, {'processors': [ET.tostring(processor, encoding='unicode') for processor in processors]})
+                return (schedules, processors)
+
+    def store_entry(self, key, entry):
+                '''
+                This function stores an entry in self.schedule_cache, a failure is only reported.
+                '''
+                try:
+                    self.schedule_cache.put(key, entry)
+                except OSError as e:
+                    self.report("Unable to store the schedule in the cache: "+str(e), logging.WARNING)
+
+    def schedule_entry(self, schedules):
+                '''
+                This function describes the schedules just generated and the allocation state as plain JSON data: the runs [start, end, id]
+                and hyperperiod of each Schedule, the [id, wcet, period, aaf] of the partitions of each pcpu, the pcpu factors and rests.
+                Fractions are written as 'n/d' strings. schedules is None for an unschedulable set.
+                '''
+                if schedules is None:
+                    return {'schedules': None}
+                number = self.canonical_number
+                return {
+                    'schedules': [{'hyperperiod': schedule.hyperperiod, 'runs': [[entry.start_time, entry.end_time, entry.partition_id] for entry in schedule]} for schedule in schedules],
+                    'partitions': [[[par.partition_id, number(par.wcet), number(par.period), number(par.aaf)] for par in partitions] for partitions in self.pcpu_partitions_dict],
+                    'factors': list(self.pcpu_factors),
+                    'rests': [number(rest) for rest in self.pcpu_rests],
+                }
+
+    def restore_entry(self, entry):
+                '''
+                This function reads an entry of schedule_entry back.
+                Returns:
+                        A tuple (schedules, (pcpu_partitions_dict, pcpu_factors, pcpu_rests)), (None, None) for an unschedulable set.
+                        None when entry is None or malformed, which is a cache miss.
+                '''
+                try:
+                    if entry['schedules'] is None:
+                        return (None, None)
+                    schedules = [Schedule.from_runs(int(schedule['hyperperiod']), [(int(start), int(end), int(partition_id)) for (start, end, partition_id) in schedule['runs']])
+                                 for schedule in entry['schedules']]
+                    pcpu_partitions_dict = []
+                    for partitions in entry['partitions']:
+                        pcpu_partitions_dict.append([])
+                        for (partition_id, wcet, period, aaf) in partitions:
+                            par = Partition(self.parse_number(wcet), self.parse_number(period), int(partition_id))
+                            par.aaf = Fraction(aaf)
+                            pcpu_partitions_dict[-1].append(par)
+                    allocation = (pcpu_partitions_dict, [int(factor) for factor in entry['factors']], [Fraction(rest) for rest in entry['rests']])
+                except (TypeError, KeyError, ValueError, ZeroDivisionError):
+                    return None
+                return (schedules, allocation)
+
+    def cache_key(self, par_list, CPU_num):
+                '''
+                This function fingerprints the inputs of a schedule: the sha256 of a canonical JSON of the partitions (in order, MulZ and
+                partition_single depend on it), CPU_num, the name of the allocation strategy and its budget and SCHEDULE_CACHE_VERSION. Numbers are compared
+                by value, 10, 10.0 and Fraction(10) give the same key. The folded mode gives the same schedules, it is not part of the key.
+                '''
+                description = {
+                    'version': SCHEDULE_CACHE_VERSION,
+                    'partitions': [[par.partition_id, self.canonical_number(par.wcet), self.canonical_number(par.period)] for par in par_list],
+                    'cpu_num': int(CPU_num),
+                    #the name, not the module, so that the command line (__main__) and the library (RRP) share entries
+                    'alloc_strategy': self.alloc_strategy.name or self.alloc_strategy.__qualname__,
+                    'alloc_budget': self.alloc_budget,
+                }
+                return hashlib.sha256(json.dumps(description, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+    def xml_cache_key(self, key, time_slice_len, processor_freq):
+                '''
+                This function fingerprints the Processor elements of the schedules stored under key, see cache_key.
+                '''
+                description = {
+                    'version': SCHEDULE_CACHE_VERSION,
+                    'schedules': key,
+                    'time_slice_len': self.canonical_number(time_slice_len),
+                    'processor_freq': self.canonical_number(processor_freq),
+                }
+                return hashlib.sha256(json.dumps(description, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+    def canonical_number(self, value):
+                '''
+                This function writes a number for the cache keys: an int when it is integral, an 'n/d' string otherwise.
+                '''
+                value = to_fraction(value)
+                return value.numerator if value.denominator == 1 else str(value)
+
+    def add_partition(self, par):
+                '''
+                This function places one more partition into the current schedule (from generate_schedule or set_partitions)
+                without touching the other CPUs: it is allocated like in Magic7/MulZ_alloc and only the launch table of its CPU is rebuilt.
+                Args:
+                        par:                    type: Partition; The partition to add, left untouched.
+                Returns:
+                        True when it was placed, self.schedules is updated then. False when a full rebuild is needed (see rebuild), the current schedule is unchanged.
+                Raises ValueError when there is no current schedule.
+                '''
+                self.require_schedule()
+                if par.partition_id in self.originals:
+                    self.report("Partition "+str(par.partition_id)+" is already scheduled.")
+                    return False
+                original = copy.copy(par)
+                par = copy.copy(par)
+                pcpu_factors = list(self.pcpu_factors)
+                pcpu_rests = list(self.pcpu_rests)
+                if self.CPU_num>1:
+                    f = self.MulZ_alloc(par, pcpu_factors, pcpu_rests)
+                    if f is None:
+                        self.report("No room for partition "+str(par.partition_id)+", a full rebuild is needed.")
+                        return False
+                else:
+                    self.magic7(par)
+                    if pcpu_rests[0] < par.aaf:
+                        self.report("No room for partition "+str(par.partition_id)+", a full rebuild is needed.")
+                        return False
+                    pcpu_rests[0] -= par.aaf
+                    f = 0
+                partitions = self.pcpu_partitions_dict[f] + [par]
+                launch_table = self.partition_single(list(partitions))
+                if launch_table is None:
+                    self.report("Partition "+str(par.partition_id)+" does not fit on CPU "+str(f)+", a full rebuild is needed.")
+                    return False
+                self.pcpu_partitions_dict[f] = partitions
+                self.pcpu_factors = pcpu_factors
+                self.pcpu_rests = pcpu_rests
+                self.originals[par.partition_id] = original
+                self.schedules[f] = self.to_schedule(launch_table)
+                return True
+
+    def remove_partition(self, partition_id):
+                '''
+                This function removes one partition from the current schedule and rebuilds the launch table of its CPU only.
+                Returns:
+                        True when it was removed, False when it is not scheduled.
+                Raises ValueError when there is no current schedule.
+                '''
+                self.require_schedule()
+                for f in range(len(self.pcpu_partitions_dict)):
+                    partitions = [par for par in self.pcpu_partitions_dict[f] if par.partition_id != partition_id]
+                    if len(partitions) == len(self.pcpu_partitions_dict[f]):
+                        continue
+                    removed = [par for par in self.pcpu_partitions_dict[f] if par.partition_id == partition_id][0]
+                    launch_table = self.partition_single(list(partitions))
+                    if launch_table is None:
+                        #a subset of a schedulable set may still fail the delta search
+                        self.report("CPU "+str(f)+" cannot be rescheduled without partition "+str(partition_id)+", a full rebuild is needed.")
+                        return False
+                    self.pcpu_partitions_dict[f] = partitions
+                    if partitions:
+                        self.pcpu_rests[f] += removed.aaf
+                    elif self.CPU_num>1:
+                        #an empty pcpu takes any factor again
+                        self.pcpu_factors[f] = 0
+                        self.pcpu_rests[f] = 1
+                    else:
+                        self.pcpu_rests[f] = 1
+                    del self.originals[partition_id]
+                    self.schedules[f] = self.to_schedule(launch_table)
+                    return True
+                self.report("Partition "+str(partition_id)+" is not scheduled.")
+                return False
+
+    def update_partition(self, partition_id, wcet, period):
+                '''
+                This function changes the WCET and period of a scheduled partition through remove_partition and add_partition.
+                Returns:
+                        True when the schedule was updated in place, False when a full rebuild is needed (the current schedule is unchanged).
+                Raises ValueError when there is no current schedule.
+                '''
+                self.require_schedule()
+                if partition_id not in self.originals:
+                    self.report("Partition "+str(partition_id)+" is not scheduled.")
+                    return False
+                state = (self.originals.copy(), [list(partitions) for partitions in self.pcpu_partitions_dict], list(self.pcpu_factors), list(self.pcpu_rests), list(self.schedules))
+                if self.remove_partition(partition_id) and self.add_partition(Partition(wcet, period, partition_id)):
+                    return True
+                (self.originals, self.pcpu_partitions_dict, self.pcpu_factors, self.pcpu_rests, self.schedules) = state
+                return False
+
+    def rebuild(self):
+                '''
+                This function schedules the current partitions (with their original WCETs and periods) from scratch on the same number of CPUs.
+                Returns:
+                        schedules:              type: list; The Schedule of each CPU. None if the partitions are not schedulable, the previous state is kept then.
+                Raises ValueError when there is no current schedule.
+                '''
+                self.require_schedule()
+                return self.generate_schedule(list(self.originals.values()), self.CPU_num)
+
+    def require_schedule(self):
+                '''
+                This function raises a ValueError when no schedule was generated yet, the incremental updates need the allocation state of one.
+                '''
+                if self.schedules is None:
+                    raise ValueError('No current schedule, call generate_schedule or set_partitions first.')
+
+    def write_schedules(self, schedules, time_slice_len=100, xml_file_name='xm_cf.arm.xml', processor_freq=400, output_file_name=None):
+                '''
+                Args:
+                        schedules:              type: list; The Schedule of each CPU.
+                        time_slice_len:         type: int; The length of each time slice, given in milliseconds.
+                        xml_file_name:          type: string; The name of the xml file whose ProcessorTable is replaced. Not read in simplified mode.
+                        processor_freq:         type: int; The frequency of processors, given in MHz.
+                        output_file_name:       type: string; Where the result is written. Defaults to xml_file_name, or RRPOutput.xml in simplified mode.
+                Returns:
+                        returns a boolean value to indicate whether the xml file was written.
+                '''
+                with self.stage('xml_build'):
+                    processors = self.build_processors(schedules, time_slice_len, processor_freq)
+                with self.stage('xml_write'):
+                    return self.write_processors(processors, xml_file_name, output_file_name)
+
+    def build_processors(self, schedules, time_slice_len=100, processor_freq=400):
+                '''
+                This function builds the Processor element of each CPU.
+                '''
+                return [self.processor_node(CPU_counter, schedules[CPU_counter], time_slice_len, processor_freq) for CPU_counter in range(len(schedules))]
+
+    def write_processors(self, processors, xml_file_name, output_file_name):
+                '''
+                This function writes the Processor elements, see write_schedules.
+                Returns:
+                        returns a boolean value to indicate whether the xml file was written.
+                '''
+                if self.simplified:
+                    #create a node to build on with
+                    processor_table = ET.Element('ProcessorTable')
+                    for processor in processors:
+                        processor_table.append(processor)
+                    self.write_xml(processor_table, output_file_name or 'RRPOutput.xml')
+                    return True
+                output_file_name = output_file_name or xml_file_name
+                try:
+                    if os.path.getsize(xml_file_name) > STREAMING_CONFIG_SIZE:
+                        XMConfig.splice_processors(xml_file_name, output_file_name, processors)
+                        return True
+                    config = XMConfig(xml_file_name)
+                except (ET.ParseError, expat.ExpatError, ValueError):
+                    self.report('The given xml file is not properly formatted.', logging.ERROR)
+                    return False
+                #the processors are wiped out first, whatever their namespace
+                config.replace_processors(processors)
+                self.write_xml(config.tree.getroot(), output_file_name)
+                return True
+
+    def write_xml(self, root, output_file_name):
+                '''
+                This function indents the tree in place and serializes it straight into the file, with the same layout as the former
+                minidom pretty-print (3-space indentation, <?xml version="1.0" ?> header) but without building a string and a DOM copy of the document.
+                '''
+                ET.indent(root, space="   ")
+                with open(output_file_name, "w") as f:
+                    f.write('<?xml version="1.0" ?>\n')
+                    ET.ElementTree(root).write(f, encoding='unicode')
+                    f.write('\n')
+
+    def report(self, message, level=logging.INFO):
                 '''
-                Args:
-                        start_time:             type: int; Start time of the sched entry, given in milliseconds.
-                        end_time:               type: int; End time of the sched entry, given in milliseconds.
-                        partition_id:           type: int; The id of the partition in the sched entry.
+                This function emits a status message on the 'RRP' logger, unless level is below the log_level of the instance.
                 '''
-                self.start_time = start_time
-                self.end_time = end_time
-                self.partition_id = partition_id
+                if self.log_enabled(level):
+                    logger.log(level, message)
+
+    def log_enabled(self, level):
+                '''
+                This function tells whether a message of the level would be emitted, so that expensive messages are only built when needed.
+                '''
+                return level >= self.log_level and logger.isEnabledFor(level)
 
+    def stage(self, name):
+                '''
+                This function returns the context manager timing a stage of the instrumentation (see Instrumentation.stage), one doing nothing when the instance is not instrumented.
+                '''
+                if self.stats is None:
+                    return NO_STAGE
+                return self.stats.stage(name)
 
-class RRP:
-    def set_partitions(self, par_list, CPU_num, time_slice_len=100, xml_file_name='xm_cf.arm.xml', processor_freq=400):
+    def add_hook(self, hook):
                 '''
-                Args:
-                        par_list:               type: list; A list of partitions to be scheduled.
-                        CPU_num:                type: int; The number of CPU to be scheduled on.
-                        time_slice_len:         type: int; The length of each time slice, given in milliseconds.
-                        xml_file_name:          type: string; The name of the xml file
-                        processor_freq:         type: int; The frequency of processors, given in MHz.
+                This function registers hook(event, stage, seconds), called when a stage starts and stops, see Instrumentation.
                 Returns:
-                        returns a boolean value to indicate whether the partitions are schedulable or now. True for schedulable, False for non-schedulable.
+                        returns a boolean value to indicate whether the hook was added, False when the instance is not instrumented.
                 '''
-                if CPU_num>1:
-                    #execute mulZ here
-                    print("Executing mulZ.\n")
-                    launch_tables = self.MulZ(par_list, CPU_num)
-                    if launch_tables is None:
-                        return False
-                    CPU_counter = 0
-                    if self.simplified:
-                        #create a node to build on with
-                        processor_table = ET.Element('ProcessorTable')
-                        xml_file_name = 'RRPOutput.xml'
-                    else:
-                        (root, processor_table) = self.parse_xml(xml_file_name)
-                        if root is None or processor_table is None:
-                            return False
-                        #wipe the processors out first
-                        for processor in processor_table.findall('{http://www.xtratum.org/xm-arm-2.x}Processor'):
-                            processor_table.remove(processor)
-                    for lt in launch_tables:
-                            #update the processor information
-                            print("Launch table for CPU "+str(CPU_counter)+" :")
-                            processor_now = ET.SubElement(processor_table, 'Processor')
-                            processor_now.set('id', str(CPU_counter))
-                            processor_now.set('frequency',str(processor_freq)+'Mhz')
-                            self.output_launch_table(processor_now, lt, time_slice_len)
-                            self.print_launch_table(lt)
-                            CPU_counter += 1
-                    if self.simplified:
-                        root = processor_table
-                    xmlstr = minidom.parseString(ET.tostring(root)).toprettyxml(indent="   ")
-                    #tree.write(xml_file_name)
-                    with open(xml_file_name,"w") as f:
-                        f.write(xmlstr)
-                else:
-                    #execute Magic7 here
-                    print("Executing Magic7.\n")
-                    for par in par_list:
-                            self.magic7(par)
-                    launch_table = self.partition_single(par_list)
-                    if launch_table is None:
-                        print("Unschedulable!")
-                        return False
-                    print("Launch table generated is:")
-                    self.print_launch_table(launch_table)
-                    if self.simplified:
-                        processor_table = ET.Element("ProcessorTable")
-                        xml_file_name = 'RRPOutput.xml'
-                    else:
-                        #retrieve the node in the xml file
-                        (root , processor_table) = self.parse_xml(xml_file_name)
-                        if root is None or processor_table is None:
-                            return False 
-                        #wipe the processors out first
-                        for processor in processor_table.findall('{http://www.xtratum.org/xm-arm-2.x}Processor'):
-                            #print(processor.tag)
-                            processor_table.remove(processor)
-                    #write the Processor in 
-                    processor = ET.SubElement(processor_table, 'Processor')
-                    processor.set('frequency',str(processor_freq)+'Mhz')
-                    processor.set('id','0')
-                    self.output_launch_table(processor, launch_table, time_slice_len)
-                    if self.simplified:
-                        root = processor_table
-                    xmlstr = minidom.parseString(ET.tostring(root)).toprettyxml(indent="   ")
-                    with open(xml_file_name, "w") as f:
-                        f.write(xmlstr)
-                    #tree.write(xml_file_name)
+                if self.stats is None:
+                    self.report("Hooks need an instrumented RRP (instrument=True).", logging.WARNING)
+                    return False
+                self.stats.hooks.append(hook)
                 return True
 
     def cal_hyperperiod(self, par_list):
@@ -133,30 +1786,106 @@ class RRP:
     def lcm(self, a, b):
                 '''
                 This function calculates the least common multiple of a and b.
+                Raises ValueError when a or b is not integral, e.g. a period in milliseconds not converted into time slices.
                 '''
-                mul = a*b
-                larger = max(a,b)
-                smaller = min(a,b)
-                while smaller!=0:
-                    t = larger%smaller
-                    larger = smaller
-                    smaller = t
-                mul /= larger
-                return mul
+                (a, b) = (to_fraction(a), to_fraction(b))
+                if a.denominator != 1 or b.denominator != 1:
+                    raise ValueError('The lcm of '+str(a)+' and '+str(b)+' needs integral periods.')
+                return math.lcm(a.numerator, b.numerator)
 
     def check_delta(self, avail_set, standard_p, delta, p):
                 '''
                 This function checks whether right-shifted by delta, standard_p is compatible with avail
                 p is the period of the current partition.
                 '''
+                if self.stats is not None:
+                    self.stats.count('check_delta_calls')
                 for t_now in standard_p:
                     t_del = (t_now + delta)%p
                     if t_del not in avail_set:
                         return False
                 return True
 
+    def avail_mask(self, avail_set, p):
+                '''
+                This function folds the time slices in [0, p) of avail_set into a p-bit mask, bit t is set when time slice t is available.
+                '''
+                mask = 0
+                for t in range(p):
+                    if t in avail_set:
+                        mask |= 1 << t
+                return mask
+
     def find_delta(self, avail_set, p, q, q_left):
                 '''
+                Args:
+                        avail:                  type: set; The set of available time slices.
+                        p:                      type: Integer; The period of the target partition.
+                        q:                      type: Integer; The WCET of the target partition.
+                        q_left:                 type: Integer; The number of time slices per period left after the target partition is placed.
+                Returns:
+                        delta1: The shifted value for the target partition, -1 if no shift is feasible.
+                '''
+                return self.find_delta_mask(self.avail_mask(avail_set, p), p, q, q_left)
+
+    def find_delta_mask(self, avail_mask, p, q, q_left):
+                '''
+                Bitmask version of the delta search. Every shift is tested at once: bit delta of
+                AND(rotate_mask(avail_mask, t) for t in standard_p) is set iff standard_p shifted by delta fits in avail_mask.
+                Args:
+                        avail_mask:             type: int; p-bit mask of the available time slices in one period.
+                        p:                      type: Integer; The period of the target partition.
+                        q:                      type: Integer; The WCET of the target partition.
+                        q_left:                 type: Integer; The number of time slices per period left after the target partition is placed.
+                Returns:
+                        delta1: The smallest feasible shift for the target partition, -1 if none exists. Same result as find_delta_reference.
+                '''
+                if self.stats is not None:
+                    self.stats.count('find_delta_calls')
+                full = (1 << p) - 1
+                (standard_p1, pattern1) = slot_pattern(p, q)
+                standard_p2 = slot_pattern(p, q_left)[0]
+                #with the mask doubled, (doubled >> t) & full is the mask rotated right by t
+                doubled = avail_mask | (avail_mask << p)
+                #candidates for delta1 (delta<p)
+                candidates = full
+                #one check covers every shift of standard_p1
+                if self.stats is not None:
+                    self.stats.count('check_delta_calls')
+                for t in standard_p1:
+                    candidates &= doubled >> t
+                    if not candidates & full:
+                        return -1
+                candidates &= full
+                tried = candidates
+                doubled_pattern = pattern1 | (pattern1 << p)
+                while candidates:
+                    lowest = candidates & -candidates
+                    delta1 = lowest.bit_length() - 1
+                    #check delta2, if any is compatible, then return this delta1
+                    new_avail = avail_mask & ~(doubled_pattern >> (p - delta1))
+                    new_doubled = new_avail | (new_avail << p)
+                    if self.stats is not None:
+                        self.stats.count('check_delta_calls')
+                    candidates2 = full
+                    for t in standard_p2:
+                        candidates2 &= new_doubled >> t
+                        if not candidates2 & full:
+                            break
+                    if candidates2 & full:
+                        if self.stats is not None:
+                            #the candidates up to delta1 were tried
+                            self.stats.count('deltas_tried', bin(tried & ((lowest << 1) - 1)).count('1'))
+                        return delta1
+                    #otherwise, keep checking the next delta1
+                    candidates ^= lowest
+                if self.stats is not None:
+                    self.stats.count('deltas_tried', bin(tried).count('1'))
+                return -1
+
+    def find_delta_reference(self, avail_set, p, q, q_left):
+                '''
+                Pure-Python reference implementation of find_delta, kept to cross-check the bitmask search.
                 Args:
                         avail:                  type: set; The set of available time slices.
                         p:                      type: Integer; The period of the target partition.
@@ -166,11 +1895,11 @@ class RRP:
                 '''
                 standard_p1 = []
                 for k in range(q):
-                    t_now = int(math.floor(k*p/q))%p
+                    t_now = (k*p//q)%p
                     standard_p1.append(t_now)
                 standard_p2 = []
                 for k in range(q_left):
-                    t_now = int(math.floor(k*p/(q_left)))%p
+                    t_now = (k*p//q_left)%p
                     standard_p2.append(t_now)
                 #find potential delta1 first (delta<p)
                 for delta1 in range(p):
@@ -186,55 +1915,345 @@ class RRP:
                         #otherwise, keep checking different delta1
                 return -1
 
-
-
-
     def partition_single(self, partition_list):
                 '''
                 Args:
                         partition_list:         type: list; A list of partitions to be scheduled on this core.
                 Returns:
-                        launch_table            type: list; A list of parition ids that represents the final schedule. If the id is -1, that means the time slice is idle.
+                        launch_table            type: LaunchTable; The final schedule, the pattern of every partition in its period. Indexing it gives the id of the partition in a time slice, -1 when it is idle.
+                                                A FoldedSchedule is returned instead when the folded mode is on.
                 '''
+                if self.folded:
+                    return self.partition_folded(partition_list)
                 #calculate the hyperperiod first and sort the partition_list based on aaf
-                hyperperiod = int(self.cal_hyperperiod(partition_list))
+                hyperperiod = self.cal_hyperperiod(partition_list)
                 partition_list.sort(key=lambda x:x.aaf,reverse=True)
-                #Initialize parameters needed.
-                avail_timeslices = set()
-                for i in range(hyperperiod):
-                    avail_timeslices.add(i)
-                launch_table = [-1 for x in range(hyperperiod)]
+                #Initialize the launch table, which tracks the available time slices as well.
+                launch_table = LaunchTable(hyperperiod)
                 #start allocating time slices
-                i = 0
                 for par in partition_list:
-                    occupied_time_index = set()
                     if par.wcet!=1:
-                        delta1 = self.find_delta(avail_timeslices, par.period, par.wcet, int(len(avail_timeslices)/hyperperiod*par.period) - par.wcet)
+                        with self.stage('find_delta'):
+                            delta1 = self.find_delta_mask(launch_table.period_mask(par.period), par.period, par.wcet, launch_table.free_count()*par.period//hyperperiod - par.wcet)
                         if delta1 == -1:
-                            print("Unschedulable partitions!")
+                            self.report("Unschedulable partitions!")
                             return None 
-                        for l in range(int(hyperperiod/par.period)):
-                            for k in range(par.wcet):
-                                index_now = int(math.floor(k*par.period/par.wcet)+delta1)%par.period + l*par.period
-                                if index_now not in avail_timeslices:
-                                    print("Something wrong with time slice"+str(index_now))
-                                    return None
-                                launch_table[index_now] = par.partition_id
-                                occupied_time_index.add(index_now)
+                        offsets = [(t + delta1)%par.period for t in slot_pattern(par.period, par.wcet)[0]]
                     else:
-                        index = min(avail_timeslices)
-                        if index>= par.period:
-                            print("Unschedulable partitions!")
+                        index = launch_table.first_free
+                        if index == -1 or index>= par.period:
+                            self.report("Unschedulable partitions!")
                             return None 
-                        for l in range(int(hyperperiod/par.period)):
-                            index_now = index + l * par.period
-                            launch_table[index_now] = par.partition_id
-                            occupied_time_index.add(index_now)
+                        offsets = [index]
                     #update the overall information
-                    avail_timeslices = avail_timeslices - occupied_time_index
+                    taken = launch_table.occupy(par.partition_id, par.period, offsets)
+                    if self.stats is not None:
+                        self.stats.count('launch_table_updates')
+                    if taken != -1:
+                        self.report("Something wrong with time slice"+str(taken), logging.WARNING)
+                        return None
                 #return the launch table, which is the schedule
                 return launch_table
 
+    def fold_mask(self, mask, length, period):
+                '''
+                This function folds a length-bit mask of idle time slices onto one period: bit r of the result is set iff r + j*period is idle for every j.
+                period must divide length.
+                '''
+                while length > period:
+                    if (length // period) % 2 == 0:
+                        #halve the mask, which keeps the periods nested
+                        half = length // 2
+                        mask &= mask >> half
+                        mask &= (1 << half) - 1
+                        length = half
+                    else:
+                        folded = (1 << period) - 1
+                        for j in range(0, length, period):
+                            folded &= mask >> j
+                        mask = folded & ((1 << period) - 1)
+                        length = period
+                return mask
+
+    def partition_folded(self, partition_list):
+                '''
+                Folded version of partition_single. Availability is tracked on the residue classes of the periods seen so far
+                (their lcm, which is the largest period for the nested periods produced by magic7/MulZ) instead of on the hyperperiod.
+                Args:
+                        partition_list:         type: list; A list of partitions to be scheduled on this core.
+                Returns:
+                        schedule                type: FoldedSchedule; The per-period pattern of each partition, expanded lazily to the hyperperiod. None if the partitions are not schedulable.
+                '''
+                hyperperiod = self.cal_hyperperiod(partition_list)
+                schedule = FoldedSchedule(hyperperiod)
+                if self.place_folded(partition_list, schedule) is not None:
+                    return None
+                return schedule
+
+    def place_folded(self, partition_list, schedule=None):
+                '''
+                This function places the partitions on their residue classes, see partition_folded.
+                Args:
+                        partition_list:         type: list; A list of partitions to be scheduled on this core. It is sorted based on aaf.
+                        schedule:               type: FoldedSchedule; Receives the pattern of each partition placed. Nothing is recorded when None.
+                Returns:
+                        The partition that could not be placed, None when every partition was placed.
+                '''
+                partition_list.sort(key=lambda x:x.aaf,reverse=True)
+                #free is the bitmap of idle time slices in [0, length)
+                length = 1
+                free = 1
+                for par in partition_list:
+                    period = int(par.period)
+                    new_length = self.lcm(length, period)
+                    free *= ((1 << new_length) - 1) // ((1 << length) - 1)
+                    length = new_length
+                    avail = self.fold_mask(free, length, period)
+                    if par.wcet!=1:
+                        with self.stage('find_delta'):
+                            delta1 = self.find_delta_mask(avail, period, par.wcet, bin(free).count('1')*period//length - par.wcet)
+                        if delta1 == -1:
+                            self.report("Unschedulable partitions!")
+                            return par
+                        offsets = [(t + delta1)%period for t in slot_pattern(period, par.wcet)[0]]
+                    else:
+                        if avail == 0:
+                            self.report("Unschedulable partitions!")
+                            return par
+                        offsets = [(avail & -avail).bit_length() - 1]
+                    pattern = 0
+                    for t in offsets:
+                        pattern |= 1 << t
+                    free &= ~(pattern * (((1 << length) - 1) // ((1 << period) - 1)))
+                    if self.stats is not None:
+                        self.stats.count('launch_table_updates')
+                    if schedule is not None:
+                        schedule.add(par.partition_id, period, offsets)
+                return None
+
+    def allocate_partitions(self, par_list, CPU_num):
+                '''
+                This function approximates copies of the partitions (Magic7 for one CPU, the MulZ_alloc bin packing otherwise) and assigns them to the CPUs.
+                Returns:
+                        A tuple. The first element lists the partitions of each CPU. The second one is the partition that fits on no CPU, None when all fit.
+                '''
+                par_list = [copy.copy(par) for par in par_list]
+                if CPU_num>1:
+                    pcpu_partitions_dict = [[] for i in range(int(CPU_num))]
+                    pcpu_factors = [0 for i in range(int(CPU_num))]
+                    pcpu_rests = [1 for i in range(int(CPU_num))]
+                    par_list.sort(key=lambda x: x.aaf, reverse = True)
+                    (assignment, failed) = self.allocator(pcpu_factors, pcpu_rests).allocate(par_list)
+                    if failed is not None:
+                        return (pcpu_partitions_dict, failed)
+                    for (par, f) in zip(par_list, assignment):
+                        pcpu_partitions_dict[f].append(par)
+                else:
+                    for par in par_list:
+                        self.magic7(par)
+                    pcpu_partitions_dict = [par_list]
+                return (pcpu_partitions_dict, None)
+
+    def check_schedulable(self, par_list, CPU_num):
+                '''
+                This function only decides whether the partitions are schedulable, no launch table is built.
+                The approximate availability factors (Magic7 for one CPU, the MulZ_alloc bin packing otherwise) are checked first:
+                a CPU whose factors add up to more than 1 is unschedulable, and one with at most one partition whose WCET is larger
+                than a time slice is schedulable (the single-slot partitions have nested periods and fill the idle residues).
+                Only the other CPUs fall back to the delta search on their residue classes.
+                Args:
+                        par_list:               type: list; A list of partitions to be scheduled. The partitions passed in are left untouched.
+                        CPU_num:                type: int; The number of CPU to be scheduled on.
+                Returns:
+                        A tuple. The first element is True when the partitions are schedulable. The second one is the id of the partition
+                        that could not be placed, None when schedulable.
+                '''
+                (pcpu_partitions_dict, failed) = self.allocate_partitions(par_list, CPU_num)
+                if failed is not None:
+                    return (False, failed.partition_id)
+                for partitions in pcpu_partitions_dict:
+                    partitions.sort(key=lambda x: x.aaf, reverse = True)
+                    total = 0
+                    for par in partitions:
+                        total += par.aaf
+                        #the factors are exact fractions, a total just above 1 leaves no room for the last partition
+                        if total > 1:
+                            return (False, par.partition_id)
+                    if len([par for par in partitions if par.wcet > 1]) <= 1:
+                        continue
+                    #inconclusive, search the shifts
+                    par = self.place_folded(partitions)
+                    if par is not None:
+                        return (False, par.partition_id)
+                return (True, None)
+
+    def min_cpu(self, par_list):
+                '''
+                This function finds the smallest number of CPUs the partitions can be scheduled on by set_partitions.
+                One CPU is tried with Magic7, then MulZ_alloc packs the partitions once on an open-ended list of pcpus: a pcpu is only
+                added when the partition fits on none of the open ones, which is exactly where MulZ with that many CPUs would fail.
+                The number of pcpus opened is therefore the answer for MulZ, and no packing is redone per CPU count.
+                Strategies whose packing depends on the number of CPUs (open_ended False) try every number of CPUs from 2 up instead.
+                Args:
+                        par_list:               type: list; A list of partitions to be scheduled. The partitions passed in are left untouched.
+                Returns:
+                        The minimum number of CPUs, None if no number of CPUs works (a pcpu packed by MulZ_alloc fails the delta search).
+                '''
+                if self.check_schedulable(par_list, 1)[0]:
+                    return 1
+                if not self.alloc_strategy.open_ended:
+                    #more CPUs than partitions leave some idle
+                    for CPU_num in range(2, max(len(par_list), 2) + 1):
+                        if self.check_schedulable(par_list, CPU_num)[0]:
+                            return CPU_num
+                    return None
+                par_list = [copy.copy(par) for par in par_list]
+                par_list.sort(key=lambda x: x.aaf, reverse = True)
+                pcpu_partitions_dict = []
+                allocator = self.allocator([], [])
+                for par in par_list:
+                    f = allocator.place(par)
+                    if f is None:
+                        #open a new pcpu, the partition goes there since it fits on none of the others
+                        pcpu_partitions_dict.append([])
+                        allocator.add_pcpu()
+                        f = allocator.place(par)
+                    pcpu_partitions_dict[f].append(par)
+                for partitions in pcpu_partitions_dict:
+                    if len([par for par in partitions if par.wcet > 1]) > 1 and self.place_folded(partitions) is not None:
+                        return None
+                #MulZ is only used from 2 CPUs on, the extra CPU stays idle
+                return max(len(pcpu_partitions_dict), 2)
+
+    def partitions_in_slices(self, par_list, time_slice_len):
+                '''
+                This function converts partitions whose WCET and period are given in milliseconds into time slices of time_slice_len.
+                The WCET is rounded up and the period down, so the partition never gets less than it asked for.
+                Returns:
+                        A list of new partitions, None if a period is shorter than a time slice.
+                '''
+                result = []
+                for par in par_list:
+                    period = math.floor(to_fraction(par.period)/time_slice_len)
+                    if period == 0:
+                        return None
+                    wcet = min(math.ceil(to_fraction(par.wcet)/time_slice_len), period)
+                    result.append(Partition(wcet, period, par.partition_id))
+                return result
+
+    def sweep(self, par_list, time_slice_lens=None, csv_file_name=None):
+                '''
+                This function finds the minimum number of CPUs for the partitions and describes the resulting schedule.
+                Args:
+                        par_list:               type: list; A list of partitions. Their WCET and period are in time slices, or in milliseconds when time_slice_lens is given.
+                        time_slice_lens:        type: list; Candidate lengths of a time slice in milliseconds, one row is produced for each.
+                        csv_file_name:          type: string; When given, the rows are written there as CSV as well.
+                Returns:
+                        A list of dicts with the keys time_slice_len, min_cpu, total_aaf, hyperperiod, major_frame and slots (major_frame in ms when time_slice_lens is given).
+                        min_cpu and the following columns are empty when no CPU count works.
+                '''
+                fields = ['time_slice_len', 'min_cpu', 'total_aaf', 'hyperperiod', 'major_frame', 'slots']
+                rows = []
+                for time_slice_len in (time_slice_lens or [None]):
+                    row = dict((field, '') for field in fields)
+                    row['time_slice_len'] = '' if time_slice_len is None else time_slice_len
+                    partitions = par_list if time_slice_len is None else self.partitions_in_slices(par_list, time_slice_len)
+                    if partitions is not None:
+                        CPU_num = self.min_cpu(partitions)
+                        schedules = None if CPU_num is None else self.generate_schedule(partitions, CPU_num)
+                        if schedules is not None:
+                            hyperperiod = max(schedule.hyperperiod for schedule in schedules)
+                            row['min_cpu'] = CPU_num
+                            row['total_aaf'] = float(sum(Fraction(par.wcet, par.period) for par in self.approximated(partitions, CPU_num)))
+                            row['hyperperiod'] = hyperperiod
+                            row['major_frame'] = hyperperiod*(time_slice_len or 1)
+                            row['slots'] = sum(schedule.slot_count() for schedule in schedules)
+                    rows.append(row)
+                if csv_file_name is not None:
+                    with open(csv_file_name, 'w', newline='') as f:
+                        writer = csv.DictWriter(f, fieldnames=fields)
+                        writer.writeheader()
+                        writer.writerows(rows)
+                return rows
+
+    def tune_time_slice(self, par_list, CPU_num=1, time_slice_lens=None, max_slots=None, csv_file_name=None):
+                '''
+                This function chooses the length of a time slice for partitions given in milliseconds. Each candidate is described with the
+                analytical model, no launch table is built: the partitions are converted (see partitions_in_slices) and approximated like
+                check_schedulable does, the hyperperiod of a CPU is the lcm of its periods, and a partition of WCET q and period p spreads
+                its q time slices evenly, which makes min(q, p - q) slots per period (one slot in all when q == p).
+                A plan may have one slot more per partition whose slots wrap around the end of the hyperperiod.
+                The best candidate wastes the least CPU to the approximation (overhead) among those whose largest plan has at most max_slots
+                slots, fewer slots then a longer time slice break ties. The candidates are checked with check_schedulable in that order until one passes.
+                Args:
+                        par_list:               type: list; A list of partitions, WCET and period in milliseconds.
+                        CPU_num:                type: int; The number of CPU to be scheduled on.
+                        time_slice_lens:        type: list; Candidate lengths of a time slice in milliseconds. Every whole number of milliseconds up to the shortest period by default.
+                        max_slots:              type: int; The most slots the plan of a CPU may have, no limit when None.
+                        csv_file_name:          type: string; When given, the rows are written there as CSV as well.
+                Returns:
+                        A tuple. The first element is the best length of a time slice, None when no candidate fits. The second one is a list of dicts,
+                        one per candidate in order, with the keys time_slice_len, hyperperiod and slots (of the largest plan), major_frame (in ms),
+                        total_aaf, overhead (total_aaf minus the availability factors asked for, in CPUs) and schedulable (empty when not checked).
+                        The columns between time_slice_len and schedulable are empty for a candidate longer than a period or whose approximated partitions do not fit.
+                '''
+                fields = ['time_slice_len', 'hyperperiod', 'major_frame', 'slots', 'total_aaf', 'overhead', 'schedulable']
+                availability = sum(to_fraction(par.wcet)/to_fraction(par.period) for par in par_list)
+                if time_slice_lens is None:
+                    time_slice_lens = range(1, math.floor(min(to_fraction(par.period) for par in par_list)) + 1)
+                rows = []
+                candidates = []
+                for time_slice_len in time_slice_lens:
+                    row = dict((field, '') for field in fields)
+                    row['time_slice_len'] = time_slice_len
+                    rows.append(row)
+                    partitions = self.partitions_in_slices(par_list, time_slice_len)
+                    if partitions is None:
+                        continue
+                    (pcpu_partitions_dict, failed) = self.allocate_partitions(partitions, CPU_num)
+                    if failed is not None or any(sum(par.aaf for par in partitions_now) > 1 for partitions_now in pcpu_partitions_dict):
+                        row['schedulable'] = False
+                        continue
+                    hyperperiods = [self.cal_hyperperiod(partitions_now) for partitions_now in pcpu_partitions_dict]
+                    slots = []
+                    for (hyperperiod, partitions_now) in zip(hyperperiods, pcpu_partitions_dict):
+                        slots.append(sum(1 if par.wcet == par.period else hyperperiod//par.period*min(par.wcet, par.period - par.wcet) for par in partitions_now))
+                    row['hyperperiod'] = max(hyperperiods)
+                    row['major_frame'] = row['hyperperiod']*time_slice_len
+                    row['slots'] = max(slots)
+                    total_aaf = sum(par.aaf for partitions_now in pcpu_partitions_dict for par in partitions_now)
+                    row['total_aaf'] = float(total_aaf)
+                    row['overhead'] = float(total_aaf - availability)
+                    if max_slots is None or row['slots'] <= max_slots:
+                        candidates.append((total_aaf, row['slots'], -time_slice_len, len(rows) - 1, partitions))
+                best = None
+                for (total_aaf, slots, time_slice_len, i, partitions) in sorted(candidates, key=lambda candidate: candidate[:4]):
+                    rows[i]['schedulable'] = self.check_schedulable(partitions, CPU_num)[0]
+                    if rows[i]['schedulable']:
+                        best = rows[i]['time_slice_len']
+                        break
+                if csv_file_name is not None:
+                    with open(csv_file_name, 'w', newline='') as f:
+                        writer = csv.DictWriter(f, fieldnames=fields)
+                        writer.writeheader()
+                        writer.writerows(rows)
+                return (best, rows)
+
+    def approximated(self, par_list, CPU_num):
+                '''
+                This function returns copies of the partitions with the WCET and period that Magic7 (one CPU) or MulZ_alloc assign them.
+                '''
+                par_list = [copy.copy(par) for par in par_list]
+                if CPU_num>1:
+                    pcpu_factors = [0 for i in range(int(CPU_num))]
+                    pcpu_rests = [1 for i in range(int(CPU_num))]
+                    par_list.sort(key=lambda x: x.aaf, reverse = True)
+                    self.allocator(pcpu_factors, pcpu_rests).allocate(par_list)
+                else:
+                    for par in par_list:
+                        self.magic7(par)
+                return par_list
+
     def approximate_value(self, value):
                 '''
                 This function approximates the value given to the multiple of 0.5 when they are closed enough.
@@ -255,41 +2274,22 @@ class RRP:
                 The initial availability_factor should not be larger than 1. If it is larger than 1, the return value will be 1 as well.
                 '''
                 #initiate availability_factor with is wcet/period.
-                availability_factor = float(par.wcet)/par.period
+                availability_factor = self.as_fraction(par.wcet)/self.as_fraction(par.period)
                 if availability_factor == 0:
                         par.aaf = 0
                         par.wcet = 0
                         par.period = 1
                         return
-                elif availability_factor > 0 and availability_factor < 1.0/7:
-                        n = math.floor(self.approximate_value(math.log(7*availability_factor)/math.log(0.5)))
-                        par.aaf = 1/(7*(2**n))
-                        par.wcet = 1
-                        par.period = (7*(2**n))
-                        return
-                elif availability_factor >= 1.0/7 and availability_factor <= 6.0/7:
-                        par.aaf = (math.ceil(self.approximate_value(7*availability_factor)))/7.0
-                        par.wcet = math.ceil(self.approximate_value(7*availability_factor))
-                        par.period = 7
-                        return
-                elif availability_factor > 6.0/7 and availability_factor < 1:
-                        n = math.ceil(self.approximate_value(math.log(7*(1-availability_factor))/math.log(0.5)))
-                        par.aaf = 1-(1/(7*(2**n)))
-                        par.period = 7*(2**n)
-                        par.wcet = 7*(2**n) - 1
-                        return
-                else:
-                        par.aaf = 1
-                        par.period = 1
-                        par.wcet = 1
-                        return
+                (par.aaf, par.wcet, par.period) = approx_factor(availability_factor, 7)
+
     def MulZ(self, partition_list, CPU_num):
                 '''
                 Args:
                         partition_list:                     type: list. A list of partitions to be scheduled.
                         CPU_num:                    type: int. The number of CPUs available to schedule on.
                 Returns:
-                        launch_tables:              type: A 2D array, each array is the launch table of the corresponding CPU. Inside the launch table, each element is the partition id for the time slice. Returns None when the partitions are not schedulable.
+                        A tuple, None when the partitions are not schedulable. The first element is a list with the Schedule of each CPU. The second one is the
+                        allocation state (pcpu_partitions_dict, pcpu_factors, pcpu_rests), see add_partition. The instance is left untouched, generate_schedule keeps them.
                 '''
                 #initialize the dict to store partitions allocated to each pcpu
                 pcpu_partitions_dict = []
@@ -299,54 +2299,91 @@ class RRP:
                         pcpu_partitions_dict.append([])
                         pcpu_factors.append(0)
                         pcpu_rests.append(1)
-                #sort partition list based on aaf in reversed way
-                partition_list.sort(key=lambda x: x.aaf, reverse = True)
-                for par in partition_list:
-                        f = self.MulZ_alloc(par, pcpu_factors, pcpu_rests)
-                        if f is None:
-                                #if the partition is not schedulable, return None
-                                return None
+                with self.stage('approximation'):
+                    #sort partition list based on aaf in reversed way
+                    partition_list.sort(key=lambda x: x.aaf, reverse = True)
+                    (assignment, failed) = self.allocator(pcpu_factors, pcpu_rests).allocate(partition_list)
+                if failed is not None:
+                        #if the partition is not schedulable, return None
+                        return None
+                for (par, f) in zip(partition_list, assignment):
                         pcpu_partitions_dict[f].append(par)
+                #the allocation state returned for the incremental updates
+                allocation = (pcpu_partitions_dict, pcpu_factors, pcpu_rests)
                 #aaf of each partition is already set during mulZ_FFD_Alloc so simply do partition_single for each pcpu.
-                launch_tables = []
+                #the pcpus are independent now, so they can be scheduled on a process pool when they are large enough to pay for it.
+                if self.use_pool(pcpu_partitions_dict):
+                    with self.stage('partition_single'):
+                        results = self.map_parallel(schedule_worker, [(pcpu_partitions_dict[i], self.worker_settings()) for i in range(int(CPU_num))])
+                    if results is not None:
+                        schedules = []
+                        for (schedule, stats) in results:
+                            if stats is not None:
+                                #the counters and find_delta timings of the worker
+                                self.stats.merge(stats)
+                            schedules.append(schedule)
+                        if None in schedules:
+                            self.report("Something wrong with MulZ!", logging.WARNING)
+                            return None
+                        return (schedules, allocation)
+                schedules = []
                 for i in range(int(CPU_num)):
-                        temp = self.partition_single(pcpu_partitions_dict[i])
+                        with self.stage('partition_single'):
+                            temp = self.partition_single(pcpu_partitions_dict[i])
                         if temp is None:
-                            print("Something wrong with MulZ!")
+                            self.report("Something wrong with MulZ!", logging.WARNING)
                             return None
-                        launch_tables.append(temp)
-                return launch_tables
+                        schedules.append(self.to_schedule(temp))
+                return (schedules, allocation)
+
+    def use_pool(self, pcpu_partitions_dict):
+                '''
+                This function decides whether MulZ schedules the pcpus on the process pool: the instance must have workers, more than one CPU
+                must be available, and the pcpus must have PARALLEL_MIN_SLICES time slices in all, below which the pool costs more than it saves.
+                '''
+                if self.workers <= 1 or min(self.workers, os.cpu_count() or 1) <= 1 or len([partitions for partitions in pcpu_partitions_dict if partitions]) <= 1:
+                    return False
+                return sum(self.cal_hyperperiod(partitions) for partitions in pcpu_partitions_dict) >= PARALLEL_MIN_SLICES
+
+    def worker_settings(self):
+                '''
+                This function returns the keyword arguments of the RRP created by a process pool worker, so that it schedules and logs like this instance.
+                '''
+                return {'folded': self.folded, 'log_level': self.log_level, 'instrument': self.stats is not None, 'alloc_strategy': self.alloc_strategy, 'alloc_budget': self.alloc_budget}
+
+    def map_parallel(self, function, args_list):
+                '''
+                This function runs function(*args) for every args in args_list on a process pool of self.workers processes.
+                Returns:
+                        The results in the order of args_list, or None when the pool cannot be used, in which case the caller falls back to the serial path.
+                '''
+                try:
+                    with concurrent.futures.ProcessPoolExecutor(max_workers=min(self.workers, len(args_list), os.cpu_count() or 1)) as pool:
+                        return list(pool.map(function, *zip(*args_list)))
+                except (OSError, RuntimeError, pickle.PicklingError) as e:
+                    self.report("Process pool unavailable, running serially: "+str(e), logging.WARNING)
+                    return None
 
     def z_approx(self, availability_factor, factor):
-                aaf = 1
-                w = 1
-                p = 1
-                if availability_factor == 0:
-                        return (aaf, w, p)
-                elif availability_factor > 0 and availability_factor < 1.0/factor:
-                        n = math.floor(self.approximate_value(math.log(factor*availability_factor)/math.log(0.5)))
-                        aaf = 1/(factor*(2**n))
-                        w   = 1
-                        p   = (factor*(2**n))
-                        return (aaf, w, p)
-                elif availability_factor >= 1.0/factor and availability_factor <= (factor - 1)/ factor:
-                        aaf = (math.ceil(self.approximate_value(factor*availability_factor)))/factor
-                        w   = math.ceil(self.approximate_value(factor*availability_factor))
-                        p   = factor
-                        return (aaf, w, p)
-                elif availability_factor > (factor - 1)/factor and availability_factor < 1:
-                        n = math.ceil(self.approximate_value(math.log(factor*(1-availability_factor))/math.log(0.5)))
-                        aaf = 1-(1/(factor*(2**n)))
-                        p   = factor*(2**n)
-                        w   = factor*(2**n) - 1
-                        return (aaf, w, p)
-                else:
-                        aaf = 1
-                        p   = 1
-                        w   = 1
-                        return (aaf, w, p)eturn result
-                return -1
-                
+                '''
+                This function approximates availability_factor with the regular partitions of base factor, see approx_factor.
+                Returns:
+                        A tuple (aaf, w, p), aaf being a Fraction.
+                '''
+                return approx_factor(self.as_fraction(availability_factor), factor)
+
+    def as_fraction(self, value):
+                '''
+                This function turns an availability factor, WCET or period into a Fraction, see to_fraction.
+                '''
+                return to_fraction(value)
+
+    def approx_cache_info(self):
+                '''
+                This function returns the hits, misses, maxsize and currsize of the approximation cache shared by z_approx and magic7.
+                '''
+                return approx_factor.cache_info()
+
     def MulZ_alloc(self, par, pcpu_factors, pcpu_rests):
                 '''
                 Args:
@@ -355,90 +2392,115 @@ class RRP:
                         pcpu_rests:             type: list. A list of decimals indicating the space left on each pcpu, updated by MulZ_alloc.
                 Returns:
                         pcpu_id: int. Returns the pcpu_id of the cpu partition par is assigned to. Note that the aaf of partition par will be modified accordingly in this function as well. 
+                        The pcpu is chosen by the allocation strategy of the instance, first-fit by default.
+                The strategy (and its index) is reused by the following calls on the same two lists, which must only be updated by MulZ_alloc in between.
                 '''
-                fixed_list = [3,4,5,7]
-                smallest = 2 #smallest records the final aaf, which should be no larger than 1. 
-                smallest_up = 1
-                smallest_down = 1
-                f = -1 #f is used to record the base chosen, candidates are [3,4,5,7]
-                for x in range(4):
-                        num = self.z_approx(par.aaf, fixed_list[x])
-                        if num[0] < smallest:
-                                f = fixed_list[x]
-                                smallest = num[0]
-                                smallest_up = num[1]
-                                smallest_down = num[2]
-                r = smallest
-                for i in range(len(pcpu_factors)):
-                        #if a cpu is empty, put the partition there
-                        if pcpu_factors[i] == 0:
-                                pcpu_factors[i] = f
-                                pcpu_rests[i] = 1 - r
-                                par.aaf = r
-                                par.wcet = smallest_up
-                                par.period = smallest_down
-                                return i
-                        #if a non-empty pcpu can fit it under its factor, put it in.
-                        else:
-                                temp = self.z_approx(par.aaf, pcpu_factors[i])
-                                if pcpu_rests[i] >= temp[0]:
-                                    r = temp[0]
-                                    pcpu_rests[i] -= r
-                                    par.aaf = r
-                                    par.wcet = temp[1]
-                                    par.period = temp[2]
-                                    return i
-                return None
+                if self.placement is None or self.placement.factors is not pcpu_factors or self.placement.rests is not pcpu_rests:
+                    self.placement = self.allocator(pcpu_factors, pcpu_rests)
+                return self.placement.place(par)
+
+    def allocator(self, pcpu_factors, pcpu_rests):
+                '''
+                This function creates the allocation strategy of the instance over the pcpus given, see AllocationStrategy.
+                '''
+                return self.alloc_strategy(self, pcpu_factors, pcpu_rests)
+
+    def to_schedule(self, launch_table):
+                '''
+                This function converts a launch table (Schedule, LaunchTable, FoldedSchedule or list of partition ids) into a Schedule.
+                '''
+                if isinstance(launch_table, Schedule):
+                    return launch_table
+                if hasattr(launch_table, 'to_schedule'):
+                    return launch_table.to_schedule()
+                return Schedule.from_slices(launch_table)
+
+    def launch_table_text(self, launch_table, compact=True):
+                '''
+                This function renders a launch table as text.
+                Args:
+                        launch_table:           type: Schedule, LaunchTable, FoldedSchedule or list; The launch table.
+                        compact:                type: bool; One line per run (with a summary line) when True, one line per time slice otherwise.
+                '''
+                if compact:
+                    schedule = self.to_schedule(launch_table)
+                    busy = sum(entry.end_time - entry.start_time for entry in schedule)
+                    lines = ["Hyperperiod "+str(schedule.hyperperiod)+", "+str(schedule.slot_count())+" slots, "+str(schedule.hyperperiod - busy)+" idle time slices"]
+                    for entry in schedule:
+                        lines.append("Time slices "+str(entry.start_time)+"-"+str(entry.end_time-1)+" : "+str(entry.partition_id))
+                else:
+                    if isinstance(launch_table, Schedule):
+                        launch_table = launch_table.slices()
+                    lines = ["Time slice "+str(counter)+" : "+str(entry) for (counter, entry) in enumerate(launch_table)]
+                return "\n".join(lines)
 
-    def print_launch_table(self, launch_table):
+    def print_launch_table(self, launch_table, compact=None):
                 '''
-                This function prints the launch table out.
-                '''                       
-                counter = 0         
-                for entry in launch_table:
-                        print("Time slice "+str(counter)+" : "+str(entry))
-                        counter += 1
-    
+                This function prints the launch table out in one write. A Schedule is printed one run per line by default, other launch tables one time slice per line.
+                '''
+                if compact is None:
+                    compact = isinstance(launch_table, Schedule)
+                sys.stdout.write(self.launch_table_text(launch_table, compact)+"\n")
+
+    def log_launch_tables(self, launch_tables):
+                '''
+                This function logs the launch table of every CPU, one time slice per line at DEBUG and one run per line at INFO.
+                '''
+                for CPU_counter in range(len(launch_tables)):
+                    if self.log_enabled(logging.DEBUG):
+                        self.report("Launch table for CPU "+str(CPU_counter)+" :\n"+self.launch_table_text(launch_tables[CPU_counter], compact=False), logging.DEBUG)
+                    elif self.log_enabled(logging.INFO):
+                        self.report("Launch table for CPU "+str(CPU_counter)+" :\n"+self.launch_table_text(launch_tables[CPU_counter]))
+
+    def dump_launch_tables(self, launch_tables, file_name, compact=True, title=None, append=False):
+                '''
+                This function writes the launch table of every CPU into file_name in one buffered write.
+                Args:
+                        title:                      type: string; When given, the tables are written under a "== title ==" header line.
+                        append:                     type: bool; Add the tables at the end of file_name instead of replacing it, so a batch keeps every set.
+                '''
+                text = []
+                if title is not None:
+                    text.append("== "+title+" ==")
+                for CPU_counter in range(len(launch_tables)):
+                    text.append("Launch table for CPU "+str(CPU_counter)+" :")
+                    text.append(self.launch_table_text(launch_tables[CPU_counter], compact))
+                with open(file_name, "a" if append else "w") as f:
+                    f.write("\n".join(text)+"\n")
+
+    def processor_node(self, CPU_id, launch_table, time_slice_len, processor_freq):
+                '''
+                This function builds the Processor element of a CPU with its launch table inserted.
+                '''
+                processor_now = ET.Element('Processor')
+                processor_now.set('id', str(CPU_id))
+                processor_now.set('frequency',str(processor_freq)+'Mhz')
+                self.output_launch_table(processor_now, launch_table, time_slice_len)
+                return processor_now
+
     def output_launch_table(self, processor_node, launch_table, time_slice_len):
                 '''
                 Args:
                         processor_node:            type: Element in xml.etree.ElementTree; This is the node where the launch table should be inserted.
-                        launch_table:               type: List; Stores the id of the partition in the corresponding time slice.
+                        launch_table:               type: Schedule, LaunchTable, FoldedSchedule or list; Stores the id of the partition in the corresponding time slice.
                         time_slice_len:             type: int; Indicates the length of each time slice
                 Returns:
                         This function does not return anything. All modifications are done in the processor_node.
                         It is assumed that launch_table is not empty.
                 '''
+                schedule = self.to_schedule(launch_table)
                 plan_table_node = ET.SubElement(processor_node, 'CyclicPlanTable')
                 plan_node = ET.SubElement(plan_table_node, 'Plan')
                 plan_node.set('id', '0')
-                plan_node.set('majorFrame', str(len(launch_table)*time_slice_len)+'ms')
-                last_id = launch_table[0]
-                time_now = 0
+                plan_node.set('majorFrame', str(schedule.hyperperiod*time_slice_len)+'ms')
                 counter = 0
-                duration = 0
-                for entry in launch_table:
-                    if entry == last_id:
-                        duration += time_slice_len
-                        continue
-                    if last_id!=-1:
-                        slot = ET.SubElement(plan_node, 'Slot')
-                        slot.set('id', str(counter))
-                        slot.set('start', str(time_now)+'ms')
-                        slot.set('duration', str(duration)+'ms')
-                        slot.set('partitionId',str(last_id))
-                        counter += 1
-                    #reset after setting one entry
-                    time_now += duration
-                    duration = time_slice_len
-                    last_id = entry
-                #write the last entry in
-                if last_id!=-1:
+                for entry in schedule:
                     slot = ET.SubElement(plan_node, 'Slot')
                     slot.set('id', str(counter))
-                    slot.set('start', str(time_now)+'ms')
-                    slot.set('duration', str(duration)+'ms')
-                    slot.set('partitionId',str(last_id))
+                    slot.set('start', str(entry.start_time*time_slice_len)+'ms')
+                    slot.set('duration', str((entry.end_time-entry.start_time)*time_slice_len)+'ms')
+                    slot.set('partitionId',str(entry.partition_id))
+                    counter += 1
 
     def parse_xml(self, xml_file_name):
                 '''
@@ -449,24 +2511,303 @@ class RRP:
                         If the file passed in does not fit the format, a None will be returned.
                 '''
                 try:
-                    ET.register_namespace('', 'http://www.xtratum.org/xm-arm-2.x')
-                    tree = ET.ElementTree()
-                    tree.parse(xml_file_name)
-                    root = tree.getroot()
-                    hw_description= root[0]
-                    processor_table = None
-                    for node in hw_description:
-                        #print(node.tag)
-                        if node.tag.find('ProcessorTable')!=-1:
-                            processor_table = node
-                            break
-                    if processor_table is None:
-                        processor_table = ET.SubElement(hw_description, 'ProcessorTable')
-                    return (root, processor_table)
-                except (ET.ParseError, IndexError):
-                    print('The given xml file is not properly formatted.')
+                    config = XMConfig(xml_file_name)
+                    return (config.tree.getroot(), config.processor_table)
+                except (ET.ParseError, ValueError):
+                    self.report('The given xml file is not properly formatted.', logging.ERROR)
                     return (None,None)
 
+    def load_partition_sets(self, file_name, file_format=None):
+                '''
+                Args:
+                        file_name:              type: string; A JSON, JSON Lines, CSV or YAML file describing one or more partition sets. '-' reads JSON Lines from the standard input.
+                        file_format:            type: string; One of 'json', 'jsonl', 'csv' and 'yaml'. Guessed from the extension when None.
+                Returns:
+                        A generator of dicts with the keys 'name' and 'partitions' (a list of Partition), plus 'cpu_num' and 'time_slice_len' when the set gives them.
+                        JSON Lines and CSV files are streamed, one set is read at a time.
+                Formats:
+                        json/yaml:              A set is {"name": ..., "cpu_num": ..., "time_slice_len": ..., "partitions": [{"id": 1, "wcet": 3, "period": 7}, ...]}, only "partitions" is required.
+                                                The document is a set, a list of sets, {"sets": [...]} or a bare list of partitions. YAML files may hold several documents.
+                        jsonl:                  One set per line.
+                        csv:                    A header with the columns id, wcet and period, plus optionally set, cpu_num and time_slice_len. Consecutive rows with the same set form a set.
+                '''
+                if file_format is None:
+                    extension = os.path.splitext(file_name)[1].lower()
+                    file_format = {'.json': 'json', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.csv': 'csv', '.yaml': 'yaml', '.yml': 'yaml'}.get(extension, 'jsonl' if file_name == '-' else 'json')
+                base_name = 'stdin' if file_name == '-' else os.path.splitext(os.path.basename(file_name))[0]
+                f = sys.stdin if file_name == '-' else open(file_name, newline='' if file_format == 'csv' else None)
+                try:
+                    if file_format == 'csv':
+                        documents = self.csv_partition_sets(f)
+                    elif file_format == 'jsonl':
+                        documents = (json.loads(line) for line in f if line.strip())
+                    elif file_format == 'json':
+                        documents = [json.load(f)]
+                    elif file_format == 'yaml':
+                        try:
+                            import yaml
+                        except ImportError:
+                            raise ImportError('PyYAML is required to read YAML partition sets.')
+                        documents = yaml.safe_load_all(f)
+                    else:
+                        raise ValueError('Unknown partition set format: '+str(file_format))
+                    counter = 0
+                    for document in documents:
+                        if isinstance(document, dict) and 'sets' in document:
+                            document = document['sets']
+                        if isinstance(document, list) and document and isinstance(document[0], dict) and 'partitions' in document[0]:
+                            set_list = document
+                        else:
+                            set_list = [document]
+                        for partition_set in set_list:
+                            if isinstance(partition_set, list):
+                                partition_set = {'partitions': partition_set}
+                            yield self.make_partition_set(partition_set, base_name+'-'+str(counter), counter)
+                            counter += 1
+                finally:
+                    if f is not sys.stdin:
+                        f.close()
+
+    def csv_partition_sets(self, f):
+                '''
+                This function groups the rows of a CSV file into partition set dicts, see load_partition_sets.
+                '''
+                partition_set = None
+                for row in csv.DictReader(f):
+                    row = dict((key.strip(), value.strip()) for (key, value) in row.items() if key is not None and value is not None)
+                    set_name = row.get('set')
+                    if partition_set is None or set_name != partition_set.get('name'):
+                        if partition_set is not None:
+                            yield partition_set
+                        partition_set = {'partitions': []}
+                        for key in ('cpu_num', 'time_slice_len'):
+                            if row.get(key):
+                                partition_set[key] = row[key]
+                        if set_name is not None:
+                            partition_set['name'] = set_name
+                    partition_set['partitions'].append(row)
+                if partition_set is not None:
+                    yield partition_set
+
+    def make_partition_set(self, partition_set, default_name, index=0):
+                '''
+                This function turns a partition set read by load_partition_sets into Partition objects.
+                Args:
+                        partition_set:          type: dict or list; The set as read from the file.
+                        default_name:           type: string; The name of the set when it has none.
+                        index:                  type: int; The position of the set in the file, given in the error messages.
+                Returns:
+                        A dict with the keys 'name' and 'partitions', plus 'cpu_num' and 'time_slice_len' when the set gives them.
+                        Raises ValueError naming the set when a field is missing or invalid: the periods must be positive,
+                        the WCETs between 0 and the period, cpu_num and time_slice_len positive integers.
+                '''
+                if not isinstance(partition_set, dict):
+                    raise ValueError('Partition set '+str(index)+' is not an object.')
+                result = {'name': str(partition_set.get('name', default_name)), 'partitions': []}
+                where = 'Partition set '+str(index)+' ('+result['name']+')'
+                for key in ('cpu_num', 'time_slice_len'):
+                    if partition_set.get(key) not in (None, ''):
+                        try:
+                            result[key] = int(partition_set[key])
+                        except (TypeError, ValueError):
+                            raise ValueError(where+': '+key+' is not an integer.')
+                        if result[key] < 1:
+                            raise ValueError(where+': '+key+' must be positive.')
+                if not isinstance(partition_set.get('partitions'), list):
+                    raise ValueError(where+' misses the list "partitions".')
+                for (counter, par) in enumerate(partition_set['partitions']):
+                    if not isinstance(par, dict):
+                        raise ValueError(where+': partition '+str(counter)+' is not an object.')
+                    try:
+                        (wcet, period, partition_id) = (self.parse_number(par['wcet']), self.parse_number(par['period']), int(par['id']))
+                    except KeyError as e:
+                        raise ValueError(where+': partition '+str(counter)+' misses the field '+str(e)+'.')
+                    except (TypeError, ValueError, ZeroDivisionError):
+                        raise ValueError(where+': partition '+str(counter)+' has an invalid id, wcet or period.')
+                    if period <= 0:
+                        raise ValueError(where+': partition '+str(partition_id)+' has a period of '+str(period)+', it must be positive.')
+                    if wcet < 0 or wcet > period:
+                        raise ValueError(where+': partition '+str(partition_id)+' has a wcet of '+str(wcet)+', it must be between 0 and the period.')
+                    result['partitions'].append(Partition(wcet, period, partition_id))
+                return result
+
+    def parse_number(self, value):
+                '''
+                This function parses a WCET or a period into an int, or a Fraction when it is not integral ('12.5' or '25/2').
+                Raises ValueError when it is not a number.
+                '''
+                if isinstance(value, str):
+                    value = Fraction(value.strip())
+                else:
+                    value = to_fraction(value)
+                if value.denominator == 1:
+                    return value.numerator
+                return value
+
+    def generate_batch(self, partition_sets, CPU_num=1, time_slice_len=100, processor_freq=None):
+                '''
+                Args:
+                        partition_sets:         type: iterable; Partition set dicts as produced by load_partition_sets.
+                        CPU_num:                type: int; The number of CPU used when a set does not give its own.
+                        time_slice_len:         type: int; The length of each time slice used when a set does not give its own.
+                        processor_freq:         type: int; The frequency of processors in MHz the xml files will be written with, None when none is written.
+                                                With a schedule cache, the Processor elements are cached for it and put into the set as processor_nodes.
+                Returns:
+                        A generator of (partition_set, schedules) tuples, one per set in order. schedules is None for a set that is not schedulable,
+                        or whose time_slice_len is None (see with_tuned_time_slice).
+                '''
+                for partition_set in partition_sets:
+                    partition_set.setdefault('cpu_num', CPU_num)
+                    partition_set.setdefault('time_slice_len', time_slice_len)
+                    if partition_set['time_slice_len'] is None:
+                        yield (partition_set, None)
+                        continue
+                    if self.schedule_cache is None:
+                        yield (partition_set, self.generate_schedule(partition_set['partitions'], partition_set['cpu_num']))
+                        continue
+                    (schedules, processors) = self.cached_schedule(partition_set['partitions'], partition_set['cpu_num'], partition_set['time_slice_len'], processor_freq)
+                    if processors is not None:
+                        partition_set['processor_nodes'] = processors
+                    yield (partition_set, schedules)
+
+    def with_min_cpu(self, partition_sets):
+                '''
+                This function sets the cpu_num of each partition set dict to the minimum number of CPUs it fits on (left at 1 when none works).
+                '''
+                for partition_set in partition_sets:
+                    partition_set['cpu_num'] = self.min_cpu(partition_set['partitions']) or 1
+                    yield partition_set
+
+    def with_tuned_time_slice(self, partition_sets, CPU_num=1, time_slice_lens=None, max_slots=None, min_cpus=False):
+                '''
+                This function sets the time_slice_len of each partition set dict, whose WCETs and periods are in milliseconds, to the one
+                chosen by tune_time_slice on its cpu_num (CPU_num when it has none), and converts its partitions into time slices.
+                time_slice_len is None when no candidate fits, the partitions are left in milliseconds then.
+                With min_cpus, cpu_num is first set to min_cpu of the partitions in milliseconds (the approximated factors do not depend on the unit)
+                and raised one CPU at a time while no candidate fits, up to one CPU per partition, so the time slice is tuned on the final count.
+                '''
+                for partition_set in partition_sets:
+                    if min_cpus:
+                        partition_set['cpu_num'] = self.min_cpu(partition_set['partitions']) or 1
+                    while True:
+                        (time_slice_len, rows) = self.tune_time_slice(partition_set['partitions'], partition_set.get('cpu_num', CPU_num), time_slice_lens, max_slots)
+                        if time_slice_len is not None or not min_cpus or partition_set['cpu_num'] >= max(len(partition_set['partitions']), 2):
+                            break
+                        partition_set['cpu_num'] += 1
+                    partition_set['time_slice_len'] = time_slice_len
+                    if time_slice_len is not None:
+                        partition_set['partitions'] = self.partitions_in_slices(partition_set['partitions'], time_slice_len)
+                    yield partition_set
+
+    def schedule_summary(self, schedules, time_slice_len):
+                '''
+                This function describes the schedules as a list of dicts, one per CPU, with the slots given in milliseconds like in the xml file.
+                '''
+                processors = []
+                for CPU_counter in range(len(schedules)):
+                    slots = []
+                    for entry in schedules[CPU_counter]:
+                        slots.append({'start': entry.start_time*time_slice_len, 'duration': (entry.end_time-entry.start_time)*time_slice_len, 'partition_id': entry.partition_id})
+                    processors.append({'id': CPU_counter, 'major_frame': schedules[CPU_counter].hyperperiod*time_slice_len, 'slots': slots})
+                return processors
+
+    def validate(self, schedules=None, par_list=None):
+                '''
+                This function checks that the schedules give every partition its WCET in every window of its period, sliding over the whole
+                hyperperiod and across its end, and that its supply is regular. See SupplyProfile, the cost grows with the number of runs, not the hyperperiod.
+                Args:
+                        schedules:              type: list; The Schedule of each CPU, the current schedule (see generate_schedule) by default.
+                        par_list:               type: list; The partitions as requested, with WCET and period in time slices. The current ones by default.
+                Returns:
+                        A tuple. The first element is True when every partition passes. The second one is a list with a dict per partition:
+                        partition_id, cpu (None when the partition is not in the schedules), wcet, period, supply (per hyperperiod), hyperperiod,
+                        min_supply (the smallest supply in a window of the period), max_blackout, regularity (a Fraction, below 1 for a regular partition) and valid.
+                Raises ValueError when schedules or par_list is left to its default and there is no current schedule.
+                '''
+                if schedules is None or par_list is None:
+                    self.require_schedule()
+                if schedules is None:
+                    schedules = self.schedules
+                if par_list is None:
+                    par_list = list(self.originals.values())
+                located = {}
+                profiles = {}
+                for CPU_id in range(len(schedules)):
+                    for (partition_id, profile) in SupplyProfile.of_schedule(schedules[CPU_id]).items():
+                        if partition_id not in located:
+                            located[partition_id] = CPU_id
+                            profiles[partition_id] = profile
+                all_valid = True
+                reports = []
+                for par in par_list:
+                    wcet = math.ceil(to_fraction(par.wcet))
+                    period = math.floor(to_fraction(par.period))
+                    report = {'partition_id': par.partition_id, 'cpu': located.get(par.partition_id), 'wcet': wcet, 'period': period}
+                    if report['cpu'] is None:
+                        report.update({'supply': 0, 'hyperperiod': 0, 'min_supply': 0, 'max_blackout': None, 'regularity': Fraction(0), 'valid': wcet <= 0})
+                    else:
+                        profile = profiles[par.partition_id]
+                        report['supply'] = profile.total
+                        report['hyperperiod'] = profile.hyperperiod
+                        report['min_supply'] = profile.min_window(period)
+                        report['max_blackout'] = profile.max_blackout()
+                        report['regularity'] = profile.regularity()
+                        report['valid'] = report['min_supply'] >= wcet and report['regularity'] < 1
+                    if not report['valid']:
+                        all_valid = False
+                        self.report("Partition "+str(par.partition_id)+" fails validation: "+str(report), logging.WARNING)
+                    reports.append(report)
+                return (all_valid, reports)
+
+    def read_plans(self, xml_file_name, time_slice_len=None):
+                '''
+                This function reads the first Plan of every Processor of an xml file (RRPOutput.xml or an XtratuM configuration) back into Schedules.
+                Args:
+                        xml_file_name:          type: string; The name of the xml file.
+                        time_slice_len:         type: int; The length of each time slice in milliseconds. By default the largest length all the times are multiples of.
+                Returns:
+                        schedules:              type: list; The Schedule of each Processor, in document order.
+                Raises ET.ParseError when the file is not well formed, ValueError when a time is not a multiple of the time slice or slots overlap.
+                '''
+                plans = []
+                for processor in ET.parse(xml_file_name).getroot().iter():
+                    if processor.tag.rsplit('}', 1)[-1] != 'Processor':
+                        continue
+                    plan = next((node for node in processor.iter() if node.tag.rsplit('}', 1)[-1] == 'Plan'), None)
+                    if plan is None:
+                        plans.append((0, []))
+                        continue
+                    slots = [(self.parse_duration(slot.get('start')), self.parse_duration(slot.get('duration')), int(slot.get('partitionId')))
+                             for slot in plan if slot.tag.rsplit('}', 1)[-1] == 'Slot']
+                    plans.append((self.parse_duration(plan.get('majorFrame')), slots))
+                if time_slice_len is None:
+                    slice_len = math.gcd(*[major_frame for (major_frame, slots) in plans], *[value for (major_frame, slots) in plans for slot in slots for value in slot[:2]])
+                else:
+                    slice_len = time_slice_len*1000
+                schedules = []
+                for (major_frame, slots) in plans:
+                    if slice_len == 0 or major_frame % slice_len:
+                        raise ValueError('The major frame '+str(major_frame)+'us is not a multiple of the time slice.')
+                    schedule = Schedule(major_frame // slice_len)
+                    for (start, duration, partition_id) in slots:
+                        if start % slice_len or duration % slice_len:
+                            raise ValueError('The slot at '+str(start)+'us of partition '+str(partition_id)+' does not fit the time slices.')
+                        schedule.add(start // slice_len, (start + duration) // slice_len, partition_id)
+                    schedules.append(schedule)
+                return schedules
+
+    def parse_duration(self, value):
+                '''
+                This function converts an XtratuM duration ('100ms', '50us' or '1s') into microseconds.
+                '''
+                for (unit, scale) in [('us', 1), ('ms', 1000), ('s', 1000000)]:
+                    if value is not None and value.endswith(unit):
+                        number = value[:-len(unit)]
+                        if number.isdigit():
+                            return int(number)*scale
+                        return int(Fraction(number)*scale)
+                raise ValueError('Invalid duration '+str(value)+'.')
+
     def get_partition_info(self):
                 '''
                 Entry of the class. 
@@ -485,7 +2826,7 @@ class RRP:
                     id_now = input("Please input the id of partition "+str(i+1)+":")
                     wcet_now = input("Please input the WCET of partition "+str(i+1)+":")
                     period_now = input("Please input the period of partition "+str(i+1)+":")
-                    par_now = Partition(float(wcet_now), float(period_now), int(id_now))
+                    par_now = Partition(self.parse_number(wcet_now), self.parse_number(period_now), int(id_now))
                     ps.append(par_now)
                 CPU_num = int(input("Please input the number of processors:"))
                 time_slice_len = input("Please input the length of each time slice (default value is 100ms):")
@@ -506,7 +2847,140 @@ class RRP:
 
 
 
+def schedule_worker(partition_list, settings):
+    '''
+    Process pool task of MulZ: schedules the partitions of one pcpu with an RRP created with settings (see RRP.worker_settings).
+    Returns:
+        A tuple. The first element is the Schedule, None if the partitions are not schedulable. The second one is the
+        Instrumentation of the worker as a dict (see Instrumentation.merge), None when the settings do not instrument.
+    '''
+    rrp = RRP(**settings)
+    launch_table = rrp.partition_single(partition_list)
+    stats = None if rrp.stats is None else rrp.stats.to_dict()
+    if launch_table is None:
+        return (None, stats)
+    return (launch_table.to_schedule(), stats)
+
+
+def time_slice_lens(text):
+    '''
+    This function parses a comma separated list of time slice lengths in ms for the command line.
+    '''
+    try:
+        return [int(value) for value in text.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError('invalid time slice lengths '+text+', expected a comma separated list of ms')
+
+
+def main(argv=None):
+    '''
+    Command line entry. Without input files the partitions are asked for interactively, otherwise every partition set
+    in the inputs is scheduled and one JSON line per set is written to the standard output as soon as it is done.
+    '''
+    parser = argparse.ArgumentParser(description='Generate RRP cyclic plans for XtratuM.')
+    parser.add_argument('inputs', nargs='*', help='Partition set files (json, jsonl, csv or yaml), - for JSON Lines on the standard input. Interactive mode when none is given.')
+    parser.add_argument('--format', dest='file_format', choices=['json', 'jsonl', 'csv', 'yaml'], help='Format of the inputs, guessed from the extension by default.')
+    parser.add_argument('--cpus', type=int, default=1, help='Number of processors for sets that do not give cpu_num (default 1).')
+    parser.add_argument('--min-cpus', action='store_true', help='Schedule every set on the smallest number of processors it fits on, ignoring --cpus and cpu_num.')
+    parser.add_argument('--time-slice-len', type=int, default=100, help='Length of a time slice in ms for sets that do not give time_slice_len (default 100).')
+    parser.add_argument('--tune-time-slice', action='store_true', help='The WCETs and periods of the sets are in ms: choose the time slice length of every set among --time-slice-lens, see RRP.tune_time_slice.')
+    parser.add_argument('--time-slice-lens', type=time_slice_lens, help='Candidate time slice lengths in ms for --tune-time-slice, comma separated (default every whole number of ms up to the shortest period).')
+    parser.add_argument('--max-slots', type=int, help='With --tune-time-slice, the most slots the plan of a processor may have.')
+    parser.add_argument('--processor-freq', type=int, default=400, help='Processor frequency in MHz (default 400).')
+    parser.add_argument('--config', help='XtratuM configuration used as a template, its ProcessorTable is replaced. A simplified ProcessorTable is written without it.')
+    parser.add_argument('--output-dir', help='Write one xml file per schedulable set, named after the set, into this directory.')
+    parser.add_argument('--folded', action='store_true', help='Use the folded scheduling mode.')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes used to schedule the processors of a large multi-core set (default 1, serial), see PARALLEL_MIN_SLICES.')
+    parser.add_argument('--log-level', choices=['debug', 'info', 'warning', 'error'], default='warning', help='Level of the messages written to the standard error: info adds status messages and run-length launch tables, debug per-time-slice tables (default warning).')
+    parser.add_argument('--dump-file', help='Write the launch tables of every schedulable set into this file, each under a header with the set name.')
+    parser.add_argument('--validate', action='store_true', help='Check the supply of every partition in every window of its period (in the xml file when one is written), add the result to the JSON line and exit with status 1 on a failure.')
+    parser.add_argument('--stats', action='store_true', help='Collect counters and stage timings, added to the JSON line of each set and written next to each xml file as <xml file>.stats.json.')
+    parser.add_argument('--alloc-strategy', choices=sorted(ALLOCATION_STRATEGIES), default='first-fit', help='How partitions are assigned to processors (default first-fit).')
+    parser.add_argument('--alloc-budget', type=float, default=1.0, help='Seconds the branch-and-bound strategy may search per set (default 1).')
+    parser.add_argument('--pattern-index', default=PATTERN_INDEX_FILE, help='File keeping the precomputed slot patterns between runs (default '+PATTERN_INDEX_FILE+').')
+    parser.add_argument('--no-pattern-index', action='store_true', help='Keep the slot patterns in memory only.')
+    parser.add_argument('--cache', action='store_true', help='Reuse the schedules and xml generated by earlier runs for the same inputs, see ScheduleCache.')
+    parser.add_argument('--cache-dir', default=SCHEDULE_CACHE_DIR, help='Directory of the schedule cache (default '+SCHEDULE_CACHE_DIR+').')
+    parser.add_argument('--cache-size', type=int, default=SCHEDULE_CACHE_SIZE//(1024*1024), help='Size in MiB the schedule cache is kept under (default '+str(SCHEDULE_CACHE_SIZE//(1024*1024))+').')
+    args = parser.parse_args(argv)
+    if not args.no_pattern_index:
+        PATTERNS.attach(args.pattern_index)
+    schedule_cache = ScheduleCache(args.cache_dir, args.cache_size*1024*1024) if args.cache else None
+    if not args.inputs:
+        logging.basicConfig(stream=sys.stdout, format='%(message)s', level=logging.INFO)
+        rrp = RRP(dump_file=args.dump_file, instrument=args.stats, alloc_strategy=args.alloc_strategy, alloc_budget=args.alloc_budget, schedule_cache=schedule_cache)
+        rrp.get_partition_info()
+        save_patterns()
+        return 0
+    log_level = getattr(logging, args.log_level.upper())
+    logging.basicConfig(stream=sys.stderr, format='%(levelname)s %(message)s', level=log_level)
+    rrp = RRP(simplified=args.config is None, folded=args.folded, workers=args.workers, log_level=log_level, instrument=args.stats, alloc_strategy=args.alloc_strategy, alloc_budget=args.alloc_budget, schedule_cache=schedule_cache)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    if args.dump_file:
+        #the sets of the batch are appended below, start from an empty file
+        open(args.dump_file, "w").close()
+    all_schedulable = True
+    try:
+        for file_name in args.inputs:
+            partition_sets = rrp.load_partition_sets(file_name, args.file_format)
+            if args.tune_time_slice:
+                #the number of CPUs is chosen first, the time slice is tuned on it
+                partition_sets = rrp.with_tuned_time_slice(partition_sets, args.cpus, args.time_slice_lens, args.max_slots, args.min_cpus)
+            elif args.min_cpus:
+                partition_sets = rrp.with_min_cpu(partition_sets)
+            for (partition_set, schedules) in rrp.generate_batch(partition_sets, args.cpus, args.time_slice_len, args.processor_freq if args.output_dir else None):
+                result = {'name': partition_set['name'], 'cpu_num': partition_set['cpu_num'], 'time_slice_len': partition_set['time_slice_len'], 'schedulable': schedules is not None}
+                if schedules is None:
+                    all_schedulable = False
+                else:
+                    rrp.report(partition_set['name']+': '+str(sum(s.slot_count() for s in schedules))+' slots')
+                    rrp.log_launch_tables(schedules)
+                    if args.dump_file:
+                        rrp.dump_launch_tables(schedules, args.dump_file, title=partition_set['name'], append=True)
+                    result['processors'] = rrp.schedule_summary(schedules, partition_set['time_slice_len'])
+                    if args.output_dir:
+                        output_file_name = os.path.join(args.output_dir, partition_set['name']+'.xml')
+                        if 'processor_nodes' in partition_set:
+                            written = rrp.write_processors(partition_set['processor_nodes'], args.config, output_file_name)
+                        else:
+                            written = rrp.write_schedules(schedules, partition_set['time_slice_len'], args.config, args.processor_freq, output_file_name)
+                        if not written:
+                            sys.stderr.write('Unable to write '+output_file_name+'\n')
+                            return 2
+                        result['xml_file'] = output_file_name
+                    if args.validate:
+                        checked = rrp.read_plans(result['xml_file'], partition_set['time_slice_len']) if 'xml_file' in result else schedules
+                        (result['valid'], reports) = rrp.validate(checked, partition_set['partitions'])
+                        for report in reports:
+                            report['regularity'] = float(report['regularity'])
+                        result['validation'] = reports
+                        if not result['valid']:
+                            all_schedulable = False
+                if rrp.stats is not None:
+                    result['stats'] = rrp.stats.to_dict()
+                    if 'xml_file' in result:
+                        rrp.stats.write(result['xml_file']+'.stats.json')
+                    rrp.stats.reset()
+                sys.stdout.write(json.dumps(result)+'\n')
+                sys.stdout.flush()
+    except (OSError, ValueError, ImportError) as e:
+        sys.stderr.write(str(e)+'\n')
+        return 2
+    save_patterns()
+    return 0 if all_schedulable else 1
+
+
+def save_patterns():
+    '''
+    This function writes PATTERNS back to its file, a failure only costs the patterns computed by this run.
+    '''
+    try:
+        PATTERNS.save()
+    except OSError as e:
+        logger.warning('Unable to save the pattern index: '+str(e))
+
+
 #main function
 if __name__=="__main__":
-    rrp = RRP()
-    rrp.get_partition_info()
+    sys.exit(main())
@@ -0,0 +1,175 @@
+'''
+Benchmark harness for RRP schedule generation.
+
+Every scenario draws its partition set from a fixed seed, so runs are comparable across commits.
+The schedule is generated and written by an instrumented RRP, which times each stage (best of --repeat runs), and the peak memory
+of the whole pipeline is measured in a separate tracemalloc run. Timings depend on the host, so the baseline is not part of the
+repository: save one on the machine that runs the comparisons, e.g. before a change, and compare against it afterwards.
+
+Usage:
+    python benchmark.py                          run every scenario and print the results
+    python benchmark.py --save-baseline          store the results in benchmark_baseline.json (ignored by git)
+    python benchmark.py --compare                exit with status 1 when a stage got slower than the baseline allows
+'''
+import os
+import sys
+import json
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+from RRP import RRP, Partition, ALLOCATION_STRATEGIES
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+#name, seed, CPU_num, period range (in time slices) and partition groups (count, lowest and highest availability factor).
+#the factors are chosen for long hyperperiods once approximated: tiny factors give periods of 7*2^n (10^4 to 10^5 time slices),
+#factors close to 1 keep find_delta busy on periods that long, and the partitions of period 7 repeat over the whole hyperperiod,
+#which gives xml_build and xml_write thousands of slots to write.
+SCENARIOS = [
+    {'name': 'single-small', 'seed': 1, 'cpu_num': 1, 'periods': (10**5, 10**6), 'groups': [(7, 0.02, 0.08), (1, 1/30000., 1/15000.)]},
+    {'name': 'single-near-one', 'seed': 2, 'cpu_num': 1, 'periods': (10**5, 10**6), 'groups': [(1, 1 - 1/20000., 1 - 1/15000.), (1, 1/100000., 1/60000.)]},
+    {'name': 'single-long-hyperperiod', 'seed': 3, 'cpu_num': 1, 'periods': (10**5, 10**6), 'groups': [(20, 0.005, 0.02), (12, 1/60000., 1/20000.)]},
+    {'name': 'mulz-4', 'seed': 4, 'cpu_num': 4, 'periods': (10**5, 10**6), 'groups': [(1, 1 - 1/12000., 1 - 1/8000.), (16, 0.03, 0.2), (6, 1/30000., 1/8000.)]},
+    {'name': 'mulz-8', 'seed': 5, 'cpu_num': 8, 'periods': (10**5, 10**6), 'groups': [(2, 1 - 1/12000., 1 - 1/8000.), (40, 0.01, 0.12), (16, 1/60000., 1/10000.)]},
+    {'name': 'mulz-16-mixed', 'seed': 6, 'cpu_num': 16, 'periods': (10**5, 10**6), 'groups': [(3, 1 - 1/8000., 1 - 1/4000.), (30, 0.15, 0.25), (60, 0.01, 0.08), (40, 1/60000., 1/5000.)]},
+    {'name': 'mulz-32-many', 'seed': 7, 'cpu_num': 32, 'periods': (10**5, 10**6), 'groups': [(4, 1 - 1/8000., 1 - 1/4000.), (300, 0.005, 0.08), (200, 1/60000., 1/2000.)]},
+]
+
+STAGES = ['approximation', 'find_delta', 'partition_single', 'xml_build', 'xml_write']
+
+
+def random_partitions(scenario):
+    '''
+    This function draws the partition set of a scenario, every group gives exactly its count of partitions.
+    The groups of each scenario are chosen so that the set stays schedulable, run_pipeline raises RuntimeError otherwise.
+    '''
+    rng = random.Random(scenario['seed'])
+    partitions = []
+    for (count, lowest, highest) in scenario['groups']:
+        for i in range(count):
+            factor = rng.uniform(lowest, highest)
+            period = rng.randint(scenario['periods'][0], scenario['periods'][1])
+            wcet = min(period - 1, max(1, int(round(factor*period))))
+            partitions.append(Partition(wcet, period, len(partitions) + 1))
+    return partitions
+
+
+def run_pipeline(scenario, partitions, output_file_name, alloc_strategy='first-fit'):
+    '''
+    This function generates and writes the schedule of the partitions through the RRP API, the same path as the command line.
+    The stages are the ones timed by an instrumented RRP (see RRP.Instrumentation), a stage the run never entered takes 0 seconds.
+    Returns:
+        A tuple of the duration of each stage in seconds (a dict), the number of slots generated and the longest hyperperiod.
+    '''
+    rrp = RRP(simplified=True, verbose=False, instrument=True, alloc_strategy=alloc_strategy)
+    schedules = rrp.generate_schedule(partitions, scenario['cpu_num'])
+    if schedules is None:
+        raise RuntimeError('Scenario '+scenario['name']+' is not schedulable.')
+    rrp.write_schedules(schedules, 10, output_file_name=output_file_name)
+    timings = dict((stage, rrp.stats.stages[stage][1] if stage in rrp.stats.stages else 0.0) for stage in STAGES)
+    return (timings, sum(schedule.slot_count() for schedule in schedules), max(len(schedule) for schedule in schedules))
+
+
+def run_scenario(scenario, repeat, alloc_strategy='first-fit'):
+    '''
+    This function benchmarks one scenario.
+    Returns:
+        A dict with the best time of each stage, the total, the throughput and the peak memory of the pipeline.
+    '''
+    partitions = random_partitions(scenario)
+    with tempfile.TemporaryDirectory() as directory:
+        output_file_name = os.path.join(directory, 'RRPOutput.xml')
+        best = None
+        for i in range(repeat):
+            (timings, slots, hyperperiod) = run_pipeline(scenario, partitions, output_file_name, alloc_strategy)
+            if best is None:
+                best = timings
+            else:
+                best = dict((stage, min(best[stage], timings[stage])) for stage in STAGES)
+        tracemalloc.start()
+        run_pipeline(scenario, partitions, output_file_name, alloc_strategy)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    #find_delta runs inside partition_single, it is not counted twice
+    total = sum(best[stage] for stage in STAGES if stage != 'find_delta')
+    return {
+        'partitions': len(partitions),
+        'cpu_num': scenario['cpu_num'],
+        'hyperperiod': int(hyperperiod),
+        'slots': slots,
+        'stages': best,
+        'total': total,
+        'partitions_per_second': len(partitions)/total if total > 0 else 0,
+        'slots_per_second': slots/total if total > 0 else 0,
+        'peak_memory': peak,
+    }
+
+
+def compare(results, baseline, tolerance, minimum):
+    '''
+    This function lists the stages that got slower than the baseline by more than tolerance (a fraction).
+    Stages faster than minimum seconds in the baseline are ignored, their timings are mostly noise.
+    '''
+    regressions = []
+    for (name, result) in results.items():
+        if name not in baseline:
+            continue
+        for stage in STAGES + ['total']:
+            #a baseline saved by an older version may lack the stage
+            if stage != 'total' and stage not in baseline[name]['stages']:
+                continue
+            before = baseline[name]['total'] if stage == 'total' else baseline[name]['stages'][stage]
+            after = result['total'] if stage == 'total' else result['stages'][stage]
+            if before >= minimum and after > before*(1 + tolerance):
+                regressions.append((name, stage, before, after))
+        if result['peak_memory'] > baseline[name]['peak_memory']*(1 + tolerance):
+            regressions.append((name, 'peak_memory', baseline[name]['peak_memory'], result['peak_memory']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark RRP schedule generation.')
+    parser.add_argument('--scenario', action='append', help='Only run the named scenario (may be repeated).')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per scenario, the best time of each stage is kept (default 5).')
+    parser.add_argument('--alloc-strategy', choices=sorted(ALLOCATION_STRATEGIES), default='first-fit', help='Allocation strategy of the multi-core scenarios (default first-fit).')
+    parser.add_argument('--json', help='Write the results into this file.')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='Baseline file, saved on this machine (default benchmark_baseline.json next to this script).')
+    parser.add_argument('--save-baseline', action='store_true', help='Store the results as the baseline.')
+    parser.add_argument('--compare', action='store_true', help='Compare against the baseline, exit with status 1 on a regression and 2 without a baseline.')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='Allowed slowdown as a fraction of the baseline (default 0.5).')
+    parser.add_argument('--minimum', type=float, default=0.002, help='Stages under this many seconds in the baseline are not compared (default 0.002).')
+    args = parser.parse_args(argv)
+    if args.compare and not args.save_baseline and not os.path.exists(args.baseline):
+        print('No baseline '+args.baseline+', save one on this machine with --save-baseline first.')
+        return 2
+    scenarios = [scenario for scenario in SCENARIOS if not args.scenario or scenario['name'] in args.scenario]
+    results = {}
+    widths = [max(len(stage), 9) for stage in STAGES]
+    print('%-24s %5s %4s %9s %7s ' % ('scenario', 'pars', 'cpus', 'hyper', 'slots') + ' '.join('%*s' % (width, stage) for (width, stage) in zip(widths, STAGES)) + ' %9s %9s' % ('total', 'peak KiB'))
+    for scenario in scenarios:
+        result = run_scenario(scenario, args.repeat, args.alloc_strategy)
+        results[scenario['name']] = result
+        print('%-24s %5d %4d %9d %7d ' % (scenario['name'], result['partitions'], result['cpu_num'], result['hyperperiod'], result['slots'])
+              + ' '.join('%*.4f' % (width, result['stages'][stage]) for (width, stage) in zip(widths, STAGES)) + ' %9.4f %9d' % (result['total'], result['peak_memory']//1024))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.minimum)
+        for (name, stage, before, after) in regressions:
+            print('Regression in '+name+'/'+stage+': '+str(before)+' -> '+str(after))
+        if regressions:
+            return 1
+        print('No regression against '+args.baseline+'.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
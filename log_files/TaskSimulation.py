@@ -1,5 +1,41 @@
+import io
+import os
 import sys
+import csv
+import mmap
+import re
+import zlib
 import random
+import argparse
+import contextlib
+import concurrent.futures
+from fractions import Fraction
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+#counter increments per microsecond of execution
+INC_PER_US = 2.423
+#range of the task arrival times, in microseconds
+ARRIVAL_MIN = 150000
+ARRIVAL_MAX = 300000
+#tasks per density of the legacy engine
+REPEAT_TIMES = 50
+#columns of a log line: the counters of the two partitions and the time in microseconds
+P1_COLUMN = 1
+P2_COLUMN = 2
+TIME_COLUMN = 4
+#bytes of log parsed at once by read_log
+CHUNK_SIZE = 16*1024*1024
+#the '.' ending a log line, other '.' are kept
+LINE_END = re.compile(rb'\.+(?=[ \t]*\r?\n|[ \t]*$)')
+#columns of the table written by the sweep
+SWEEP_FIELDS = ['log', 'column', 'wcet_min', 'wcet_max', 'density', 'tasks', 'on_time_ratio', 'out_of_bound', 'seed']
+#columns of the table written by the ranking
+RANK_FIELDS = ['rank', 'time_slice_len', 'factor', 'cpus', 'schedulable', 'slots', 'major_frame', 'on_time_ratio', 'worst_on_time_ratio', 'out_of_bound']
+#logs loaded by the current process, by (log, column, engine, cache, horizon)
+LOADED_LOGS = {}
 
 class time_spot:
 	def __init__(self, time, counter):
@@ -21,14 +57,15 @@ def file_analysis(filename):
 	p1_list = []
 	p2_list = []
 	with open(filename, 'r') as f:
-		lines = f.readlines()
-		for line in lines:
-			line = line[:-2]
-			#print(line)
+		for line in f:
+			#drop the '.' ending each line
+			line = line.rstrip().rstrip('.')
+			if not line:
+				continue
 			elements = line.split(',')
-			time_now = int(elements[4])
-			p1_counter = int(elements[1])
-			p2_counter = int(elements[2])
+			time_now = int(elements[TIME_COLUMN])
+			p1_counter = int(elements[P1_COLUMN])
+			p2_counter = int(elements[P2_COLUMN])
 			spot1 = time_spot(time_now, p1_counter)
 			p1_list.append(spot1)
 			spot2 = time_spot(time_now, p2_counter)
@@ -43,7 +80,7 @@ def search_time(time, p_list):
 	start = 0
 	end = len(p_list) - 1
 	result = -1
-	while start < end:
+	while start <= end:
 		middle = int((start + end)/2)
 		#print(str(start)+','+str(middle)+','+str(end))
 		#print(p_list[middle].time)
@@ -64,7 +101,7 @@ def search_counter(counter, p_list):
 	start = 0
 	end = len(p_list) - 1
 	result = -1
-	while start < end:
+	while start <= end:
 		middle = int((start + end)/2)
 		#print(str(start)+','+str(middle)+','+str(end))
 		if p_list[middle].counter == counter:
@@ -79,13 +116,24 @@ def search_counter(counter, p_list):
 def execute_task(task_now, p_list):
 	'''
 	This function judges whether the task can be accomplished in time with info in p_list.
+	When the log cannot tell, the reason is written to the standard error and the task counts as missed.
+	'''
+	(on_time, error) = execute_task_bounded(task_now, p_list)
+	if error is not None:
+		sys.stderr.write(error + '\n')
+	return on_time
+
+def execute_task_bounded(task_now, p_list):
+	'''
+	This function is execute_task without the diagnostics, like execute_tasks it tells the tasks the log cannot tell about apart.
+	Returns:
+		A tuple. The first element is True when the task is accomplished in time. The second one is None, or the reason why the log cannot tell.
 	'''
 	#search the place of arrival
 	#print("Searching.")
 	index_start = search_time(task_now.arrival_time, p_list)
 	if index_start == -1 or index_start == 0:
-		print("Error! The task arrival time is out of bound.")
-		return False
+		return (False, "Error! The task arrival time is out of bound.")
 
 	start_counter = p_list[index_start].counter - (p_list[index_start].time - task_now.arrival_time)/(p_list[index_start].time - p_list[index_start-1].time)*(p_list[index_start].counter - p_list[index_start-1].counter)
 	start_counter = int(start_counter)
@@ -93,22 +141,21 @@ def execute_task(task_now, p_list):
 	end_counter = start_counter + task_now.wcet
 	index_end = search_counter(end_counter, p_list)
 	if index_end == -1:
-		print("Error! Unable to accomplish the task with the given log.")
-		return False
+		return (False, "Error! Unable to accomplish the task with the given log.")
 	while index_end>0 and p_list[index_end].counter == p_list[index_end-1].counter:
 		index_end -= 1
 	end_time = p_list[index_end].time - (p_list[index_end].counter - end_counter)/(p_list[index_end].counter - p_list[index_end-1].counter)*(p_list[index_end].time - p_list[index_end-1].time)
 	#print(end_time)
 	if end_time > task_now.deadline:
-		return False
-	return True
+		return (False, None)
+	return (True, None)
 
 def generate_task(density, wcet_min, wcet_max):
 	'''
 	Note that wcet_min and wcet_max are all given in ms.
 	'''
-	inc_per_us = 2.423
-	arrival_time = random.randint(150000, 300000)
+	inc_per_us = INC_PER_US
+	arrival_time = random.randint(ARRIVAL_MIN, ARRIVAL_MAX)
 	wcet = random.randint(wcet_min, wcet_max) * 1000
 	ddl = wcet/density + arrival_time
 	wcet = wcet*inc_per_us
@@ -119,37 +166,521 @@ def generate_task(density, wcet_min, wcet_max):
 	return task_now
 
 
-if len(sys.argv) < 7:
-	print("Usage: Input the name of the log, start, end, step length of the density together with the smallest wcet and largest wcet.")
-	sys.exit(1)
-REPEAT_TIMES = 50
-file_name = sys.argv[1]
-start_den = float(sys.argv[2])
-end_den = float(sys.argv[3])
-step_den = float(sys.argv[4])
-wcet_min = float(sys.argv[5])
-wcet_max = float(sys.argv[6])
-output_file_name = file_name +'-' + str(start_den) + '-' + str(end_den) + '-' + str(step_den)+'-' + str(wcet_min)+'-'+str(wcet_max)+'.csv'
-
-(p1_list, p2_list) = file_analysis(file_name)
-if file_name.find('naive')==-1:
-	p_list = p1_list
-else:
-	p_list = p2_list
-output_content = []
-density = start_den
-while density <= end_den:
-	ontime_num = 0
-	for i in range(REPEAT_TIMES):
-		task_now = generate_task(density, wcet_min, wcet_max)
-		if execute_task(task_now, p_list):
-			ontime_num += 1
-		#else:
-		#	print(str(task_now.arrival_time)+','+str(task_now.wcet)+','+str(task_now.deadline))
-	output_content.append(str(density)+','+str(ontime_num/REPEAT_TIMES))
-	density += step_den
-	print('Density '+str(density)+' tested.')
-
-with open(output_file_name, 'w') as f:
-	for c in output_content:
-		f.write(c + '\n')
\ No newline at end of file
+def require_numpy():
+	'''
+	This function raises an ImportError explaining how to get the vectorized engine when numpy is missing.
+	'''
+	if np is None:
+		raise ImportError("The vectorized engine needs numpy (pip install numpy), use --engine legacy without it.")
+
+def require_rrp():
+	'''
+	This function imports the RRP module, only needed for the plans and the ranking, and raises an ImportError explaining how to reach it.
+	'''
+	try:
+		import RRP
+	except ImportError:
+		raise ImportError("Plans and rankings need RRP.py, add the repository root to PYTHONPATH (PYTHONPATH=.. python TaskSimulation.py ...).")
+	return RRP
+
+def load_log(filename, counter_columns=(P1_COLUMN, P2_COLUMN), cache=True):
+	'''
+	This function reads the times and the requested counter columns of the log with filename, see read_log.
+	Returns:
+		A tuple (times, counters...) of int64 arrays, one element per line of the log and one counter array per column requested.
+	'''
+	return tuple(read_log(filename, [TIME_COLUMN] + list(counter_columns), cache))
+
+def read_log(filename, columns, cache=True, chunk_size=CHUNK_SIZE):
+	'''
+	This function returns the requested columns of the log with filename as int64 arrays, the other columns are never materialized.
+	The log is memory-mapped and parsed chunk_size bytes at a time. Each column parsed is kept in a sidecar file (see sidecar_name)
+	that later calls load memory-mapped instead of parsing, as long as it is newer than the log.
+	'''
+	require_numpy()
+	result = {}
+	missing = []
+	for column in columns:
+		if column in result or column in missing:
+			continue
+		values = load_sidecar(filename, column) if cache else None
+		if values is None:
+			missing.append(column)
+		else:
+			result[column] = values
+	if missing:
+		for (column, values) in zip(missing, parse_log(filename, missing, chunk_size)):
+			result[column] = values
+			if cache:
+				save_sidecar(filename, column, values)
+	return [result[column] for column in columns]
+
+def parse_log(filename, columns, chunk_size=CHUNK_SIZE):
+	'''
+	This function parses the columns of the log with filename, chunk by chunk of whole lines.
+	'''
+	parts = [[] for column in columns]
+	with open(filename, 'rb') as f:
+		size = os.fstat(f.fileno()).st_size
+		if size == 0:
+			return [np.zeros(0, dtype=np.int64) for column in columns]
+		with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+			start = 0
+			while start < size:
+				if start + chunk_size >= size:
+					end = size
+				else:
+					end = data.rfind(b'\n', start, start + chunk_size) + 1
+					if end <= start:
+						#a line longer than a chunk
+						end = data.find(b'\n', start + chunk_size) + 1 or size
+				#drop the '.' ending each line, like the rstrip('.') of file_analysis
+				chunk = LINE_END.sub(b'', data[start:end])
+				values = np.loadtxt(io.BytesIO(chunk), delimiter=',', dtype=np.int64, usecols=columns, ndmin=2)
+				for i in range(len(columns)):
+					parts[i].append(values[:, i])
+				start = end
+	return [np.concatenate(part) for part in parts]
+
+def sidecar_name(filename, column):
+	return filename + '.col' + str(column) + '.npy'
+
+def load_sidecar(filename, column):
+	'''
+	This function memory-maps the sidecar of a column, None when it is missing or older than the log.
+	'''
+	try:
+		if os.stat(sidecar_name(filename, column)).st_mtime_ns < os.stat(filename).st_mtime_ns:
+			return None
+		return np.load(sidecar_name(filename, column), mmap_mode='r')
+	except (OSError, ValueError):
+		return None
+
+def save_sidecar(filename, column, values):
+	'''
+	This function writes the sidecar of a column through a temporary file, a read-only directory only costs the parsing next time.
+	'''
+	temp_name = sidecar_name(filename, column) + '.' + str(os.getpid()) + '.tmp'
+	try:
+		with open(temp_name, 'wb') as f:
+			np.save(f, values)
+		os.replace(temp_name, sidecar_name(filename, column))
+	except OSError:
+		if os.path.exists(temp_name):
+			os.remove(temp_name)
+
+def generate_tasks(density, wcet_min, wcet_max, count, rng):
+	'''
+	Batch version of generate_task: count tasks drawn at once from rng, a numpy Generator.
+	wcet_min and wcet_max are given in ms, both included.
+	Returns:
+		A tuple (arrival_times, wcets, deadlines) of float64 arrays, the WCETs being given in counter increments like in generate_task.
+	'''
+	require_numpy()
+	arrival_times = rng.integers(ARRIVAL_MIN, ARRIVAL_MAX, size=count, endpoint=True).astype(np.float64)
+	wcets = rng.integers(int(wcet_min), int(wcet_max), size=count, endpoint=True).astype(np.float64) * 1000
+	deadlines = wcets/density + arrival_times
+	return (arrival_times, wcets*INC_PER_US, deadlines)
+
+def execute_tasks(arrival_times, wcets, deadlines, times, counters):
+	'''
+	Vectorized execute_task over arrays of tasks and a log given as arrays of times and counters.
+	The arrival is located with np.searchsorted on the times and the completion on the counters, both interpolated linearly between log lines.
+	Returns:
+		A tuple. The first element is a boolean array, True for the tasks accomplished in time. The second one is a boolean array
+		of the tasks the log cannot tell about (arriving outside of it or not finished by its end), which count as missed.
+	'''
+	require_numpy()
+	times = np.asarray(times, dtype=np.float64)
+	counters = np.asarray(counters, dtype=np.float64)
+	#first log line at or after the arrival
+	index_start = np.searchsorted(times, arrival_times, side='left')
+	out_of_bound = (index_start == 0) | (index_start == len(times))
+	index_start = np.clip(index_start, 1, len(times) - 1)
+	previous = index_start - 1
+	start_counters = counters[index_start] - (times[index_start] - arrival_times)/(times[index_start] - times[previous])*(counters[index_start] - counters[previous])
+	end_counters = np.trunc(start_counters) + wcets
+	#first log line whose counter reaches the end counter, so the counter grew on the line before it
+	index_end = np.searchsorted(counters, end_counters, side='left')
+	out_of_bound |= index_end == len(counters)
+	index_end = np.clip(index_end, 1, len(counters) - 1)
+	previous = index_end - 1
+	with np.errstate(divide='ignore', invalid='ignore'):
+		end_times = times[index_end] - (counters[index_end] - end_counters)/(counters[index_end] - counters[previous])*(times[index_end] - times[previous])
+	return (~out_of_bound & (end_times <= deadlines), out_of_bound)
+
+def densities(start_den, end_den, step_den):
+	'''
+	This function lists the densities from start_den to end_den (included) by step_den.
+	Each density is computed from its index and rounded, so that the steps do not accumulate floating point errors.
+	'''
+	result = []
+	density = start_den
+	while density <= end_den:
+		result.append(density)
+		density = round(start_den + len(result)*step_den, 12)
+	return result
+
+def simulate(times, counters, density_list, wcet_min, wcet_max, task_num, seed=None):
+	'''
+	This function runs task_num tasks per density through execute_tasks.
+	Returns:
+		A list of (density, ratio of tasks accomplished in time, number of tasks out of the log) tuples.
+	'''
+	require_numpy()
+	rng = np.random.default_rng(seed)
+	result = []
+	for density in density_list:
+		(arrival_times, wcets, deadlines) = generate_tasks(density, wcet_min, wcet_max, task_num, rng)
+		(on_time, out_of_bound) = execute_tasks(arrival_times, wcets, deadlines, times, counters)
+		result.append((density, int(np.count_nonzero(on_time))/task_num, int(np.count_nonzero(out_of_bound))))
+	return result
+
+def simulate_legacy(p_list, density_list, wcet_min, wcet_max, task_num):
+	'''
+	This function runs task_num tasks per density through generate_task and execute_task_bounded, one at a time.
+	Returns:
+		A list of (density, ratio of tasks accomplished in time, number of tasks out of the log) tuples, like simulate.
+	'''
+	result = []
+	for density in density_list:
+		ontime_num = 0
+		out_of_bound = 0
+		for i in range(task_num):
+			task_now = generate_task(density, int(wcet_min), int(wcet_max))
+			(on_time, error) = execute_task_bounded(task_now, p_list)
+			if on_time:
+				ontime_num += 1
+			if error is not None:
+				out_of_bound += 1
+		result.append((density, ontime_num/task_num, out_of_bound))
+	return result
+
+def supply_horizon(density_list, wcet_ranges):
+	'''
+	This function returns the latest deadline, in microseconds, of the tasks drawn for the densities and WCET ranges (in ms).
+	A supply curve covering it tells about every task: one not finished by then misses its deadline anyway.
+	'''
+	wcet_max = max(wcet_max for (wcet_min, wcet_max) in wcet_ranges)
+	return ARRIVAL_MAX + wcet_max*1000/min(density_list)
+
+def supply_curve(schedule, partition_id, slice_us, horizon):
+	'''
+	This function synthesizes the log a partition would produce when running on schedule, repeated from time 0 until after horizon.
+	Args:
+		schedule:		type: Schedule; The schedule of the CPU of the partition (see RRP.generate_schedule or RRP.read_plans).
+		partition_id:		type: int; The partition whose supply is recorded.
+		slice_us:		type: int; The length of a time slice of the schedule in microseconds.
+		horizon:		type: float; The time in microseconds the curve must reach, see supply_horizon.
+	Returns:
+		A tuple (times, counters) of float64 arrays like load_log gives, with a line at each start and end of a run of the partition.
+		The counter grows by INC_PER_US per microsecond inside the runs and stays flat between them, so the linear interpolation of
+		execute_tasks is exact. Context switches are not accounted for.
+	Raises ValueError when the partition has no run in the schedule.
+	'''
+	require_numpy()
+	runs = [(entry.start_time, entry.end_time) for entry in schedule if entry.partition_id == partition_id]
+	if not runs:
+		raise ValueError('Partition '+str(partition_id)+' has no slot in the schedule.')
+	period = float(schedule.hyperperiod*slice_us)
+	starts = np.array([run[0] for run in runs], dtype=np.float64)*slice_us
+	ends = np.array([run[1] for run in runs], dtype=np.float64)*slice_us
+	lengths = ends - starts
+	before = np.cumsum(lengths) - lengths
+	cycles = np.arange(int(horizon // period) + 2, dtype=np.float64)[:, None]
+	#one row per hyperperiod, the start then the end of each run
+	times = np.stack([starts + cycles*period, ends + cycles*period], axis=2).ravel()
+	supplied = np.stack([before + cycles*lengths.sum(), before + lengths + cycles*lengths.sum()], axis=2).ravel()
+	times = np.concatenate(([0.0], times))
+	supplied = np.concatenate(([0.0], supplied))
+	#a run starting at 0 or ending where the next hyperperiod starts gives the same line twice
+	keep = np.concatenate(([True], np.diff(times) > 0))
+	return (times[keep], supplied[keep]*INC_PER_US)
+
+def plan_curve(xml_file_name, partition_id, horizon):
+	'''
+	This function synthesizes the supply curve of a partition from the first Plan of the Processor it runs on in an xml file
+	(RRPOutput.xml or an XtratuM configuration), see supply_curve.
+	'''
+	#microsecond time slices, so any plan fits
+	for schedule in require_rrp().RRP(verbose=False).read_plans(xml_file_name, Fraction(1, 1000)):
+		if any(entry.partition_id == partition_id for entry in schedule):
+			return supply_curve(schedule, partition_id, 1, horizon)
+	raise ValueError('Partition '+str(partition_id)+' has no slot in '+xml_file_name+'.')
+
+def candidate_schedules(par_list, time_slice_len, factor=None, CPU_num=1):
+	'''
+	This function schedules partitions given in milliseconds with time slices of time_slice_len.
+	Args:
+		par_list:		type: list; The partitions, WCET and period in milliseconds.
+		time_slice_len:		type: int; The length of a time slice in milliseconds.
+		factor:		type: int; The base factor (3, 4, 5 or 7) every partition is approximated with on one CPU. None leaves it
+					to RRP, Magic7 on one CPU and MulZ on more.
+		CPU_num:		type: int; The number of CPUs.
+	Returns:
+		The Schedule of each CPU, None when the partitions are not schedulable that way.
+	Raises ValueError when a factor is given for more than one CPU, MulZ chooses the factors itself.
+	'''
+	rrp_module = require_rrp()
+	rrp = rrp_module.RRP(verbose=False)
+	partitions = rrp.partitions_in_slices(par_list, time_slice_len)
+	if partitions is None:
+		return None
+	if factor is None:
+		return rrp.generate_schedule(partitions, CPU_num)
+	if CPU_num > 1:
+		raise ValueError('A factor can only be imposed on one CPU.')
+	for par in partitions:
+		if par.wcet == 0:
+			(par.aaf, par.wcet, par.period) = (0, 0, 1)
+		else:
+			(par.aaf, par.wcet, par.period) = rrp_module.approx_factor(Fraction(par.wcet, par.period), factor)
+	if sum(par.aaf for par in partitions) > 1:
+		return None
+	launch_table = rrp.partition_single(partitions)
+	if launch_table is None:
+		return None
+	return [rrp.to_schedule(launch_table)]
+
+def rank_candidates(par_list, partition_id, time_slice_lens, factors, density_list, wcet_ranges, task_num, seed=None, CPU_num=1):
+	'''
+	This function schedules the partitions with every time slice length and factor, simulates the tasks of every density and WCET range
+	on the synthesized supply of partition_id, and ranks the candidates by their mean ratio of tasks accomplished in time.
+	Every candidate gets the same tasks, so the ratios compare the schedules and not the draws.
+	Args:
+		par_list:		type: list; The partitions, WCET and period in milliseconds.
+		partition_id:		type: int; The partition the tasks run in.
+		time_slice_lens:	type: list; Candidate lengths of a time slice in milliseconds.
+		factors:		type: list; Candidate factors, see candidate_schedules (None for RRP's own choice).
+	Returns:
+		A list of dicts with the RANK_FIELDS, best first. Unschedulable candidates come last, without a ratio.
+		Ties are broken by the number of slots, fewer first.
+	'''
+	require_numpy()
+	horizon = supply_horizon(density_list, wcet_ranges)
+	rows = []
+	for time_slice_len in time_slice_lens:
+		for factor in factors:
+			row = dict((field, '') for field in RANK_FIELDS)
+			row.update({'time_slice_len': time_slice_len, 'factor': 'auto' if factor is None else factor, 'cpus': CPU_num, 'schedulable': False})
+			schedules = candidate_schedules(par_list, time_slice_len, factor, CPU_num)
+			if schedules is not None:
+				schedule = next((schedule for schedule in schedules if any(entry.partition_id == partition_id for entry in schedule)), None)
+				if schedule is None:
+					raise ValueError('Partition '+str(partition_id)+' has no slot in the schedule.')
+				(times, counters) = supply_curve(schedule, partition_id, time_slice_len*1000, horizon)
+				ratios = []
+				out_of_bound = 0
+				for (wcet_min, wcet_max) in wcet_ranges:
+					for density in density_list:
+						(density, ratio, missing) = simulate(times, counters, [density], wcet_min, wcet_max, task_num,
+							cell_seed(seed, 'rank', partition_id, wcet_min, wcet_max, density))[0]
+						ratios.append(ratio)
+						out_of_bound += missing
+				row.update({'schedulable': True, 'slots': sum(schedule.slot_count() for schedule in schedules),
+					'major_frame': max(schedule.hyperperiod for schedule in schedules)*time_slice_len,
+					'on_time_ratio': sum(ratios)/len(ratios), 'worst_on_time_ratio': min(ratios), 'out_of_bound': out_of_bound})
+			rows.append(row)
+			print('time slice '+str(time_slice_len)+'ms factor '+str(row['factor'])+' tested.', file=sys.stderr)
+	rows.sort(key=lambda row: (not row['schedulable'], -(row['on_time_ratio'] or 0), row['slots'] or 0))
+	for i in range(len(rows)):
+		rows[i]['rank'] = i + 1
+	return rows
+
+def log_column(filename, partition='auto', partition_id=None):
+	'''
+	This function returns the counter column simulated for a log: the second partition for naive logs and the first one otherwise
+	when partition is auto, or the one of partition (p1 or p2).
+	For an xml plan (see plan_curve) the column is the partition_id simulated.
+	'''
+	if filename.endswith('.xml'):
+		if partition_id is None:
+			raise ValueError('The partition simulated in '+filename+' must be given (--partition-id).')
+		return partition_id
+	if partition == 'auto':
+		partition = 'p2' if os.path.basename(filename).find('naive') != -1 else 'p1'
+	return P2_COLUMN if partition == 'p2' else P1_COLUMN
+
+def cell_seed(seed, filename, column, wcet_min, wcet_max, density):
+	'''
+	This function derives the seed of one cell of the sweep from the seed of the sweep and the cell itself (crc32 of its description),
+	so a cell gets the same tasks whatever the other cells, their order or the number of workers.
+	'''
+	description = '|'.join([os.path.basename(filename), str(column), repr(float(wcet_min)), repr(float(wcet_max)), repr(float(density))])
+	return (zlib.crc32(description.encode()) + (seed or 0)*0x100000000) % 2**63
+
+def loaded_log(filename, column, engine, cache, horizon=None):
+	'''
+	This function returns the log as used by the engine, (times, counters) arrays for numpy and a list of time_spot for legacy,
+	loaded once per process. An xml plan is turned into the supply curve of partition column up to horizon, see plan_curve.
+	'''
+	key = (filename, column, engine, cache, horizon)
+	if key not in LOADED_LOGS:
+		if filename.endswith('.xml'):
+			(times, counters) = plan_curve(filename, column, horizon)
+			LOADED_LOGS[key] = (times, counters) if engine == 'numpy' else list(map(time_spot, times.tolist(), counters.tolist()))
+		elif engine == 'numpy':
+			LOADED_LOGS[key] = load_log(filename, [column], cache)
+		else:
+			(p1_list, p2_list) = file_analysis(filename)
+			LOADED_LOGS[key] = p2_list if column == P2_COLUMN else p1_list
+	return LOADED_LOGS[key]
+
+def run_cell(filename, column, wcet_min, wcet_max, density, task_num, seed, engine, cache, horizon=None):
+	'''
+	Process pool task of the sweep: simulates task_num tasks of one density on one log.
+	Returns:
+		A dict with the SWEEP_FIELDS.
+	'''
+	if engine == 'numpy':
+		(times, counters) = loaded_log(filename, column, engine, cache, horizon)
+		(density, ratio, out_of_bound) = simulate(times, counters, [density], wcet_min, wcet_max, task_num, seed)[0]
+	else:
+		random.seed(seed)
+		(density, ratio, out_of_bound) = simulate_legacy(loaded_log(filename, column, engine, cache, horizon), [density], wcet_min, wcet_max, task_num)[0]
+	return {'log': filename, 'column': column, 'wcet_min': wcet_min, 'wcet_max': wcet_max, 'density': density, 'tasks': task_num,
+		'on_time_ratio': ratio, 'out_of_bound': out_of_bound, 'seed': seed}
+
+def sweep(logs, density_list, wcet_ranges, output, task_num, seed=None, workers=1, engine='numpy', partition='auto', cache=True, partition_id=None):
+	'''
+	This function simulates every (log, WCET range, density) cell and writes one row per cell to output, a csv writer's file,
+	in the order of the cells and flushed as soon as the row is known. The cells run on a process pool when workers > 1.
+	Logs ending in .xml are plans, the supply of partition_id is synthesized from them (see plan_curve).
+	Returns:
+		The list of rows written, as dicts with the SWEEP_FIELDS.
+	'''
+	horizon = supply_horizon(density_list, wcet_ranges)
+	cells = []
+	for filename in logs:
+		column = log_column(filename, partition, partition_id)
+		if filename.endswith('.xml'):
+			#fail before the first row when the partition is not in the plan
+			loaded_log(filename, column, engine, cache, horizon)
+		elif engine == 'numpy' and cache:
+			#parse each log once, the workers memory-map its cached columns
+			load_log(filename, [column], cache)
+		for (wcet_min, wcet_max) in wcet_ranges:
+			for density in density_list:
+				cells.append((filename, column, wcet_min, wcet_max, density, task_num, cell_seed(seed, filename, column, wcet_min, wcet_max, density), engine, cache, horizon))
+	writer = csv.DictWriter(output, fieldnames=SWEEP_FIELDS)
+	writer.writeheader()
+	output.flush()
+	rows = []
+	if workers > 1:
+		pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+		results = pool.map(run_cell, *zip(*cells))
+	else:
+		pool = None
+		results = (run_cell(*cell) for cell in cells)
+	try:
+		for row in results:
+			writer.writerow(row)
+			output.flush()
+			rows.append(row)
+			print(row['log']+' wcet '+str(row['wcet_min'])+'-'+str(row['wcet_max'])+' density '+str(row['density'])+' tested.', file=sys.stderr)
+	finally:
+		if pool is not None:
+			pool.shutdown(cancel_futures=True)
+	return rows
+
+def grid(text):
+	'''
+	This function parses a density grid, start:end:step (end included) or a comma separated list.
+	'''
+	try:
+		if ':' in text:
+			(start_den, end_den, step_den) = [float(value) for value in text.split(':')]
+			if step_den <= 0:
+				raise ValueError(text)
+			return densities(start_den, end_den, step_den)
+		return [float(value) for value in text.split(',')]
+	except ValueError:
+		raise argparse.ArgumentTypeError('invalid density grid '+text+', expected start:end:step or a comma separated list')
+
+def wcet_range(text):
+	'''
+	This function parses a WCET range min:max in ms.
+	'''
+	try:
+		(wcet_min, wcet_max) = [int(value) for value in text.split(':')]
+	except ValueError:
+		raise argparse.ArgumentTypeError('invalid WCET range '+text+', expected min:max in ms')
+	return (wcet_min, wcet_max)
+
+def slice_lens(text):
+	'''
+	This function parses a comma separated list of time slice lengths in ms.
+	'''
+	try:
+		return [int(value) for value in text.split(',')]
+	except ValueError:
+		raise argparse.ArgumentTypeError('invalid time slice lengths '+text+', expected a comma separated list of ms')
+
+def factor_list(text):
+	'''
+	This function parses a comma separated list of factors, 3, 4, 5, 7 or auto (RRP's own choice, given as None).
+	'''
+	result = []
+	for value in text.split(','):
+		if value == 'auto':
+			result.append(None)
+		elif value in ('3', '4', '5', '7'):
+			result.append(int(value))
+		else:
+			raise argparse.ArgumentTypeError('invalid factor '+value+', expected 3, 4, 5, 7 or auto')
+	return result
+
+def rank(partitions_file, partition_id, time_slice_lens, factors, density_list, wcet_ranges, output, task_num, seed=None, CPU_num=None):
+	'''
+	This function ranks the candidates for the first partition set of partitions_file (WCET and period in ms, see RRP.load_partition_sets)
+	and writes the table to output, a csv writer's file. CPU_num defaults to the cpu_num of the set, or 1.
+	'''
+	partition_set = next(require_rrp().RRP(verbose=False).load_partition_sets(partitions_file), None)
+	if partition_set is None:
+		raise ValueError('No partition set in '+partitions_file+'.')
+	if CPU_num is None:
+		CPU_num = partition_set.get('cpu_num', 1)
+	rows = rank_candidates(partition_set['partitions'], partition_id, time_slice_lens, factors, density_list, wcet_ranges, task_num, seed, CPU_num)
+	writer = csv.DictWriter(output, fieldnames=RANK_FIELDS)
+	writer.writeheader()
+	writer.writerows(rows)
+	return rows
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Simulate random tasks on the supply recorded in logs, over a grid of densities and WCET ranges.')
+	parser.add_argument('logs', nargs='*', help='The log files. Files ending in .xml are plans (RRPOutput.xml or an XtratuM configuration), the supply of --partition-id is synthesized from them.')
+	parser.add_argument('--densities', type=grid, required=True, help='The densities, start:end:step (end included) or a comma separated list.')
+	parser.add_argument('--wcet', type=wcet_range, action='append', required=True, help='A WCET range min:max in ms, may be repeated.')
+	parser.add_argument('--output', help='The results table, one row per (log, WCET range, density) or per candidate with --rank, - for the standard output (default sweep.csv, rank.csv with --rank).')
+	parser.add_argument('--partition', choices=['auto', 'p1', 'p2'], default='auto', help='The counter simulated. auto takes the second partition for logs named naive and the first one otherwise (default auto).')
+	parser.add_argument('--engine', choices=['numpy', 'legacy'], default='numpy', help='numpy draws and runs the tasks of a density in one batch, legacy one at a time (default numpy).')
+	parser.add_argument('--tasks', type=int, help='Tasks per cell (default 100000 with numpy, '+str(REPEAT_TIMES)+' with legacy).')
+	parser.add_argument('--seed', type=int, help='Seed of the sweep, every cell derives its own from it.')
+	parser.add_argument('--workers', type=int, default=1, help='Number of processes running the cells (default 1, serial).')
+	parser.add_argument('--no-cache', action='store_true', help='Parse the logs even when their columns were cached next to them (<log>.col<n>.npy), and do not cache them.')
+	parser.add_argument('--partition-id', type=int, help='The partition simulated in the xml plans and with --rank.')
+	parser.add_argument('--rank', metavar='PARTITIONS', help='Instead of simulating logs, schedule the first partition set of this file (WCET and period in ms) with every time slice length and factor, and rank them by the ratio of tasks of --partition-id accomplished in time.')
+	parser.add_argument('--time-slice-lens', type=slice_lens, default=[10, 30, 100], help='Candidate time slice lengths in ms for --rank, comma separated (default 10,30,100).')
+	parser.add_argument('--factors', type=factor_list, default=[None], help='Candidate factors for --rank, comma separated among 3, 4, 5, 7 and auto (Magic7 or MulZ, the default). Factors only apply to one CPU.')
+	parser.add_argument('--cpus', type=int, help='Number of CPUs for --rank (default the cpu_num of the set, or 1).')
+	args = parser.parse_args(argv)
+	if args.rank is None and not args.logs:
+		parser.error('give log files or --rank')
+	if args.rank is not None and args.partition_id is None:
+		parser.error('--rank needs --partition-id')
+	task_num = args.tasks or (100000 if args.engine == 'numpy' else REPEAT_TIMES)
+	output = args.output or ('sweep.csv' if args.rank is None else 'rank.csv')
+	try:
+		with (open(output, 'w', newline='') if output != '-' else contextlib.nullcontext(sys.stdout)) as f:
+			if args.rank is None:
+				sweep(args.logs, args.densities, args.wcet, f, task_num, args.seed, args.workers, args.engine, args.partition, not args.no_cache, args.partition_id)
+			else:
+				rank(args.rank, args.partition_id, args.time_slice_lens, args.factors, args.densities, args.wcet, f, task_num, args.seed, args.cpus)
+	except (ImportError, OSError, ValueError) as e:
+		sys.stderr.write(str(e)+'\n')
+		return 2
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
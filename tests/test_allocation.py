@@ -0,0 +1,160 @@
+import copy
+import time
+import random
+
+import pytest
+from fractions import Fraction
+
+from RRP import RRP, Partition, RestTree, ALLOCATION_STRATEGIES
+
+
+def random_partitions(rng, count):
+    par_list = []
+    for i in range(count):
+        period = rng.choice([50, 97, 100, 128])
+        par_list.append(Partition(rng.randint(1, min(60, period)), period, i))
+    return par_list
+
+
+def pack(strategy, par_list, CPU_num, alloc_budget=1.0):
+    '''
+    This function packs copies of the partitions, in MulZ order, on CPU_num pcpus.
+    Returns:
+        A tuple of the partitions, the assignment, the partition that failed, the factors and the rests.
+    '''
+    rrp = RRP(verbose=False, alloc_strategy=strategy, alloc_budget=alloc_budget)
+    par_list = sorted([copy.copy(par) for par in par_list], key=lambda x: x.aaf, reverse=True)
+    (factors, rests) = ([0]*CPU_num, [1]*CPU_num)
+    (assignment, failed) = rrp.allocator(factors, rests).allocate(par_list)
+    return (par_list, assignment, failed, factors, rests)
+
+
+def open_ended(strategy, par_list):
+    '''
+    This function places the partitions one by one, adding a pcpu whenever one fits nowhere, like RRP.min_cpu.
+    '''
+    rrp = RRP(verbose=False, alloc_strategy=strategy)
+    allocator = rrp.allocator([], [])
+    assignment = []
+    for par in sorted([copy.copy(par) for par in par_list], key=lambda x: x.aaf, reverse=True):
+        i = allocator.place(par)
+        if i is None:
+            allocator.add_pcpu()
+            i = allocator.place(par)
+        assignment.append(i)
+    return assignment
+
+
+def test_rest_tree_matches_linear_scan():
+    rng = random.Random(18)
+    tree = RestTree(1)
+    rests = []
+    for step in range(2000):
+        i = rng.randint(0, min(len(rests), 200))
+        if i == len(rests):
+            rests.append(-1)
+        rests[i] = rng.choice([-1, 0, rng.random()])
+        tree.set(i, rests[i])
+        need = rng.random()
+        expected = [j for j in range(len(rests)) if rests[j] >= need]
+        assert tree.leftmost(need) == (expected[0] if expected else None)
+    assert tree.size >= len(rests)
+
+
+@pytest.mark.parametrize('strategy', sorted(ALLOCATION_STRATEGIES))
+def test_packing_is_consistent(strategy):
+    rng = random.Random(1)
+    for trial in range(100):
+        originals = random_partitions(rng, rng.randint(1, 12))
+        (par_list, assignment, failed, factors, rests) = pack(strategy, originals, rng.randint(1, 4))
+        if failed is not None:
+            continue
+        for i in range(len(factors)):
+            placed = [par_list[k] for k in range(len(par_list)) if assignment[k] == i]
+            assert (factors[i] == 0) == (not placed)
+            for par in placed:
+                #the period is the factor of the pcpu times a power of two, or 1 for a partition taking the whole pcpu
+                ratio = par.period // factors[i]
+                assert par.period == 1 or (par.period == ratio*factors[i] and ratio & (ratio - 1) == 0)
+                assert par.aaf == Fraction(par.wcet, par.period)
+            assert rests[i] == 1 - sum(par.aaf for par in placed) and rests[i] >= 0
+        for (par, original) in zip(par_list, sorted(originals, key=lambda x: x.aaf, reverse=True)):
+            assert par.aaf >= original.aaf
+
+
+def best_fit_reference(rrp, par_list):
+    (factors, rests, assignment) = ([], [], [])
+    for par in par_list:
+        fits = []
+        for i in range(len(factors)):
+            approx = rrp.z_approx(par.aaf, factors[i])
+            if rests[i] >= approx[0]:
+                fits.append((rests[i] - approx[0], i, factors[i], approx))
+        if fits:
+            (left, i, f, approx) = min(fits)
+            rests[i] -= approx[0]
+        else:
+            (f, approx) = min(((f, rrp.z_approx(par.aaf, f)) for f in [3, 4, 5, 7]), key=lambda option: option[1][0])
+            factors.append(f)
+            rests.append(1 - approx[0])
+            i = len(factors) - 1
+        assignment.append(i)
+    return assignment
+
+
+def factor_grouped_reference(rrp, par_list):
+    (factors, rests, assignment) = ([], [], [])
+    for par in par_list:
+        (own, own_approx) = min(((f, rrp.z_approx(par.aaf, f)) for f in [3, 4, 5, 7]), key=lambda option: option[1][0])
+        fits = [i for i in range(len(factors)) if factors[i] == own and rests[i] >= own_approx[0]]
+        if fits:
+            (i, approx) = (fits[0], own_approx)
+        else:
+            fits = [i for i in range(len(factors)) if factors[i] != own and rests[i] >= rrp.z_approx(par.aaf, factors[i])[0]]
+            if fits:
+                (i, approx) = (fits[0], rrp.z_approx(par.aaf, factors[fits[0]]))
+            else:
+                factors.append(own)
+                rests.append(1)
+                (i, approx) = (len(factors) - 1, own_approx)
+        rests[i] -= approx[0]
+        assignment.append(i)
+    return assignment
+
+
+@pytest.mark.parametrize(('strategy', 'reference'), [('best-fit', best_fit_reference), ('factor-grouped', factor_grouped_reference)])
+def test_indexed_strategies_match_linear_scan(strategy, reference):
+    rng = random.Random(2)
+    rrp = RRP(verbose=False)
+    for trial in range(100):
+        par_list = random_partitions(rng, rng.randint(1, 40))
+        expected = reference(rrp, sorted([copy.copy(par) for par in par_list], key=lambda x: x.aaf, reverse=True))
+        assert open_ended(strategy, par_list) == expected
+
+
+def test_branch_and_bound_not_worse_than_best_fit():
+    rng = random.Random(5)
+    for trial in range(150):
+        par_list = random_partitions(rng, rng.randint(3, 10))
+        CPU_num = rng.randint(2, 4)
+        best_fit = pack('best-fit', par_list, CPU_num)
+        searched = pack('branch-and-bound', par_list, CPU_num)
+        if best_fit[2] is None:
+            #the first packing tried is the best-fit one
+            assert searched[2] is None and searched[1] == best_fit[1]
+    #best-fit leaves 43 and 42 apart and cannot place 38, the search backtracks
+    par_list = [Partition(wcet, 100, i) for (i, wcet) in enumerate([43, 42, 38, 25, 14, 14])]
+    assert pack('best-fit', par_list, 2)[2] is not None
+    assert pack('branch-and-bound', par_list, 2)[2] is None
+
+
+def test_branch_and_bound_budget():
+    #17 partitions that take 2/5 each, two fit per pcpu: the search has to try every packing
+    originals = [Partition(34, 100, i) for i in range(17)] + [Partition(3, 100, 100 + i) for i in range(8)]
+    start = time.perf_counter()
+    (par_list, assignment, failed, factors, rests) = pack('branch-and-bound', originals, 8, alloc_budget=0.1)
+    assert time.perf_counter() - start < 0.5
+    assert failed is not None
+    #the lists are left as they were
+    assert (factors, rests) == ([0]*8, [1]*8)
+    assert RRP(verbose=False, alloc_strategy='branch-and-bound', alloc_budget=0.1).generate_schedule(originals, 8) is None
@@ -0,0 +1,64 @@
+import os
+import json
+
+import pytest
+
+import RRP
+
+
+def run(argv, capsys):
+    status = RRP.main(argv + ['--no-pattern-index'])
+    (out, err) = capsys.readouterr()
+    return (status, [json.loads(line) for line in out.splitlines()], err)
+
+
+def write(path, lines):
+    path.write_text('\n'.join(lines)+'\n')
+    return str(path)
+
+
+def test_jsonl_batch(tmp_path, capsys):
+    file_name = write(tmp_path / 'sets.jsonl', [
+        json.dumps({'name': 'a', 'partitions': [{'id': 1, 'wcet': 1, 'period': 4}, {'id': 2, 'wcet': 1, 'period': 3}]}),
+        json.dumps({'name': 'b', 'cpu_num': 2, 'partitions': [{'id': 1, 'wcet': 3, 'period': 4}, {'id': 2, 'wcet': 2, 'period': 3}]}),
+    ])
+    dump_file = str(tmp_path / 'dump.txt')
+    (status, results, err) = run([file_name, '--validate', '--output-dir', str(tmp_path / 'xml'), '--dump-file', dump_file], capsys)
+    assert status == 0
+    assert [(result['name'], result['cpu_num'], result['schedulable'], result['valid']) for result in results] == [('a', 1, True, True), ('b', 2, True, True)]
+    assert sorted(os.listdir(str(tmp_path / 'xml'))) == ['a.xml', 'b.xml']
+    with open(dump_file) as f:
+        assert [line for line in f if line.startswith('==')] == ['== a ==\n', '== b ==\n']
+
+
+def test_csv_batch(tmp_path, capsys):
+    file_name = write(tmp_path / 'sets.csv', ['set,id,wcet,period', 'x,1,1,7', 'x,2,2,7', 'y,1,8,7'])
+    (status, results, err) = run([file_name], capsys)
+    #y asks for more than its period
+    assert status == 2
+    assert [result['name'] for result in results] == ['x']
+    assert 'Partition set 1 (y)' in err
+
+
+def test_unschedulable(tmp_path, capsys):
+    file_name = write(tmp_path / 'sets.jsonl', [json.dumps({'partitions': [{'id': 1, 'wcet': 6, 'period': 7}, {'id': 2, 'wcet': 2, 'period': 7}]})])
+    (status, results, err) = run([file_name], capsys)
+    assert status == 1
+    assert [(result['name'], result['schedulable']) for result in results] == [('sets-0', False)]
+
+
+@pytest.mark.parametrize(('partition_set', 'message'), [
+    ({'name': 'a'}, 'Partition set 1 (a) misses the list "partitions"'),
+    ({'partitions': [{'id': 1, 'wcet': 1, 'period': 0}]}, 'Partition set 1 (sets-1): partition 1 has a period of 0'),
+    ({'partitions': [{'id': 1, 'wcet': 1}]}, "Partition set 1 (sets-1): partition 0 misses the field 'period'"),
+    ({'partitions': [{'id': 1, 'wcet': -1, 'period': 5}]}, 'partition 1 has a wcet of -1'),
+    ({'partitions': [{'id': 1, 'wcet': 'x', 'period': 5}]}, 'partition 0 has an invalid id, wcet or period'),
+    ({'cpu_num': 0, 'partitions': []}, 'Partition set 1 (sets-1): cpu_num must be positive'),
+    ('set', 'Partition set 1 is not an object'),
+])
+def test_invalid_set(tmp_path, capsys, partition_set, message):
+    file_name = write(tmp_path / 'sets.jsonl', [json.dumps({'partitions': [{'id': 1, 'wcet': 1, 'period': 2}]}), json.dumps(partition_set)])
+    (status, results, err) = run([file_name], capsys)
+    assert status == 2
+    assert len(results) == 1
+    assert message in err
@@ -0,0 +1,49 @@
+import random
+
+from RRP import RRP
+
+
+def random_cases(seed, count):
+    '''
+    This function draws (avail_set, p, q, q_left) cases of the delta search, the full and empty availability of every period first.
+    '''
+    rng = random.Random(seed)
+    for p in range(1, 17):
+        for q in range(1, p + 1):
+            yield (set(range(p)), p, q, p - q)
+            yield (set(range(p)), p, q, 0)
+            yield (set(), p, q, 0)
+    for i in range(count):
+        p = rng.randint(2, 64)
+        avail_set = set(t for t in range(p) if rng.random() < rng.choice([0.5, 0.8, 0.95]))
+        q = rng.randint(1, max(len(avail_set), 1))
+        q_left = rng.randint(0, max(len(avail_set) - q, 0))
+        yield (avail_set, p, q, q_left)
+
+
+def test_find_delta_mask_matches_reference():
+    rrp = RRP(verbose=False)
+    for (avail_set, p, q, q_left) in random_cases(2024, 3000):
+        expected = rrp.find_delta_reference(avail_set, p, q, q_left)
+        assert rrp.find_delta_mask(rrp.avail_mask(avail_set, p), p, q, q_left) == expected, (sorted(avail_set), p, q, q_left)
+        assert rrp.find_delta(avail_set, p, q, q_left) == expected
+
+
+def test_find_delta_mask_full_and_empty():
+    rrp = RRP(verbose=False)
+    assert rrp.find_delta_mask((1 << 12) - 1, 12, 5, 7) == 0
+    assert rrp.find_delta_mask(0, 12, 5, 0) == -1
+    assert rrp.find_delta_reference(set(), 12, 5, 0) == -1
+
+
+def test_find_delta_mask_counters():
+    rrp = RRP(verbose=False, instrument=True)
+    #no shift of standard_p1 fits: one check
+    assert rrp.find_delta_mask(0, 12, 5, 0) == -1
+    assert rrp.stats.counters == {'find_delta_calls': 1, 'check_delta_calls': 1}
+    #delta1 0 fits with its standard_p2: one check for each
+    assert rrp.find_delta_mask((1 << 12) - 1, 12, 5, 7) == 0
+    assert rrp.stats.counters == {'find_delta_calls': 2, 'check_delta_calls': 3, 'deltas_tried': 1}
+    #the three shifts of delta1 fit, none of them leaves room for standard_p2
+    assert rrp.find_delta_mask(0b1110, 4, 1, 3) == -1
+    assert rrp.stats.counters == {'find_delta_calls': 3, 'check_delta_calls': 7, 'deltas_tried': 4}
@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+from RRP import RRP, Partition
+
+
+def runs(schedules):
+    return [[(entry.start_time, entry.end_time, entry.partition_id) for entry in schedule] for schedule in schedules]
+
+
+def random_sets(seed, count, CPU_num):
+    '''
+    This function draws schedulable partition sets on CPU_num CPUs, with a spare partition that is not in the set.
+    '''
+    rng = random.Random(seed)
+    found = 0
+    while found < count:
+        par_list = []
+        for partition_id in range(rng.randint(2, 4*CPU_num)):
+            period = rng.choice([7, 10, 14, 20, 28, 40, 56])
+            par_list.append(Partition(rng.randint(1, max(period//4, 1)), period, partition_id))
+        spare = Partition(1, rng.choice([14, 28, 56]), len(par_list))
+        if RRP(verbose=False).generate_schedule(par_list, CPU_num) is not None:
+            found += 1
+            yield (par_list, spare)
+
+
+@pytest.mark.parametrize('CPU_num', [1, 2, 4])
+def test_add_remove_round_trip(CPU_num):
+    for (par_list, spare) in random_sets(CPU_num, 30, CPU_num):
+        rrp = RRP(verbose=False)
+        before = runs(rrp.generate_schedule(par_list, CPU_num))
+        if not rrp.add_partition(spare):
+            continue
+        assert rrp.validate()[0]
+        assert sorted(rrp.originals) == sorted(par.partition_id for par in par_list + [spare])
+        #the partitions added in place can be rebuilt from scratch
+        rebuilt = RRP(verbose=False).generate_schedule(list(rrp.originals.values()), CPU_num)
+        if rebuilt is not None:
+            assert RRP(verbose=False).validate(rebuilt, list(rrp.originals.values()))[0]
+        assert rrp.remove_partition(spare.partition_id)
+        assert runs(rrp.schedules) == before
+        assert runs(rrp.rebuild()) == runs(RRP(verbose=False).generate_schedule(par_list, CPU_num))
+
+
+@pytest.mark.parametrize('CPU_num', [1, 2, 4])
+def test_update_round_trip(CPU_num):
+    for (par_list, spare) in random_sets(10 + CPU_num, 30, CPU_num):
+        rrp = RRP(verbose=False)
+        rrp.generate_schedule(par_list, CPU_num)
+        par = par_list[0]
+        if not rrp.update_partition(par.partition_id, 1, 56):
+            continue
+        assert rrp.validate()[0]
+        assert (rrp.originals[par.partition_id].wcet, rrp.originals[par.partition_id].period) == (1, 56)
+        state = runs(rrp.schedules)
+        if not rrp.update_partition(par.partition_id, par.wcet, par.period):
+            assert runs(rrp.schedules) == state
+            continue
+        assert rrp.validate()[0]
+        assert rrp.validate(rrp.rebuild())[0]
+
+
+@pytest.mark.parametrize('CPU_num', [1, 3])
+def test_failed_schedule_keeps_state(CPU_num):
+    rrp = RRP(verbose=False)
+    par_list = [Partition(1, 7, i) for i in range(3)]
+    schedules = runs(rrp.generate_schedule(par_list, CPU_num))
+    state = ([[par.partition_id for par in partitions] for partitions in rrp.pcpu_partitions_dict], list(rrp.pcpu_factors), list(rrp.pcpu_rests))
+    #the allocation fails
+    assert rrp.generate_schedule([Partition(6, 7, i) for i in range(2*CPU_num)], CPU_num) is None
+    #the allocation passes but the delta search fails
+    rrp.partition_single = lambda partition_list: None
+    assert rrp.generate_schedule([Partition(1, 14, i) for i in range(2*CPU_num)], CPU_num) is None
+    del rrp.partition_single
+    assert runs(rrp.schedules) == schedules
+    assert ([[par.partition_id for par in partitions] for partitions in rrp.pcpu_partitions_dict], rrp.pcpu_factors, rrp.pcpu_rests) == state
+    assert sorted(rrp.originals) == [0, 1, 2]
+
+
+def test_updates_need_a_schedule():
+    rrp = RRP(verbose=False)
+    with pytest.raises(ValueError):
+        rrp.add_partition(Partition(1, 7, 0))
+    with pytest.raises(ValueError):
+        rrp.remove_partition(0)
+    with pytest.raises(ValueError):
+        rrp.update_partition(0, 1, 7)
+    with pytest.raises(ValueError):
+        rrp.rebuild()
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+import RRP
+from RRP import PatternIndex, regular_pattern
+
+
+def expected(p, q):
+    offsets = [k*p//q for k in range(q)]
+    return (offsets, sum(1 << t for t in offsets))
+
+
+def test_save_and_load(tmp_path):
+    file_name = str(tmp_path / 'patterns.bin')
+    index = PatternIndex(file_name)
+    for (p, q) in [(7, 3), (56, 55), (1000, 333)]:
+        index.get(p, q)
+    assert index.save()
+    assert os.listdir(tmp_path) == ['patterns.bin']
+    loaded = PatternIndex(file_name)
+    loaded.load()
+    for (p, q) in [(7, 3), (56, 55), (1000, 333), (3, 2)]:
+        (offsets, mask) = loaded.patterns[(p, q)]
+        assert (list(offsets), mask) == expected(p, q)
+    assert not loaded.dirty
+
+
+@pytest.mark.parametrize('damage', [lambda data: data[:-1], lambda data: data[:-1] + bytes([data[-1] ^ 1]), lambda data: b'RRP-PATTERNS 0' + data[14:], lambda data: b'\x80\x04junk'])
+def test_damaged_file_is_recomputed(tmp_path, damage):
+    file_name = str(tmp_path / 'patterns.bin')
+    index = PatternIndex(file_name)
+    index.get(1000, 333)
+    index.save()
+    with open(file_name, 'rb') as f:
+        data = f.read()
+    with open(file_name, 'wb') as f:
+        f.write(damage(data))
+    loaded = PatternIndex(file_name)
+    assert list(loaded.get(1000, 333)[0]) == expected(1000, 333)[0]
+    #the precomputed index replaces it
+    assert (7, 3) in loaded.patterns
+
+
+def test_failed_save_leaves_no_temporary_file(tmp_path, monkeypatch):
+    index = PatternIndex(str(tmp_path / 'patterns.bin'))
+    index.get(7, 3)
+    def fail(source, destination):
+        raise OSError('disk full')
+    monkeypatch.setattr(RRP.os, 'replace', fail)
+    with pytest.raises(OSError):
+        index.save()
+    assert os.listdir(tmp_path) == []
+
+
+def test_patterns_beyond_the_bound_are_cached():
+    index = PatternIndex(max_slots=10)
+    pattern = index.get(1000, 333)
+    assert (1000, 333) not in index.patterns
+    assert index.get(1000, 333) is pattern is regular_pattern(1000, 333)
@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from RRP import RRP, Partition, ALLOCATION_STRATEGIES
+
+
+def boundary_sets(seed, count):
+    '''
+    This function draws partition sets whose approximated factors add up to about 1 per CPU, half of them with a partition close to 1.
+    '''
+    rng = random.Random(seed)
+    for i in range(count):
+        par_list = []
+        if rng.random() < 0.5:
+            period = 7*2**rng.randint(0, 14)
+            par_list.append(Partition(period - rng.randint(1, 3), period, 1))
+        while len(par_list) < rng.randint(1, 6):
+            period = rng.choice([7, 14, 28, 56, 112, 57344, 114688, rng.randint(2, 500)])
+            par_list.append(Partition(rng.randint(1, period), period, len(par_list) + 1))
+        yield par_list
+
+
+@pytest.mark.parametrize('folded', [False, True])
+def test_check_schedulable_exact_total(folded):
+    #the factors add up to 1 + 1/114688
+    par_list = [Partition(114687, 114688, 1), Partition(1, 57344, 2)]
+    assert RRP(verbose=False, folded=folded).generate_schedule(par_list, 1) is None
+    assert RRP(verbose=False, folded=folded).check_schedulable(par_list, 1) == (False, 2)
+
+
+@pytest.mark.parametrize('CPU_num', [1, 2, 3])
+@pytest.mark.parametrize('folded', [False, True])
+def test_check_schedulable_agrees_with_generate_schedule(CPU_num, folded):
+    for par_list in boundary_sets(CPU_num, 40):
+        schedules = RRP(verbose=False, folded=folded).generate_schedule(par_list, CPU_num)
+        assert RRP(verbose=False, folded=folded).check_schedulable(par_list, CPU_num)[0] == (schedules is not None)
+
+
+def test_min_cpu_exact_total():
+    par_list = [Partition(114687, 114688, 1), Partition(1, 57344, 2)]
+    assert RRP(verbose=False).min_cpu(par_list) == 2
+    assert RRP(verbose=False).generate_schedule(par_list, 2) is not None
+
+
+@pytest.mark.parametrize('strategy', sorted(ALLOCATION_STRATEGIES))
+def test_min_cpu_is_the_smallest_schedulable_count(strategy):
+    rng = random.Random(8)
+    checked = 0
+    for par_list in boundary_sets(8, 30):
+        par_list += [Partition(rng.randint(1, 40), rng.choice([7, 14, 56, 100]), 10 + i) for i in range(rng.randint(0, 8))]
+        CPU_num = RRP(verbose=False, alloc_strategy=strategy).min_cpu(par_list)
+        if CPU_num is None:
+            continue
+        checked += CPU_num > 1
+        assert RRP(verbose=False, alloc_strategy=strategy).generate_schedule(par_list, CPU_num) is not None
+        if CPU_num > 1:
+            assert RRP(verbose=False, alloc_strategy=strategy).generate_schedule(par_list, CPU_num - 1) is None
+    assert checked
@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+from RRP import RRP, Partition, Schedule, LaunchTable, FoldedSchedule
+
+
+def runs(schedule):
+    return [(entry.start_time, entry.end_time, entry.partition_id) for entry in schedule]
+
+
+def test_add_merges_adjacent_runs():
+    schedule = Schedule(10)
+    schedule.add(0, 2, 1)
+    schedule.add(4, 6, 1)
+    schedule.add(2, 4, 1)
+    schedule.add(6, 7, 2)
+    schedule.add(8, 8, 3)
+    assert runs(schedule) == [(0, 6, 1), (6, 7, 2)]
+    assert schedule.starts == [0, 6]
+    assert (len(schedule), schedule.slot_count()) == (10, 2)
+    assert [schedule.lookup(t) for t in range(10)] == [1]*6 + [2] + [-1]*3
+    assert list(schedule.slices()) == [1]*6 + [2] + [-1]*3
+    for (start_time, end_time) in [(5, 7), (-1, 0), (9, 11)]:
+        with pytest.raises(ValueError):
+            schedule.add(start_time, end_time, 3)
+
+
+def test_from_runs():
+    schedule = Schedule.from_runs(10, [(6, 7, 2), (2, 4, 1), (0, 2, 1), (4, 6, 1), (8, 8, 3), (9, 10, 2)])
+    assert runs(schedule) == [(0, 6, 1), (6, 7, 2), (9, 10, 2)]
+    assert runs(schedule.merge(Schedule.from_runs(10, [(7, 9, 2)]))) == [(0, 6, 1), (6, 10, 2)]
+    with pytest.raises(ValueError):
+        Schedule.from_runs(10, [(0, 3, 1), (2, 4, 2)])
+    with pytest.raises(ValueError):
+        Schedule.from_runs(10, [(8, 11, 1)])
+
+
+def test_launch_table_occupancy():
+    table = LaunchTable(12)
+    assert (table.free_count(), table.first_free, table.period_mask(4)) == (12, 0, 0b1111)
+    assert table.occupy(1, 4, [0, 1]) == -1
+    assert (table.free_count(), table.first_free, table.period_mask(4)) == (6, 2, 0b1100)
+    #time slice 1 belongs to partition 1, nothing changes
+    assert table.occupy(2, 3, [1]) == 1
+    assert (table.free_count(), table.first_free) == (6, 2)
+    assert table.occupy(2, 4, [2]) == -1
+    assert table.occupy(3, 12, [3, 7]) == -1
+    assert (len(table), table.free_count(), table.first_free, table.period_mask(12)) == (12, 1, 11, 1 << 11)
+    assert list(table) == [1, 1, 2, 3, 1, 1, 2, 3, 1, 1, 2, -1]
+    assert (table[-1], table[4]) == (-1, 1)
+    assert runs(table.to_schedule()) == [(0, 2, 1), (2, 3, 2), (3, 4, 3), (4, 6, 1), (6, 7, 2), (7, 8, 3), (8, 10, 1), (10, 11, 2)]
+    assert table.occupy(4, 12, [11]) == -1
+    assert table.first_free == -1
+
+
+@pytest.mark.parametrize('folded', [False, True])
+def test_runs_match_time_slices(folded):
+    rng = random.Random(4)
+    for trial in range(100):
+        par_list = []
+        for partition_id in range(rng.randint(1, 8)):
+            period = rng.choice([7, 14, 28, 56, 112])
+            par_list.append(Partition(rng.randint(1, period//3), period, partition_id))
+        rrp = RRP(verbose=False, folded=folded)
+        for par in par_list:
+            rrp.magic7(par)
+        launch_table = rrp.partition_single(par_list)
+        if launch_table is None:
+            continue
+        assert isinstance(launch_table, FoldedSchedule)
+        schedule = launch_table.to_schedule()
+        #the runs are the ones of the expanded time slices
+        assert runs(schedule) == runs(Schedule.from_slices(list(launch_table)))
+        assert list(schedule.slices()) == list(launch_table)
+        assert len(schedule) == len(launch_table)
@@ -0,0 +1,102 @@
+import json
+import os
+import time
+from fractions import Fraction
+
+import RRP
+from RRP import Partition, ScheduleCache
+
+
+def partitions():
+    return [Partition(3, 7, 1), Partition(1, 10, 2), Partition(2, 14, 3), Partition(1, 28, 4)]
+
+
+def cache_counters(rrp):
+    return dict((name, n) for (name, n) in rrp.stats.counters.items() if 'cache' in name)
+
+
+def runs(schedules):
+    return [[(entry.start_time, entry.end_time, entry.partition_id) for entry in schedule] for schedule in schedules]
+
+
+def test_hit_and_miss(tmp_path):
+    cache = ScheduleCache(str(tmp_path))
+    for CPU_num in [1, 2]:
+        expected = RRP.RRP(verbose=False).generate_schedule(partitions(), CPU_num)
+        missed = RRP.RRP(verbose=False, instrument=True, schedule_cache=cache)
+        (schedules, processors) = missed.cached_schedule(partitions(), CPU_num, 100, 400)
+        assert cache_counters(missed) == {'cache_misses': 1, 'xml_cache_misses': 1}
+        hit = RRP.RRP(verbose=False, instrument=True, schedule_cache=cache)
+        (cached, cached_processors) = hit.cached_schedule(partitions(), CPU_num, 100, 400)
+        assert cache_counters(hit) == {'cache_hits': 1, 'xml_cache_hits': 1}
+        assert runs(cached) == runs(schedules) == runs(expected)
+        assert [RRP.ET.tostring(node) for node in cached_processors] == [RRP.ET.tostring(node) for node in processors]
+        #the allocation state is restored for the incremental updates
+        assert (hit.pcpu_factors, hit.pcpu_rests) == (missed.pcpu_factors, missed.pcpu_rests)
+        assert hit.add_partition(Partition(1, 56, 5)) == missed.add_partition(Partition(1, 56, 5))
+        assert runs(hit.schedules) == runs(missed.schedules)
+    #plain JSON files only
+    for name in os.listdir(tmp_path):
+        assert name.endswith('.json')
+        with open(os.path.join(tmp_path, name)) as f:
+            json.load(f)
+
+
+def test_unschedulable_and_damaged_entries(tmp_path):
+    cache = ScheduleCache(str(tmp_path))
+    rrp = RRP.RRP(verbose=False, instrument=True, schedule_cache=cache)
+    par_list = [Partition(6, 7, i) for i in range(3)]
+    assert rrp.cached_schedule(par_list, 2) == (None, None)
+    assert rrp.cached_schedule(par_list, 2) == (None, None)
+    assert cache_counters(rrp) == {'cache_misses': 1, 'cache_hits': 1}
+    key = rrp.cache_key(partitions(), 1)
+    with open(cache.path(key), 'w') as f:
+        f.write('{"schedules": [{"runs": 3}]}')
+    assert runs(rrp.cached_schedule(partitions(), 1)[0]) == runs(RRP.RRP(verbose=False).generate_schedule(partitions(), 1))
+    assert rrp.stats.counters['cache_misses'] == 2
+
+
+def test_key_canonicalization():
+    rrp = RRP.RRP(verbose=False)
+    key = rrp.cache_key([Partition(3, 10, 1)], 2)
+    assert rrp.cache_key([Partition(3.0, Fraction(10), 1)], 2) == key
+    assert RRP.RRP(verbose=False, folded=True).cache_key([Partition(3, 10, 1)], 2) == key
+    assert rrp.cache_key([Partition(3, 10, 1)], 3) != key
+    assert rrp.cache_key([Partition(3, 11, 1)], 2) != key
+    assert RRP.RRP(verbose=False, alloc_strategy='best-fit').cache_key([Partition(3, 10, 1)], 2) != key
+    assert rrp.xml_cache_key(key, 100, 400) == rrp.xml_cache_key(key, 100.0, Fraction(400))
+    assert rrp.xml_cache_key(key, 100, 400) != rrp.xml_cache_key(key, 100, 800)
+    assert rrp.xml_cache_key(key, 100, 400) != rrp.xml_cache_key(key, 50, 400)
+
+
+def test_key_uses_strategy_name():
+    key = RRP.RRP(verbose=False, alloc_strategy='first-fit').cache_key(partitions(), 2)
+    #the same strategy loaded as a script keys the same entries
+    script = type('FirstFit', (RRP.FirstFit,), {'__module__': '__main__'})
+    assert RRP.RRP(verbose=False, alloc_strategy=script).cache_key(partitions(), 2) == key
+    budgeted = RRP.RRP(verbose=False, alloc_strategy='branch-and-bound').cache_key(partitions(), 2)
+    assert RRP.RRP(verbose=False, alloc_strategy='branch-and-bound', alloc_budget=0.5).cache_key(partitions(), 2) != budgeted
+    for name in RRP.ALLOCATION_STRATEGIES:
+        if name != 'first-fit':
+            assert RRP.RRP(verbose=False, alloc_strategy=name).cache_key(partitions(), 2) != key
+
+
+def test_eviction(tmp_path):
+    cache = ScheduleCache(str(tmp_path), max_bytes=2500)
+    for i in range(6):
+        cache.put('entry'+str(i), {'data': 'x'*1000})
+        os.utime(cache.path('entry'+str(i)), ns=(i*10**9, i*10**9))
+    assert sorted(os.listdir(tmp_path)) == ['entry4.json', 'entry5.json']
+    #a hit makes an entry the most recent
+    assert cache.get('entry4') == {'data': 'x'*1000}
+    cache.put('entry6', {'data': 'x'*1000})
+    assert sorted(os.listdir(tmp_path)) == ['entry4.json', 'entry6.json']
+    #a temporary file being written counts, a stale one is removed
+    with open(os.path.join(tmp_path, 'writing.tmp'), 'w') as f:
+        f.write('x'*1000)
+    with open(os.path.join(tmp_path, 'crashed.tmp'), 'w') as f:
+        f.write('x'*100000)
+    stale = time.time() - RRP.SCHEDULE_CACHE_TEMP_AGE - 10
+    os.utime(os.path.join(tmp_path, 'crashed.tmp'), (stale, stale))
+    assert cache.evict() == 2
+    assert sorted(os.listdir(tmp_path)) == ['entry6.json', 'writing.tmp']
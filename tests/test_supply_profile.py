@@ -0,0 +1,34 @@
+import random
+
+import pytest
+
+import RRP
+from RRP import Schedule, SupplyProfile
+
+
+def random_schedule(rng):
+    hyperperiod = rng.randint(1, 2000)
+    schedule = Schedule(hyperperiod)
+    t = rng.randint(0, 3)
+    while t < hyperperiod:
+        end = min(hyperperiod, t + rng.randint(1, 4))
+        schedule.add(t, end, rng.randint(0, 2))
+        t = end + rng.randint(0, 5)
+    return schedule
+
+
+def test_numpy_matches_plain_python(monkeypatch):
+    pytest.importorskip('numpy')
+    rng = random.Random(19)
+    for trial in range(200):
+        schedule = random_schedule(rng)
+        monkeypatch.setattr(RRP, 'SUPPLY_NUMPY_RUNS', 1)
+        vectorized = SupplyProfile.of_schedule(schedule)
+        monkeypatch.setattr(RRP, 'SUPPLY_NUMPY_RUNS', float('inf'))
+        plain = SupplyProfile.of_schedule(schedule)
+        for (partition_id, profile) in plain.items():
+            assert profile.arrays is None and vectorized[partition_id].arrays is not None
+            for length in [1, 2, 7, schedule.hyperperiod, 3*schedule.hyperperiod + 1]:
+                assert vectorized[partition_id].min_window(length) == profile.min_window(length)
+            assert vectorized[partition_id].max_blackout() == profile.max_blackout()
+            assert vectorized[partition_id].regularity() == profile.regularity()
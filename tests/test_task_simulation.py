@@ -0,0 +1,182 @@
+import os
+import shutil
+import csv
+import io
+
+import pytest
+
+import TaskSimulation
+
+LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'log_files')
+LOG = os.path.join(LOG_DIR, '3_7_4_7_RRP_10ms.log')
+
+
+@pytest.fixture
+def short_log(tmp_path):
+    '''
+    The first lines of a log, which ends inside the arrival window so that part of the tasks are out of it.
+    '''
+    with open(LOG) as f:
+        lines = f.readlines()[:10]
+    path = tmp_path / 'short_RRP.log'
+    path.write_text(''.join(lines))
+    return str(path)
+
+
+@pytest.mark.parametrize('engine', ['numpy', 'legacy'])
+def test_out_of_bound_column(short_log, capsys, engine):
+    if engine == 'numpy':
+        pytest.importorskip('numpy')
+    assert TaskSimulation.main([short_log, '--densities', '0.5', '--wcet', '1:5', '--wcet', '20:40', '--engine', engine, '--tasks', '200', '--seed', '1', '--output', '-', '--no-cache']) == 0
+    (out, err) = capsys.readouterr()
+    #only the table goes to the standard output
+    rows = list(csv.DictReader(io.StringIO(out)))
+    assert [(row['wcet_min'], row['wcet_max']) for row in rows] == [('1', '5'), ('20', '40')]
+    for row in rows:
+        assert 0 < int(row['out_of_bound']) < 200
+        assert 0 <= float(row['on_time_ratio']) <= 1
+
+
+def test_execute_task_reports_on_stderr(short_log, capsys):
+    (p1_list, p2_list) = TaskSimulation.file_analysis(short_log)
+    late = TaskSimulation.task(TaskSimulation.ARRIVAL_MAX*10, 1, TaskSimulation.ARRIVAL_MAX*20)
+    assert TaskSimulation.execute_task(late, p1_list) is False
+    (out, err) = capsys.readouterr()
+    assert out == '' and 'out of bound' in err
+    assert TaskSimulation.execute_task_bounded(late, p1_list) == (False, 'Error! The task arrival time is out of bound.')
+
+
+def test_searches_match_bisect():
+    import bisect
+    import random
+    rng = random.Random(20)
+    for trial in range(500):
+        values = sorted(rng.randint(0, 30) for i in range(rng.randint(1, 12)))
+        p_list = [TaskSimulation.time_spot(value, value) for value in values]
+        value = rng.randint(-1, 31)
+        first = bisect.bisect_left(values, value)
+        if first < len(values) and values[first] == value:
+            #an equal item, any of them
+            assert values[TaskSimulation.search_time(value, p_list)] == value
+            assert values[TaskSimulation.search_counter(value, p_list)] == value
+        else:
+            expected = first if first < len(values) else -1
+            assert TaskSimulation.search_time(value, p_list) == expected
+            assert TaskSimulation.search_counter(value, p_list) == expected
+
+
+@pytest.mark.parametrize('log', sorted(name for name in os.listdir(LOG_DIR) if name.endswith('.log')))
+def test_engines_agree(log):
+    np = pytest.importorskip('numpy')
+    (p1_list, p2_list) = TaskSimulation.file_analysis(os.path.join(LOG_DIR, log))
+    rng = np.random.default_rng(20)
+    for (column, p_list) in [(TaskSimulation.P1_COLUMN, p1_list), (TaskSimulation.P2_COLUMN, p2_list)]:
+        (times, counters) = TaskSimulation.load_log(os.path.join(LOG_DIR, log), [column], cache=False)
+        for (density, wcet_min, wcet_max) in [(0.2, 1, 5), (0.6, 1, 5), (0.4, 20, 40), (0.9, 1, 60)]:
+            (arrival_times, wcets, deadlines) = TaskSimulation.generate_tasks(density, wcet_min, wcet_max, 300, rng)
+            (on_time, out_of_bound) = TaskSimulation.execute_tasks(arrival_times, wcets, deadlines, times, counters)
+            for i in range(len(arrival_times)):
+                task_now = TaskSimulation.task(arrival_times[i], wcets[i], deadlines[i])
+                (legacy_on_time, error) = TaskSimulation.execute_task_bounded(task_now, p_list)
+                assert (bool(on_time[i]), bool(out_of_bound[i])) == (legacy_on_time, error is not None)
+
+
+def test_parse_log_matches_file_analysis(tmp_path):
+    np = pytest.importorskip('numpy')
+    #CRLF and LF lines, with and without the '.' ending them, some with trailing blanks
+    lines = ['0,%d,%d,0,%d%s' % (i*7, i*11, 1000 + i*13, ['.', '', '. ', '..'][i % 4]) for i in range(200)]
+    path = tmp_path / 'mixed.log'
+    path.write_bytes(('\r\n'.join(lines[:100]) + '\r\n' + '\n'.join(lines[100:])).encode())
+    (p1_list, p2_list) = TaskSimulation.file_analysis(str(path))
+    for chunk_size in [16, 100, 1 << 20]:
+        (times, p1, p2) = TaskSimulation.parse_log(str(path), [TaskSimulation.TIME_COLUMN, TaskSimulation.P1_COLUMN, TaskSimulation.P2_COLUMN], chunk_size)
+        assert times.tolist() == [spot.time for spot in p1_list]
+        assert p1.tolist() == [spot.counter for spot in p1_list]
+        assert p2.tolist() == [spot.counter for spot in p2_list]
+    empty = tmp_path / 'empty.log'
+    empty.write_bytes(b'')
+    assert [len(values) for values in TaskSimulation.parse_log(str(empty), [1, 4])] == [0, 0]
+
+
+def test_sidecar_invalidation(tmp_path):
+    np = pytest.importorskip('numpy')
+    path = tmp_path / 'copy.log'
+    with open(LOG, 'rb') as f:
+        data = f.read()
+    path.write_bytes(data)
+    (times, counters) = TaskSimulation.load_log(str(path), [TaskSimulation.P1_COLUMN])
+    sidecar = TaskSimulation.sidecar_name(str(path), TaskSimulation.P1_COLUMN)
+    assert os.path.exists(sidecar)
+    #the second read memory-maps the sidecars
+    (cached_times, cached_counters) = TaskSimulation.load_log(str(path), [TaskSimulation.P1_COLUMN])
+    assert isinstance(cached_counters, np.memmap) and cached_counters.tolist() == counters.tolist()
+    #a log newer than its sidecars is parsed again
+    path.write_bytes(data.split(b'\n', 1)[1])
+    for column in [TaskSimulation.TIME_COLUMN, TaskSimulation.P1_COLUMN]:
+        name = TaskSimulation.sidecar_name(str(path), column)
+        os.utime(name, ns=(os.stat(str(path)).st_mtime_ns - 10**9,)*2)
+    assert TaskSimulation.load_sidecar(str(path), TaskSimulation.P1_COLUMN) is None
+    (new_times, new_counters) = TaskSimulation.load_log(str(path), [TaskSimulation.P1_COLUMN])
+    assert new_counters.tolist() == counters.tolist()[1:]
+    assert TaskSimulation.load_sidecar(str(path), TaskSimulation.P1_COLUMN).tolist() == counters.tolist()[1:]
+    #a broken sidecar is ignored, without the cache nothing is written
+    with open(sidecar, 'wb') as f:
+        f.write(b'broken')
+    assert TaskSimulation.load_sidecar(str(path), TaskSimulation.P1_COLUMN) is None
+    os.remove(sidecar)
+    TaskSimulation.load_log(str(path), [TaskSimulation.P1_COLUMN], cache=False)
+    assert not os.path.exists(sidecar)
+    assert not [name for name in os.listdir(str(tmp_path)) if name.endswith('.tmp')]
+
+
+@pytest.mark.parametrize('engine', ['numpy', 'legacy'])
+def test_sweep_pool_matches_serial(tmp_path, engine):
+    if engine == 'numpy':
+        pytest.importorskip('numpy')
+    logs = []
+    for name in ['3_7_4_7_RRP_10ms.log', '3_7_4_7_naive_30ms.log']:
+        shutil.copy(os.path.join(LOG_DIR, name), str(tmp_path / name))
+        logs.append(str(tmp_path / name))
+    densities = [0.2, 0.5, 0.8]
+    wcet_ranges = [(1, 5), (20, 40)]
+    serial = TaskSimulation.sweep(logs, densities, wcet_ranges, io.StringIO(), 300, 7, 1, engine)
+    output = io.StringIO()
+    pooled = TaskSimulation.sweep(logs, densities, wcet_ranges, output, 300, 7, 2, engine)
+    assert pooled == serial
+    assert [row['log'] for row in csv.DictReader(io.StringIO(output.getvalue()))] == [row['log'] for row in serial]
+    #a cell gets the same tasks whatever the other cells
+    subset = TaskSimulation.sweep(logs[1:], [0.5], [(20, 40)], io.StringIO(), 300, 7, 1, engine)
+    assert subset == [row for row in serial if row['log'] == logs[1] and row['density'] == 0.5 and row['wcet_min'] == 20]
+
+
+def test_supply_curve():
+    np = pytest.importorskip('numpy')
+    from RRP import Schedule
+    schedule = Schedule.from_runs(8, [(0, 1, 1), (1, 3, 2), (3, 5, 1), (7, 8, 1)])
+    (times, counters) = TaskSimulation.supply_curve(schedule, 1, 10, 200)
+    assert times[0] == 0 and times[-1] >= 200 and np.all(np.diff(times) > 0)
+    #the counter interpolated at any time is the supply of partition 1 until then
+    for t in np.arange(0, 200, 2.5):
+        supplied = sum(min(max(t - (cycle*80 + start*10), 0), (end - start)*10) for cycle in range(4) for (start, end) in [(0, 1), (3, 5), (7, 8)])
+        assert np.interp(t, times, counters) == pytest.approx(supplied*TaskSimulation.INC_PER_US)
+    with pytest.raises(ValueError):
+        TaskSimulation.supply_curve(schedule, 3, 10, 200)
+
+
+def test_rank_candidates():
+    pytest.importorskip('numpy')
+    from RRP import Partition
+    par_list = [Partition(3, 10, 1), Partition(20, 100, 2), Partition(4, 40, 3)]
+    arguments = (par_list, 1, [1, 2, 5, 20], [None, 3, 7], [0.3, 0.6], [(1, 3)], 500, 11)
+    rows = TaskSimulation.rank_candidates(*arguments)
+    assert rows == TaskSimulation.rank_candidates(*arguments)
+    assert [row['rank'] for row in rows] == list(range(1, 13))
+    schedulable = [row for row in rows if row['schedulable']]
+    assert schedulable and rows[:len(schedulable)] == schedulable
+    #a 20ms time slice is longer than the period of partition 1
+    assert [row for row in rows if row['time_slice_len'] == 20 and row['schedulable']] == []
+    assert [(-row['on_time_ratio'], row['slots']) for row in schedulable] == sorted((-row['on_time_ratio'], row['slots']) for row in schedulable)
+    for row in schedulable:
+        assert row['worst_on_time_ratio'] <= row['on_time_ratio'] <= 1
+        schedules = TaskSimulation.candidate_schedules(par_list, row['time_slice_len'], None if row['factor'] == 'auto' else row['factor'])
+        assert row['slots'] == sum(schedule.slot_count() for schedule in schedules)
@@ -0,0 +1,66 @@
+import random
+
+from RRP import RRP, Partition
+
+
+def ms_sets(seed, count):
+    '''
+    This function draws partition sets with WCETs and periods in milliseconds.
+    '''
+    rng = random.Random(seed)
+    for i in range(count):
+        par_list = []
+        for partition_id in range(rng.randint(1, 6)):
+            period = rng.choice([20, 50, 100, 200, 250, 1000])
+            par_list.append(Partition(rng.randint(1, period//3), period, partition_id))
+        yield par_list
+
+
+def test_exact_total():
+    #in 1ms slices the factors add up to 1 + 1/114688
+    par_list = [Partition(114687, 114688, 1), Partition(1, 57344, 2)]
+    (best, rows) = RRP(verbose=False).tune_time_slice(par_list, 1, [1])
+    assert best is None
+    assert rows[0]['schedulable'] is False
+
+
+def test_best_is_schedulable_and_cheapest():
+    for CPU_num in [1, 2]:
+        for par_list in ms_sets(CPU_num, 40):
+            rrp = RRP(verbose=False)
+            (best, rows) = rrp.tune_time_slice(par_list, CPU_num, [1, 2, 5, 10, 20])
+            assert [row['time_slice_len'] for row in rows] == [1, 2, 5, 10, 20]
+            if best is None:
+                assert all(row['schedulable'] in ('', False) for row in rows)
+                continue
+            assert rrp.generate_schedule(rrp.partitions_in_slices(par_list, best), CPU_num) is not None
+            chosen = [row for row in rows if row['time_slice_len'] == best][0]
+            assert chosen['schedulable'] is True
+            #no cheaper candidate was skipped
+            for row in rows:
+                if row['total_aaf'] != '' and row['schedulable'] is not False:
+                    assert (row['total_aaf'], row['slots'], -row['time_slice_len']) >= (chosen['total_aaf'], chosen['slots'], -best)
+
+
+def test_max_slots():
+    for par_list in ms_sets(3, 40):
+        (best, rows) = RRP(verbose=False).tune_time_slice(par_list, 2, [1, 2, 5, 10, 20], max_slots=4)
+        if best is not None:
+            assert [row for row in rows if row['time_slice_len'] == best][0]['slots'] <= 4
+
+
+def test_too_long_slice():
+    (best, rows) = RRP(verbose=False).tune_time_slice([Partition(5, 20, 1)], 1, [25])
+    assert best is None
+    assert rows[0]['hyperperiod'] == '' and rows[0]['schedulable'] == ''
+
+
+def test_tuned_on_min_cpus():
+    #min_cpu gives 2 CPUs in milliseconds, in 40ms slices the set needs 3
+    par_list = [Partition(12, 100, 0), Partition(36, 100, 1), Partition(53, 100, 2), Partition(33, 100, 3)]
+    rrp = RRP(verbose=False)
+    assert rrp.min_cpu(par_list) == 2
+    assert rrp.tune_time_slice(par_list, 2, [40])[0] is None
+    [partition_set] = rrp.with_tuned_time_slice([{'name': 'set', 'cpu_num': 1, 'partitions': par_list}], 1, [40], min_cpus=True)
+    assert (partition_set['cpu_num'], partition_set['time_slice_len']) == (3, 40)
+    assert rrp.generate_schedule(partition_set['partitions'], 3) is not None
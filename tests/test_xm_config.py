@@ -0,0 +1,97 @@
+import os
+import shutil
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import RRP
+from RRP import Partition, XMConfig, XM_NAMESPACE
+
+CONFIG = '''<?xml version="1.0"?>
+<SystemDescription xmlns="%s" version="1.0.0" name="demo">
+   <HwDescription>
+      <MemoryLayout>
+         <Region type="sdram" start="0x0" size="64MB"/>
+      </MemoryLayout>
+      <ProcessorTable note="kept">
+         <Processor id="0" frequency="50Mhz">
+            <CyclicPlanTable>
+               <Plan id="0" majorFrame="1000ms"/>
+            </CyclicPlanTable>
+         </Processor>
+         <Processor xmlns="urn:stale" id="9"/>
+      </ProcessorTable>
+      <Devices/>
+   </HwDescription>
+   <PartitionTable/>
+</SystemDescription>
+''' % XM_NAMESPACE
+
+
+def processors(CPU_num):
+    rrp = RRP.RRP(verbose=False)
+    schedules = rrp.generate_schedule([Partition(1, 4, 1), Partition(2, 7, 2), Partition(1, 3, 3)], CPU_num)
+    return rrp.build_processors(schedules, 10, 400)
+
+
+def check_output(file_name, CPU_num):
+    root = ET.parse(file_name).getroot()
+    ns = '{'+XM_NAMESPACE+'}'
+    assert root.tag == ns+'SystemDescription' and root.get('name') == 'demo'
+    hw_description = root.find(ns+'HwDescription')
+    assert sorted(node.tag for node in hw_description) == [ns+'Devices', ns+'MemoryLayout', ns+'ProcessorTable']
+    table = hw_description.find(ns+'ProcessorTable')
+    #every Processor is new, in the namespace of the document
+    assert [(node.tag, node.get('id'), node.get('frequency')) for node in table] == [(ns+'Processor', str(i), '400Mhz') for i in range(CPU_num)]
+    assert all(node.tag.startswith(ns) for node in table.iter())
+    assert table.findall('.//'+ns+'Slot')
+    return table
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_processors_replaced(tmp_path, monkeypatch, streaming):
+    config = tmp_path / 'xm_cf.xml'
+    config.write_text(CONFIG)
+    output = str(tmp_path / 'out.xml')
+    monkeypatch.setattr(RRP, 'STREAMING_CONFIG_SIZE', 0 if streaming else 1 << 30)
+    rrp = RRP.RRP(verbose=False)
+    assert rrp.write_processors(processors(2), str(config), output)
+    table = check_output(output, 2)
+    if streaming:
+        #the table keeps its attributes and the rest of the file its bytes
+        assert table.get('note') == 'kept'
+        with open(output) as f:
+            text = f.read()
+        assert text.startswith(CONFIG[:CONFIG.index('<ProcessorTable')])
+        assert text.endswith(CONFIG[CONFIG.index('</ProcessorTable>') + len('</ProcessorTable>'):])
+    assert sorted(os.listdir(str(tmp_path))) == ['out.xml', 'xm_cf.xml']
+
+
+def test_splice_without_table(tmp_path):
+    config = tmp_path / 'xm_cf.xml'
+    config.write_text(CONFIG[:CONFIG.index('      <ProcessorTable')] + CONFIG[CONFIG.index('      <Devices/>'):])
+    XMConfig.splice_processors(str(config), str(config), processors(1))
+    table = check_output(str(config), 1)
+    assert table.attrib == {}
+
+
+def test_splice_failure_leaves_no_temporary_file(tmp_path, monkeypatch):
+    config = tmp_path / 'xm_cf.xml'
+    config.write_text(CONFIG)
+    def failing_copy(source, destination):
+        raise OSError('disk full')
+    monkeypatch.setattr(shutil, 'copyfileobj', failing_copy)
+    with pytest.raises(OSError):
+        XMConfig.splice_processors(str(config), str(config), processors(1))
+    assert os.listdir(str(tmp_path)) == ['xm_cf.xml']
+    assert config.read_text() == CONFIG
+
+
+def test_splice_malformed(tmp_path, monkeypatch):
+    config = tmp_path / 'xm_cf.xml'
+    config.write_text(CONFIG[:-40])
+    monkeypatch.setattr(RRP, 'STREAMING_CONFIG_SIZE', 0)
+    assert not RRP.RRP(verbose=False).write_processors(processors(1), str(config), str(tmp_path / 'out.xml'))
+    with pytest.raises(RRP.expat.ExpatError):
+        XMConfig.splice_processors(str(config), str(tmp_path / 'out.xml'), processors(1))
+    assert os.listdir(str(tmp_path)) == ['xm_cf.xml']